@@ -61,5 +61,5 @@ export const deleteUser = async (userId: number) => {
 // working example
 export const getUsers = async () => {
     const response =  await axios.get(`${API_BASE_URL}/users`);
-    return response.data;
+    return response.data.data; // Paginated envelope: { data, next_cursor }
 }
@@ -1,35 +1,26 @@
 import { PieChart, Pie, Cell, ResponsiveContainer, Legend, Tooltip } from 'recharts';
-import { Battery } from '../../context/DashboardContext';
+import { BatteryTypeHealth } from '../../context/DashboardContext';
 
 type BatteryHealthChartProps = {
-  batteries: Battery[];
+  healthByType: BatteryTypeHealth[];
 };
 
-const BatteryHealthChart = ({ batteries }: BatteryHealthChartProps) => {
-  // Calculate battery health distribution
+const BatteryHealthChart = ({ healthByType }: BatteryHealthChartProps) => {
+  // Calculate battery health distribution from the per-type counts computed by the backend
   const calculateHealthData = () => {
     const healthRanges = [
-      { name: 'Excellent (90-100%)', range: [90, 100], color: '#10B981' },
-      { name: 'Good (80-89%)', range: [80, 89], color: '#34D399' },
-      { name: 'Fair (70-79%)', range: [70, 79], color: '#FBBF24' },
-      { name: 'Poor (60-69%)', range: [60, 69], color: '#F97316' },
-      { name: 'Critical (<60%)', range: [0, 59], color: '#EF4444' },
-    ];
+      { name: 'Excellent (90-100%)', key: 'excellent', color: '#10B981' },
+      { name: 'Good (80-89%)', key: 'good', color: '#34D399' },
+      { name: 'Fair (70-79%)', key: 'fair', color: '#FBBF24' },
+      { name: 'Poor (60-69%)', key: 'poor', color: '#F97316' },
+      { name: 'Critical (<60%)', key: 'critical', color: '#EF4444' },
+    ] as const;
 
-    return healthRanges.map(range => {
-      const count = batteries.filter(
-        battery => {
-          const health = battery.latest_soh_percent || 0; // Use latest_soh_percent, fallback to 0
-          return health >= range.range[0] && health <= range.range[1];
-        }
-      ).length;
-
-      return {
-        name: range.name,
-        value: count,
-        color: range.color
-      };
-    });
+    return healthRanges.map(range => ({
+      name: range.name,
+      value: healthByType.reduce((total, type) => total + (type.distribution[range.key] || 0), 0),
+      color: range.color
+    }));
   };
 
   const data = calculateHealthData();
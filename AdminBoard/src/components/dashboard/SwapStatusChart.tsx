@@ -10,7 +10,7 @@ import {
   ChartData,
 } from 'chart.js';
 import { useMemo } from 'react';
-import { SwapActivity, Station } from '../../context/DashboardContext';
+import { StationSwapPoint, Station } from '../../context/DashboardContext';
 
 // Register ChartJS components
 ChartJS.register(
@@ -23,11 +23,11 @@ ChartJS.register(
 );
 
 type SwapStatusChartProps = {
-  activities: SwapActivity[];
+  series: StationSwapPoint[];
   stations: Station[];
 };
 
-const SwapStatusChart = ({ activities, stations }: SwapStatusChartProps) => {
+const SwapStatusChart = ({ series, stations }: SwapStatusChartProps) => {
   // Create a map of station IDs to names for quick lookup
   const stationMap = useMemo(() => {
     const map = new Map<number, string>();
@@ -37,27 +37,14 @@ const SwapStatusChart = ({ activities, stations }: SwapStatusChartProps) => {
     return map;
   }, [stations]);
 
-  // Process the data to get swaps per station for the last 7 days
+  // The backend already buckets swaps per station and day for the last 7 days;
+  // only the daily points need summing here.
   const chartData = useMemo(() => {
-    // Get the date 7 days ago
-    const sevenDaysAgo = new Date();
-    sevenDaysAgo.setDate(sevenDaysAgo.getDate() - 7);
-    
-    // Filter swaps from the last 7 days
-    const recentSwaps = activities.filter(swap => {
-      const swapDate = new Date(swap.created_at);
-      return swapDate >= sevenDaysAgo;
-    });
-    
- 
-
-    // Count swaps per station
     const swapsByStation = new Map<number, number>();
-    
-    recentSwaps.forEach(swap => {
-      const stationId = swap.pickup_station_id;
-      const count = swapsByStation.get(stationId) || 0;
-      swapsByStation.set(stationId, count + 1);
+
+    series.forEach(point => {
+      const count = swapsByStation.get(point.station_id) || 0;
+      swapsByStation.set(point.station_id, count + point.swaps);
     });
 
     // Ensure all stations are represented, even with zero swaps
@@ -76,7 +63,7 @@ const SwapStatusChart = ({ activities, stations }: SwapStatusChartProps) => {
       .sort((a, b) => b.count - a.count); // Sort by count descending
 
     return result;
-  }, [activities, stationMap]);
+  }, [series, stations, stationMap]);
 
   // Prepare data for Chart.js
   const chartConfig: ChartData<'bar'> = {
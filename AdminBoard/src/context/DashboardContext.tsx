@@ -46,32 +46,74 @@ export interface SwapActivity {
   pickup_station_id: number;
 }
 
+// One point of /api/analytics/swaps_per_station (daily buckets)
+export interface StationSwapPoint {
+  bucket: string;
+  station_id: number;
+  swaps: number;
+  ah_used: number;
+}
+
+// One row of /api/analytics/battery_health, based on each battery's latest reading
+export interface BatteryTypeHealth {
+  battery_type: string | null;
+  batteries: number;
+  avg_soh: number | null;
+  min_soh: number | null;
+  max_soh: number | null;
+  distribution: Record<'excellent' | 'good' | 'fair' | 'poor' | 'critical', number>;
+}
+
+interface StationStatus {
+  station_id: number;
+  total_slots: number;
+  slots: Record<string, number>;
+  batteries: Record<string, number>;
+}
+
 interface DashboardContextType {
   batteries: Battery[];
   stations: Station[];
   swapActivities: SwapActivity[];
   users: User[];
+  swapsPerStation: StationSwapPoint[];
+  healthByType: BatteryTypeHealth[];
 }
 
 const DashboardContext = createContext<DashboardContextType | undefined>(undefined);
 
-// Helper to robustly extract an array from API response
-const extractArray = (responseData: any, specificKey?: string): any[] => {
-  if (Array.isArray(responseData)) {
-    return responseData;
-  }
-  if (specificKey && responseData && Array.isArray(responseData[specificKey])) {
-    return responseData[specificKey];
-  }
-  if (responseData && Array.isArray(responseData.data)) {
-    return responseData.data; // Common wrapper key
-  }
-  if (responseData && Array.isArray(responseData.items)) {
-    return responseData.items; // Another common wrapper key
+const API_BASE_URL = 'http://localhost:5000/api';
+
+// Every list and analytics endpoint answers with a { data, next_cursor? } envelope
+const fetchData = async (path: string): Promise<any[]> => {
+  const res = await fetch(`${API_BASE_URL}${path}`);
+  if (!res.ok) throw new Error(`Failed to fetch ${path}: ${res.statusText}`);
+  return (await res.json()).data;
+};
+
+// Follows next_cursor until the whole collection is loaded
+const fetchAllPages = async (path: string): Promise<any[]> => {
+  const rows: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const res = await fetch(`${API_BASE_URL}${path}?limit=1000${cursor ? `&after=${cursor}` : ''}`);
+    if (!res.ok) throw new Error(`Failed to fetch ${path}: ${res.statusText}`);
+    const page = await res.json();
+    rows.push(...page.data);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return rows;
+};
+
+// Merge a (possibly partial) row pushed by the backend into a list keyed by id
+const upsertById = <T extends { id: number }>(items: T[], row: Partial<T> & { id: number }): T[] => {
+  const index = items.findIndex((item) => item.id === row.id);
+  if (index === -1) {
+    return [...items, row as T];
   }
-  // Add more specific key checks if needed for different endpoints
-  // e.g. if users are under 'users_list', stations under 'station_list'
-  return []; // Default to empty array if no array is found
+  const next = [...items];
+  next[index] = { ...items[index], ...row };
+  return next;
 };
 
 export const DashboardProvider = ({ children }: { children: React.ReactNode }) => {
@@ -79,31 +121,44 @@ export const DashboardProvider = ({ children }: { children: React.ReactNode }) =
   const [stations, setStations] = useState<Station[]>([]);
   const [swapActivities, setSwapActivities] = useState<SwapActivity[]>([]);
   const [users, setUsers] = useState<User[]>([]);
+  const [swapsPerStation, setSwapsPerStation] = useState<StationSwapPoint[]>([]);
+  const [healthByType, setHealthByType] = useState<BatteryTypeHealth[]>([]);
 
   useEffect(() => {
     // Fetch dashboard data from API
     const fetchDashboardData = async () => {
       try {
         // Fetch batteries
-        const batteriesRes = await fetch('http://localhost:5000/api/batteries');
-        const batteriesData = await batteriesRes.json();
-        setBatteries(extractArray(batteriesData, 'batteries'));
-
-        // Fetch stations
-        const stationsRes = await fetch('http://localhost:5000/api/stations');
-        const stationsData = await stationsRes.json();
-        setStations(extractArray(stationsData, 'stations'));
-
-        // Fetch swap activities
-        const activitiesRes = await fetch('http://localhost:5000/api/swaps');
-        const activitiesData = await activitiesRes.json();
-        setSwapActivities(extractArray(activitiesData, 'swaps')); // Assuming 'swaps' might be a key, or 'swap_activities'
+        setBatteries(await fetchAllPages('/batteries'));
+
+        // Fetch stations, with slot counts aggregated by the backend
+        const [stationsData, stationStatus] = await Promise.all([
+          fetchAllPages('/stations'),
+          fetchData('/analytics/station_status'),
+        ]);
+        const statusById = new Map<number, StationStatus>(
+          stationStatus.map((s: StationStatus) => [s.station_id, s])
+        );
+        setStations(stationsData.map((station: Station) => {
+          const status = statusById.get(station.id);
+          return status
+            ? { ...station, total_slots: status.total_slots, available_slots: status.slots.empty || 0 }
+            : station;
+        }));
+
+        // Fetch pre-aggregated chart series (last 7 days, per station and day)
+        const [swapSeries, health] = await Promise.all([
+          fetchData('/analytics/swaps_per_station?granularity=day'),
+          fetchData('/analytics/battery_health'),
+        ]);
+        setSwapsPerStation(swapSeries);
+        setHealthByType(health);
+
+        // Fetch the first page of swap activities
+        setSwapActivities(await fetchData('/swaps'));
 
         // Fetch users
-        const usersRes = await fetch('http://localhost:5000/api/users');
-        if (!usersRes.ok) throw new Error(`Failed to fetch users: ${usersRes.statusText}`);
-        const usersData = await usersRes.json();
-        setUsers(extractArray(usersData, 'users'));
+        setUsers(await fetchAllPages('/users'));
 
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
@@ -112,17 +167,58 @@ export const DashboardProvider = ({ children }: { children: React.ReactNode }) =
         setStations([]);
         setSwapActivities([]);
         setUsers([]);
+        setSwapsPerStation([]);
+        setHealthByType([]);
       }
     };
 
+    // Fetch a snapshot once, then apply change events pushed by the backend.
+    // EventSource reconnects with Last-Event-ID; if the server no longer has the
+    // missed events it sends a resync and we refetch the snapshot.
     fetchDashboardData();
-    // Refresh data every 30 seconds
-    const interval = setInterval(fetchDashboardData, 30000);
-    return () => clearInterval(interval);
+    const events = new EventSource(`${API_BASE_URL}/events?types=battery.changed,battery.faulty,battery.deleted,swap.created,swap.updated,swap.deleted`);
+
+    events.addEventListener('battery.changed', (e) => {
+      const battery = JSON.parse((e as MessageEvent).data);
+      setBatteries((prev) => upsertById(prev, battery));
+    });
+    events.addEventListener('battery.faulty', (e) => {
+      const { id, status, updated_at } = JSON.parse((e as MessageEvent).data);
+      setBatteries((prev) => prev.map((b) => (b.id === id ? { ...b, status, updated_at } : b)));
+    });
+    events.addEventListener('battery.deleted', (e) => {
+      const { id } = JSON.parse((e as MessageEvent).data);
+      setBatteries((prev) => prev.filter((b) => b.id !== id));
+    });
+    events.addEventListener('swap.created', (e) => {
+      const swap = JSON.parse((e as MessageEvent).data);
+      setSwapActivities((prev) => upsertById(prev, swap));
+      if (swap.pickup_station_id) {
+        setSwapsPerStation((prev) => [...prev, {
+          bucket: swap.start_time || new Date().toISOString(),
+          station_id: swap.pickup_station_id,
+          swaps: 1,
+          ah_used: swap.ah_used || 0,
+        }]);
+      }
+    });
+    events.addEventListener('swap.updated', (e) => {
+      const swap = JSON.parse((e as MessageEvent).data);
+      setSwapActivities((prev) => upsertById(prev, swap));
+    });
+    events.addEventListener('swap.deleted', (e) => {
+      const { id } = JSON.parse((e as MessageEvent).data);
+      setSwapActivities((prev) => prev.filter((s) => s.id !== id));
+    });
+    events.addEventListener('resync', () => {
+      fetchDashboardData();
+    });
+
+    return () => events.close();
   }, []);
 
   return (
-    <DashboardContext.Provider value={{ batteries, stations, swapActivities, users }}>
+    <DashboardContext.Provider value={{ batteries, stations, swapActivities, users, swapsPerStation, healthByType }}>
       {children}
     </DashboardContext.Provider>
   );
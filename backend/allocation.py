@@ -0,0 +1,169 @@
+import heapq
+import os
+import threading
+import time
+from collections import namedtuple
+from itertools import count
+from sqlalchemy import func
+from models import db, Battery, BatteryHealthLog, Slot
+
+ReadySlot = namedtuple('ReadySlot', 'id station_id slot_number battery_id soh_percent pack_voltage')
+
+
+def _priority(slot):
+    # Healthiest first, then the fullest pack; batteries without readings go last.
+    return (-(slot.soh_percent if slot.soh_percent is not None else -1.0),
+            -(slot.pack_voltage if slot.pack_voltage is not None else -1.0),
+            slot.slot_number, slot.id)
+
+
+def ready_slots_query(*columns):
+    # Slots that can hand out a battery right now.
+    return db.session.query(*columns).join(Battery, Battery.id == Slot.battery_id).filter(
+        Slot.status == 'occupied',
+        Slot.is_charging.is_(False),
+        Battery.status == 'available'
+    )
+
+
+def ready_slot_counts(station_ids=None):
+    query = ready_slots_query(Slot.station_id, func.count(Slot.id))
+    if station_ids is not None:
+        query = query.filter(Slot.station_id.in_(station_ids))
+    return dict(query.group_by(Slot.station_id).all())
+
+
+def load_ready_slots(station_id):
+    # Ready slots of one station, with each battery's latest reading.
+    slots = ready_slots_query(Slot.id, Slot.station_id, Slot.slot_number, Slot.battery_id).filter(
+        Slot.station_id == station_id).all()
+    battery_ids = [slot.battery_id for slot in slots]
+    latest = {}
+    if battery_ids:
+        latest_ids = db.session.query(func.max(BatteryHealthLog.id)).filter(
+            BatteryHealthLog.battery_id.in_(battery_ids)).group_by(BatteryHealthLog.battery_id)
+        latest = {battery_id: (soh, voltage) for battery_id, soh, voltage in db.session.query(
+            BatteryHealthLog.battery_id, BatteryHealthLog.soh_percent, BatteryHealthLog.pack_voltage
+        ).filter(BatteryHealthLog.id.in_(latest_ids))}
+    return [ReadySlot(*slot, *latest.get(slot.battery_id, (None, None))) for slot in slots]
+
+
+class AllocationIndex:
+    # Per-station heaps of ready slots ordered by _priority, loaded on first use
+    # and then answered from memory. Slot and battery writes invalidate a
+    # station so it is reloaded; health readings re-rank a battery in place.
+    # pop() removes the best slot under the lock, so two kiosks in this process
+    # never receive the same slot; callers still claim it with a compare-and-set
+    # on the slot row, which covers other worker processes. Stations are
+    # reloaded after ttl seconds to pick up writes made by other processes.
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stations = {}
+        self._generations = {}
+        self._epoch = 0
+        self._current = {}
+        self._by_battery = {}
+        self._counter = count()
+
+    def _push(self, heap, slot):
+        self._current[slot.id] = slot
+        self._by_battery[slot.battery_id] = slot.id
+        heapq.heappush(heap, (_priority(slot), next(self._counter), slot))
+
+    def _drop(self, slot):
+        if self._current.get(slot.id) is slot:
+            del self._current[slot.id]
+            if self._by_battery.get(slot.battery_id) == slot.id:
+                del self._by_battery[slot.battery_id]
+
+    def _top(self, heap):
+        # Entries superseded by a newer reading or dropped are skipped lazily.
+        while heap and self._current.get(heap[0][2].id) is not heap[0][2]:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def _heap(self, station_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._stations.get(station_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                return entry[1]
+            generation = (self._epoch, self._generations.get(station_id, 0))
+
+        slots = load_ready_slots(station_id)
+        with self._lock:
+            if (self._epoch, self._generations.get(station_id, 0)) != generation:
+                # A write landed while loading; another request will reload.
+                return None
+            entry = self._stations.get(station_id)
+            if entry is not None and entry[0] >= now:
+                # Another thread loaded it first and may already have popped
+                # slots from it; replacing it would hand those out again.
+                return entry[1]
+            self._evict(station_id)
+            heap = []
+            for slot in slots:
+                self._push(heap, slot)
+            self._stations[station_id] = (time.monotonic(), heap)
+            return heap
+
+    def _evict(self, station_id):
+        entry = self._stations.pop(station_id, None)
+        if entry is not None:
+            for _, _, slot in entry[1]:
+                self._drop(slot)
+
+    def peek(self, station_id):
+        heap = self._heap(station_id)
+        if heap is None:
+            return load_best(station_id)
+        with self._lock:
+            return self._top(heap)
+
+    def pop(self, station_id):
+        heap = self._heap(station_id)
+        if heap is None:
+            # Unindexed pick; the caller's compare-and-set still settles races.
+            return load_best(station_id)
+        with self._lock:
+            slot = self._top(heap)
+            if slot is not None:
+                heapq.heappop(heap)
+                self._drop(slot)
+            return slot
+
+    def invalidate(self, station_id=None):
+        with self._lock:
+            if station_id is None:
+                self._epoch += 1
+                for key in list(self._stations):
+                    self._evict(key)
+            else:
+                self._generations[station_id] = self._generations.get(station_id, 0) + 1
+                self._evict(station_id)
+
+    def update_health(self, readings):
+        with self._lock:
+            for reading in readings:
+                slot_id = self._by_battery.get(reading.get('battery_id'))
+                if slot_id is None:
+                    continue
+                slot = self._current[slot_id]
+                entry = self._stations.get(slot.station_id)
+                if entry is None:
+                    continue
+                soh, voltage = reading.get('soh_percent'), reading.get('pack_voltage')
+                updated = slot._replace(soh_percent=slot.soh_percent if soh is None else soh,
+                                        pack_voltage=slot.pack_voltage if voltage is None else voltage)
+                if updated != slot:
+                    self._push(entry[1], updated)
+
+
+def load_best(station_id):
+    slots = load_ready_slots(station_id)
+    return min(slots, key=_priority) if slots else None
+
+
+allocation_index = AllocationIndex(ttl=float(os.environ.get('ALLOCATION_INDEX_TTL', 30.0)))
@@ -0,0 +1,213 @@
+import os
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, func
+from models import db, Battery, BatteryHealthLog, Slot, Station, Swap, SwapHourlyRollup
+
+GRANULARITIES = ('hour', 'day')
+MAX_HOURLY_WINDOW = timedelta(days=31)
+ROLLUP_LOOKBACK = timedelta(hours=int(os.environ.get('ANALYTICS_ROLLUP_LOOKBACK_HOURS', 24)))
+SOH_BANDS = (('excellent', 90), ('good', 80), ('fair', 70), ('poor', 60))
+
+# Bucket start per granularity in each database's own format language: MySQL
+# DATE_FORMAT reads %M as the month name and spells minutes %i.
+_BUCKET_FORMATS = {
+    'sqlite': {'minute': '%Y-%m-%d %H:%M:00', 'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00'},
+    'mysql': {'minute': '%Y-%m-%d %H:%i:00', 'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00'},
+    'postgresql': {'minute': 'YYYY-MM-DD HH24:MI:00', 'hour': 'YYYY-MM-DD HH24:00:00', 'day': 'YYYY-MM-DD 00:00:00'},
+}
+
+
+def time_bucket(column, granularity, dialect=None):
+    # Truncates a datetime column to the start of its minute/hour/day as a
+    # 'YYYY-MM-DD HH:MM:00' string, in whatever spelling the database uses.
+    dialect = dialect or db.engine.dialect.name
+    if dialect == 'sqlite':
+        return func.strftime(_BUCKET_FORMATS['sqlite'][granularity], column)
+    if dialect == 'postgresql':
+        return func.to_char(column, _BUCKET_FORMATS['postgresql'][granularity])
+    return func.date_format(column, _BUCKET_FORMATS['mysql'][granularity])
+
+
+def parse_bucket(value):
+    return value if isinstance(value, datetime) else datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def check_window(granularity, since, until):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if since >= until:
+        raise ValueError("since must be before until")
+    if granularity == 'hour' and until - since > MAX_HOURLY_WINDOW:
+        raise ValueError("Hourly series are limited to 31 days; use granularity=day")
+
+
+def swap_series(granularity, since, until, station_ids=None, by_station=True, source='live'):
+    # Swaps and Ah per time bucket, attributed to the pickup station. The live
+    # source groups raw swaps over the start_time index; the rollup source sums
+    # the pre-aggregated hourly rows instead (so since is rounded down to the hour).
+    if source == 'rollup':
+        bucket = time_bucket(SwapHourlyRollup.bucket_start, granularity)
+        station = SwapHourlyRollup.station_id
+        measures = [func.sum(SwapHourlyRollup.swap_count), func.sum(SwapHourlyRollup.ah_used)]
+        filters = [SwapHourlyRollup.bucket_start >= floor_hour(since), SwapHourlyRollup.bucket_start < until]
+    else:
+        bucket = time_bucket(Swap.start_time, granularity)
+        station = Swap.pickup_station_id
+        measures = [func.count(Swap.id), func.coalesce(func.sum(Swap.ah_used), 0)]
+        filters = [Swap.start_time >= since, Swap.start_time < until, Swap.pickup_station_id.isnot(None)]
+    if station_ids:
+        filters.append(station.in_(station_ids))
+
+    keys = [bucket, station] if by_station else [bucket]
+    rows = db.session.query(*keys, *measures).filter(*filters).group_by(*keys).order_by(*keys)
+    series = []
+    for row in rows:
+        point = {"bucket": parse_bucket(row[0]).isoformat()}
+        if by_station:
+            point["station_id"] = row[1]
+        point["swaps"] = int(row[-2] or 0)
+        point["ah_used"] = round(row[-1] or 0, 3)
+        series.append(point)
+    return series
+
+
+def station_status_counts(station_ids=None):
+    slot_query = db.session.query(Slot.station_id, Slot.status, func.count(Slot.id)).group_by(Slot.station_id, Slot.status)
+    battery_query = db.session.query(Battery.station_id, Battery.status, func.count(Battery.id)).filter(
+        Battery.station_id.isnot(None)).group_by(Battery.station_id, Battery.status)
+    station_query = db.session.query(Station.id, Station.name)
+    if station_ids:
+        slot_query = slot_query.filter(Slot.station_id.in_(station_ids))
+        battery_query = battery_query.filter(Battery.station_id.in_(station_ids))
+        station_query = station_query.filter(Station.id.in_(station_ids))
+
+    stations = {station_id: {"station_id": station_id, "name": name, "total_slots": 0, "slots": {}, "batteries": {}}
+                for station_id, name in station_query.order_by(Station.id)}
+    for station_id, status, count in slot_query:
+        if station_id in stations:
+            stations[station_id]['slots'][status or 'unknown'] = count
+            stations[station_id]['total_slots'] += count
+    for station_id, status, count in battery_query:
+        if station_id in stations:
+            stations[station_id]['batteries'][status] = count
+    return list(stations.values())
+
+
+def soh_by_battery_type():
+    # Averages each battery's most recent reading, not every reading it ever sent.
+    latest = db.session.query(
+        func.max(BatteryHealthLog.id).label('id')
+    ).group_by(BatteryHealthLog.battery_id).subquery()
+    soh = BatteryHealthLog.soh_percent
+    bands = [func.sum(case((soh >= floor, 1), else_=0)) if i == 0 else
+             func.sum(case(((soh >= floor) & (soh < SOH_BANDS[i - 1][1]), 1), else_=0))
+             for i, (_, floor) in enumerate(SOH_BANDS)]
+    rows = db.session.query(
+        Battery.battery_type,
+        func.count(BatteryHealthLog.id),
+        func.avg(soh),
+        func.min(soh),
+        func.max(soh),
+        func.sum(case((soh < SOH_BANDS[-1][1], 1), else_=0)),
+        *bands
+    ).select_from(latest).join(
+        BatteryHealthLog, BatteryHealthLog.id == latest.c.id
+    ).join(Battery, Battery.id == BatteryHealthLog.battery_id).group_by(Battery.battery_type).order_by(Battery.battery_type)
+
+    result = []
+    for battery_type, count, avg, low, high, critical, *band_counts in rows:
+        distribution = {name: int(n or 0) for (name, _), n in zip(SOH_BANDS, band_counts)}
+        distribution['critical'] = int(critical or 0)
+        result.append({
+            "battery_type": battery_type,
+            "batteries": count,
+            "avg_soh": round(avg, 2) if avg is not None else None,
+            "min_soh": round(low, 2) if low is not None else None,
+            "max_soh": round(high, 2) if high is not None else None,
+            "distribution": distribution
+        })
+    return result
+
+
+def refresh_swap_rollup(since=None, until=None):
+    # Rebuilds the hourly buckets in [since, until) from swaps. Without since it
+    # resumes from the newest bucket already rolled up, minus a lookback that
+    # catches swaps edited or back-dated after their hour was first rolled up.
+    until = until or datetime.utcnow()
+    if since is None:
+        newest = db.session.query(func.max(SwapHourlyRollup.bucket_start)).scalar()
+        since = newest - ROLLUP_LOOKBACK if newest else db.session.query(func.min(Swap.start_time)).scalar()
+        if since is None:
+            return {"since": None, "until": until.isoformat(), "buckets": 0}
+    since = floor_hour(since)
+
+    bucket = time_bucket(Swap.start_time, 'hour')
+    rows = db.session.query(
+        bucket, Swap.pickup_station_id, func.count(Swap.id), func.coalesce(func.sum(Swap.ah_used), 0)
+    ).filter(
+        Swap.start_time >= since, Swap.start_time < until, Swap.pickup_station_id.isnot(None)
+    ).group_by(bucket, Swap.pickup_station_id).all()
+
+    now = datetime.utcnow()
+    db.session.query(SwapHourlyRollup).filter(
+        SwapHourlyRollup.bucket_start >= since, SwapHourlyRollup.bucket_start < until
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(SwapHourlyRollup, [
+        {"bucket_start": parse_bucket(b), "station_id": s, "swap_count": n, "ah_used": ah, "refreshed_at": now}
+        for b, s, n, ah in rows
+    ])
+    db.session.commit()
+    return {"since": since.isoformat(), "until": until.isoformat(), "buckets": len(rows)}
+
+
+def refresh_swap_buckets(touched):
+    # Re-aggregates the hourly rollup rows holding the given (station_id,
+    # start_time) pairs inside the caller's transaction, so swaps edited or
+    # deleted after the refresh lookback has passed their hour do not leave the
+    # rollup drifting from the live data. Hours after the newest rolled-up one
+    # are left to the next incremental refresh.
+    hours = set()
+    for station_id, start_time in touched:
+        if isinstance(start_time, str):
+            try:
+                start_time = datetime.fromisoformat(start_time)
+            except ValueError:
+                continue
+        if station_id is not None and isinstance(start_time, datetime):
+            hours.add((station_id, floor_hour(start_time)))
+    if not hours:
+        return
+    newest = db.session.query(func.max(SwapHourlyRollup.bucket_start)).scalar()
+    if newest is None:
+        return
+
+    now = datetime.utcnow()
+    for station_id, hour in hours:
+        if hour > newest:
+            continue
+        count, ah_used = db.session.query(func.count(Swap.id), func.coalesce(func.sum(Swap.ah_used), 0)).filter(
+            Swap.pickup_station_id == station_id, Swap.start_time >= hour, Swap.start_time < hour + timedelta(hours=1)
+        ).one()
+        db.session.query(SwapHourlyRollup).filter(
+            SwapHourlyRollup.station_id == station_id, SwapHourlyRollup.bucket_start == hour
+        ).delete(synchronize_session=False)
+        if count:
+            db.session.add(SwapHourlyRollup(bucket_start=hour, station_id=station_id, swap_count=count,
+                                            ah_used=ah_used, refreshed_at=now))
+
+
+analytics_cli = AppGroup('analytics', help='Dashboard analytics rollups.')
+
+
+@analytics_cli.command('refresh-rollup')
+@click.option('--since', type=click.DateTime(), help='Rebuild from this time instead of the last rolled-up hour.')
+def refresh_rollup_command(since):
+    """Refresh the hourly swap rollup incrementally."""
+    result = refresh_swap_rollup(since)
+    click.echo(f"{result['buckets']} hourly buckets rebuilt from {result['since']} to {result['until']}")
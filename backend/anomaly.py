@@ -0,0 +1,146 @@
+import os
+import threading
+from datetime import datetime
+from math import sqrt
+from models import db, Battery, Slot
+from slot_cache import slot_cache, slot_item, write_through
+from events import publish
+
+# metric: (direction, hard limit, noise floor). Direction 1 only flags rises,
+# -1 only drops and 0 both. Hard limits trip on the first reading, even before
+# the battery has a baseline; the noise floor keeps a flat signal from turning
+# tiny wobbles into huge z-scores.
+WATCHED_METRICS = {
+    'max_temp': (1, float(os.environ.get('ANOMALY_MAX_TEMP', 60)), 0.5),
+    'cell_voltage_diff': (1, float(os.environ.get('ANOMALY_MAX_CELL_VOLTAGE_DIFF', 0.3)), 0.005),
+    'internal_resist': (1, None, 0.5),
+    'pack_voltage': (0, None, 0.2),
+    'soh_percent': (-1, None, 0.5),
+}
+FAULTY = 'faulty'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class AnomalyDetector:
+    # Online per-battery baselines: an exponentially weighted mean and variance
+    # per metric, updated in O(1) from each reading, so checking a reading never
+    # reads the database. Readings further than z_threshold deviations from the
+    # baseline are anomalies and are kept out of it, so a runaway value cannot
+    # drag its own baseline along. A battery is flagged once, on a hard limit or
+    # after flag_after anomalous readings in a row, until reset() clears it.
+    # State is per process and is rebuilt from the stream after a restart.
+
+    def __init__(self, metrics=WATCHED_METRICS, alpha=0.05, z_threshold=4.0, warmup=20, flag_after=3):
+        self.metrics = metrics
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.flag_after = flag_after
+        self._lock = threading.Lock()
+        self._baselines = {}
+        self._streaks = {}
+        self._flagged = set()
+        self._stats = {"readings": 0, "anomalies": 0, "flagged": 0}
+
+    def _check(self, baselines, metric, value):
+        direction, limit, noise_floor = self.metrics[metric]
+        if limit is not None and value >= limit:
+            return {"metric": metric, "value": value, "limit": limit, "reason": "limit"}
+        baseline = baselines.get(metric)
+        if baseline is None:
+            baselines[metric] = [value, 0.0, 1]
+            return None
+        mean, var, n = baseline
+        deviation = value - mean
+        if n >= self.warmup:
+            z = deviation / max(sqrt(var), noise_floor)
+            if z * direction >= self.z_threshold or (direction == 0 and abs(z) >= self.z_threshold):
+                return {"metric": metric, "value": value, "expected": round(mean, 4),
+                        "z_score": round(z, 2), "reason": "zscore"}
+        # Until warmup is reached the weight is 1/n, so the baseline starts as a
+        # plain running mean and variance rather than leaning on the first reading.
+        weight = max(self.alpha, 1.0 / (n + 1))
+        step = weight * deviation
+        baseline[0] = mean + step
+        baseline[1] = (1 - weight) * (var + deviation * step)
+        baseline[2] = n + 1
+        return None
+
+    def observe(self, reading):
+        battery_id = reading.get('battery_id')
+        anomalies = []
+        with self._lock:
+            baselines = self._baselines.setdefault(battery_id, {})
+            for metric in self.metrics:
+                value = reading.get(metric)
+                if _is_number(value):
+                    anomaly = self._check(baselines, metric, value)
+                    if anomaly:
+                        anomalies.append(anomaly)
+            streak = self._streaks.get(battery_id, 0) + 1 if anomalies else 0
+            self._streaks[battery_id] = streak
+            flag = battery_id not in self._flagged and bool(anomalies) and (
+                streak >= self.flag_after or any(a['reason'] == 'limit' for a in anomalies))
+            if flag:
+                self._flagged.add(battery_id)
+            self._stats["readings"] += 1
+            self._stats["anomalies"] += bool(anomalies)
+            self._stats["flagged"] += flag
+        return anomalies, flag
+
+    def reset(self, battery_id):
+        with self._lock:
+            self._baselines.pop(battery_id, None)
+            self._streaks.pop(battery_id, None)
+            self._flagged.discard(battery_id)
+
+    def metrics_snapshot(self):
+        with self._lock:
+            return dict(self._stats, batteries=len(self._baselines), currently_flagged=len(self._flagged))
+
+
+detector = AnomalyDetector(
+    alpha=float(os.environ.get('ANOMALY_EWMA_ALPHA', 0.05)),
+    z_threshold=float(os.environ.get('ANOMALY_Z_THRESHOLD', 4.0)),
+    warmup=int(os.environ.get('ANOMALY_WARMUP', 20)),
+    flag_after=int(os.environ.get('ANOMALY_FLAG_AFTER', 3))
+)
+
+
+def check_readings(readings):
+    # Runs each reading through the detector, publishes an alert per anomalous
+    # reading and marks newly flagged batteries faulty in one write.
+    to_flag = {}
+    for reading in readings:
+        anomalies, flag = detector.observe(reading)
+        if anomalies:
+            publish('health_log.anomaly', {
+                "battery_id": reading['battery_id'],
+                "anomalies": anomalies,
+                "created_at": str(reading.get('created_at'))
+            })
+        if flag:
+            to_flag[reading['battery_id']] = anomalies
+    if to_flag:
+        mark_faulty(to_flag)
+
+
+def mark_faulty(anomalies_by_battery):
+    battery_ids = list(anomalies_by_battery)
+    now = datetime.utcnow()
+    db.session.query(Battery).filter(Battery.id.in_(battery_ids)).update(
+        {Battery.status: FAULTY, Battery.updated_at: now}, synchronize_session=False)
+    slots = Slot.query.filter(Slot.battery_id.in_(battery_ids)).all()
+    for slot in slots:
+        slot.status = FAULTY
+    db.session.commit()
+
+    for slot in slots:
+        write_through(slot)
+        publish('slot.changed', slot_item(slot))
+    for battery_id, anomalies in anomalies_by_battery.items():
+        publish('battery.faulty', {"id": battery_id, "status": FAULTY, "updated_at": str(now),
+                                   "anomalies": anomalies})
@@ -1,8 +1,17 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
+from flask_migrate import Migrate
 import os
 from dotenv import load_dotenv
 from models import db
+from pagination import InvalidParameter
+from telemetry import WriteBehindBuffer
+from metrics import RequestMetrics
+from replicas import ReplicaRouter
+from events import EventRelay, broker
+from billing import billing_cli
+from analytics import analytics_cli
+from health_rollups import health_cli
 
 # Import Blueprints
 from routes.user_routes import user_bp
@@ -14,35 +23,116 @@ from routes.subscription_plan_routes import subscription_plan_bp
 from routes.station_routes import station_bp
 from routes.slot_routes import slot_bp
 from routes.swap_routes import swap_bp
+from routes.event_routes import event_bp
+from routes.sync_routes import sync_bp
+from routes.analytics_routes import analytics_bp
+from routes.auth_routes import auth_bp
+from routes.metrics_routes import metrics_bp
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
 
-# Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI') or \
-    f"mysql+mysqlconnector://{os.environ.get('MYSQL_USER','root')}:{os.environ.get('MYSQL_PASSWORD','ines123')}@{os.environ.get('MYSQL_HOST','localhost')}:{os.environ.get('MYSQL_PORT','3306')}/{os.environ.get('MYSQL_DB','bss_db')}"
+def env_flag(name, default=''):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
 
-db.init_app(app)
 
-with app.app_context():
-    db.create_all() # Create tables
+def database_uri():
+    return os.environ.get('DATABASE_URI') or \
+        f"mysql+mysqlconnector://{os.environ.get('MYSQL_USER','root')}:{os.environ.get('MYSQL_PASSWORD','ines123')}@{os.environ.get('MYSQL_HOST','localhost')}:{os.environ.get('MYSQL_PORT','3306')}/{os.environ.get('MYSQL_DB','bss_db')}"
 
-# Register Blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(rfid_card_bp, url_prefix='/api')
-app.register_blueprint(battery_bp, url_prefix='/api')
-app.register_blueprint(battery_health_log_bp, url_prefix='/api')
-app.register_blueprint(monthly_billing_bp, url_prefix='/api')
-app.register_blueprint(subscription_plan_bp, url_prefix='/api')
-app.register_blueprint(station_bp, url_prefix='/api')
-app.register_blueprint(slot_bp, url_prefix='/api')
-app.register_blueprint(swap_bp, url_prefix='/api')
 
-@app.route('/')
-def hello():
-    return jsonify({"message": "Hello from Flask! Database connected."})
+def engine_options(uri):
+    # The pool is per worker process. Keep DB_POOL_SIZE at least the worker's
+    # thread count, and workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the
+    # server's max_connections. Pre-ping and recycle drop connections the
+    # server or a proxy closed while idle instead of failing the next request.
+    options = {
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', '1'),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if not uri.startswith('sqlite'):
+        # SQLite uses a single-connection or null pool, which takes no sizing.
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        )
+    return options
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    CORS(app)
+
+    # Database Configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Serve dashboard series from the hourly swap rollup instead of raw swaps
+    app.config['ANALYTICS_ROLLUP'] = env_flag('ANALYTICS_ROLLUP')
+    app.config.update(config or {})
+
+    db.init_app(app)
+    Migrate(app, db, render_as_batch=True) # Schema is managed with `flask db upgrade`
+
+    # Optional read replicas; only routes marked @replica_reads use them
+    replica_uris = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    if replica_uris:
+        ReplicaRouter(
+            replica_uris,
+            check_interval=float(os.environ.get('REPLICA_HEALTH_INTERVAL', 5.0)),
+            max_lag=float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10.0)),
+            sticky_seconds=int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+        ).init_app(app)
+
+    # Change events reach /api/events subscribers on every worker through the
+    # event_log table; EVENTS_FANOUT=memory keeps them in this process, which
+    # only works when a single process serves both writes and /api/events.
+    # One relay per process: the broker it feeds is process-wide.
+    if os.environ.get('EVENTS_FANOUT', 'database') == 'database' and broker.relay is None:
+        EventRelay(
+            broker,
+            poll_interval=float(os.environ.get('EVENTS_POLL_INTERVAL', 0.25)),
+            retention=int(os.environ.get('EVENTS_RETENTION_SECONDS', 3600))
+        ).init_app(app)
+
+    # Optional write-behind buffering for single health-log posts
+    if env_flag('HEALTH_LOG_WRITE_BEHIND'):
+        WriteBehindBuffer(
+            max_size=int(os.environ.get('HEALTH_LOG_BUFFER_SIZE', 100000)),
+            batch_size=int(os.environ.get('HEALTH_LOG_BATCH_SIZE', 5000)),
+            flush_interval=float(os.environ.get('HEALTH_LOG_FLUSH_INTERVAL', 1.0))
+        ).init_app(app)
+
+    # Per-endpoint latency, SQL and error metrics at /metrics, with a slow-request log
+    if env_flag('REQUEST_METRICS', '1'):
+        RequestMetrics(slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', 500))).init_app(app)
+
+    # Register Blueprints
+    for blueprint in (user_bp, rfid_card_bp, battery_bp, battery_health_log_bp, monthly_billing_bp,
+                      subscription_plan_bp, station_bp, slot_bp, swap_bp, event_bp, sync_bp,
+                      analytics_bp, auth_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
+
+    # CLI: `flask billing run --month YYYY-MM`, `flask analytics refresh-rollup`, `flask health rollup|purge`
+    app.cli.add_command(billing_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(health_cli)
+
+    @app.errorhandler(InvalidParameter)
+    def handle_invalid_parameter(error):
+        return jsonify({"error": str(error)}), 400
+
+    @app.route('/')
+    def hello():
+        return jsonify({"message": "Hello from Flask! Database connected."})
+
+    return app
+
+
+# Module-level app for `flask` commands, `gunicorn -c gunicorn.conf.py` and the benchmarks
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Time a set-based billing run over a month of swaps.
+
+    cd backend
+    python -m benchmarks.billing_benchmark --users 50000 --swaps 1000000
+
+Seeds one month of swaps, runs billing for it twice (the second run updates
+the rows written by the first) and checks that the invoices match a plain
+per-user recomputation.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--swaps', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'billing.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from billing import run_billing  # noqa: E402
+from models import db, MonthlyBilling, SubscriptionPlan, Swap, User  # noqa: E402
+
+MONTH = '2024-03'
+START = datetime(2024, 3, 1)
+PLANS = [
+    {'id': 1, 'name': 'Basic', 'monthly_fee': 30.0, 'included_ah': 200, 'extra_ah_rate': 0.12},
+    {'id': 2, 'name': 'Pro', 'monthly_fee': 55.0, 'included_ah': 500, 'extra_ah_rate': 0.08},
+]
+
+
+def insert(model, rows):
+    for i in range(0, len(rows), 10000):
+        db.session.execute(model.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def seed(args, rng):
+    insert(SubscriptionPlan, PLANS)
+    insert(User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+                   'subscription_plan_id': rng.choice([1, 2, None]), 'created_at': START, 'updated_at': START}
+                  for i in range(1, args.users + 1)])
+    swaps = []
+    # A slice of swaps falls just outside the month to check the range bounds.
+    for _ in range(args.swaps):
+        offset = rng.randint(-86400, 32 * 86400)
+        swaps.append({'user_id': rng.randint(1, args.users), 'start_time': START + timedelta(seconds=offset),
+                      'ah_used': rng.uniform(5, 40), 'created_at': START, 'updated_at': START})
+    insert(Swap, swaps)
+    return swaps
+
+
+def expected_invoices(args, swaps):
+    plans = {p['id']: p for p in PLANS}
+    usage = defaultdict(float)
+    for swap in swaps:
+        if START <= swap['start_time'] < datetime(2024, 4, 1):
+            usage[swap['user_id']] += swap['ah_used']
+    expected = {}
+    for user_id, plan_id in db.session.query(User.id, User.subscription_plan_id):
+        if plan_id is None and user_id not in usage:
+            continue
+        plan = plans.get(plan_id, {})
+        excess = max(usage[user_id] - plan.get('included_ah', 0), 0.0)
+        expected[user_id] = round(plan.get('monthly_fee', 0) + excess * plan.get('extra_ah_rate', 0), 2)
+    return expected
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    with app.app_context():
+        db.create_all()
+        try:
+            started = time.perf_counter()
+            swaps = seed(ARGS, rng)
+            print(f'Seeded {ARGS.swaps} swaps for {ARGS.users} users in {time.perf_counter() - started:.1f}s')
+
+            for label in ('first run', 're-run'):
+                summary = run_billing(MONTH)
+                print(f"{label:10s} {summary['invoices']} invoices in {summary['elapsed_ms']:.0f} ms")
+
+            expected = expected_invoices(ARGS, swaps)
+            actual = dict(db.session.query(MonthlyBilling.user_id, MonthlyBilling.total_amount_due))
+            mismatches = [u for u in expected if abs(expected[u] - actual.get(u, -1)) > 0.011]
+            if len(actual) != len(expected) or mismatches:
+                print(f'FAIL: {len(actual)} invoices, expected {len(expected)}; mismatched users {mismatches[:10]}')
+                sys.exit(1)
+            print('OK: invoices match per-user recomputation')
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Endpoint cases shared by benchmarks.suite and tests/benchmarks.
+
+Each case is (blueprint, name, method, url, body, heavy) for a fleet built by
+benchmarks.datagen at the given scale.
+"""
+from datetime import timedelta
+
+from benchmarks.datagen import END
+
+
+def cases(scale):
+    # (blueprint, case, method, url, body, heavy). url and body are callables of
+    # an rng so each request can hit a different row.
+    users, batteries, stations = scale['users'], scale['batteries'], scale['stations']
+    logged = min(scale['logged_batteries'], batteries)
+    month = (END - timedelta(days=1)).strftime('%Y-%m')
+    day, week, month_ago = (END - timedelta(days=n) for n in (1, 7, 30))
+    log_window = END - timedelta(minutes=5)
+
+    def user(r):
+        return r.randint(1, users)
+
+    def reading(r):
+        return {'battery_id': r.randint(1, logged), 'soh_percent': 90.0, 'pack_voltage': 52.1,
+                'cell_voltage_min': 3.3, 'cell_voltage_max': 3.32, 'cell_voltage_diff': 0.02, 'max_temp': 28.0,
+                'ambient_temp': 25.0, 'humidity': 45.0, 'internal_resist': 25.0, 'cycle_count': 400}
+
+    return [
+        ('user', 'users page', 'GET', lambda r: '/api/users?limit=50', None, False),
+        ('user', 'user by id', 'GET', lambda r: f'/api/users/{user(r)}', None, False),
+        ('subscription_plan', 'plans', 'GET', lambda r: '/api/subscription_plans', None, False),
+        ('rfid_card', 'card by code', 'GET', lambda r: f'/api/rfid_cards/by_code/RF{user(r):010d}', None, False),
+        ('rfid_card', 'cards page', 'GET', lambda r: '/api/rfid_cards?limit=50', None, False),
+        ('auth', 'rfid tap', 'POST', lambda r: '/api/auth/rfid', lambda r: {'rfid_code': f'RF{user(r):010d}'}, False),
+        ('battery', 'batteries page', 'GET', lambda r: '/api/batteries?limit=100', None, False),
+        ('battery', 'battery by id', 'GET', lambda r: f'/api/batteries/{r.randint(1, batteries)}', None, False),
+        ('slot', 'slots', 'GET', lambda r: '/api/slots', None, True),
+        ('slot', 'slot by id', 'GET', lambda r: f'/api/slots/{r.randint(1, stations * scale["slots_per_station"])}', None, False),
+        ('station', 'stations', 'GET', lambda r: '/api/stations', None, False),
+        ('station', 'station slots', 'GET', lambda r: f'/api/stations/{r.randint(1, stations)}/slots', None, False),
+        ('station', 'next battery', 'GET', lambda r: f'/api/stations/{r.randint(1, stations)}/next_battery', None, False),
+        ('station', 'nearby', 'GET', lambda r: f'/api/stations/nearby?lat={36.8 + r.uniform(-0.2, 0.2):.4f}'
+                                               f'&lon={10.18 + r.uniform(-0.2, 0.2):.4f}', None, False),
+        ('swap', 'swaps page', 'GET', lambda r: '/api/swaps?limit=50', None, False),
+        ('swap', 'swaps page of 1000', 'GET', lambda r: '/api/swaps?limit=1000', None, True),
+        ('swap', 'swaps 1000, 3 fields', 'GET', lambda r: '/api/swaps?limit=1000&fields=id,start_time,ah_used', None, True),
+        ('swap', 'user swaps', 'GET', lambda r: f'/api/users/{user(r)}/swaps', None, False),
+        ('battery_health_log', 'logs page', 'GET', lambda r: '/api/battery_health_logs?limit=100', None, False),
+        ('battery_health_log', 'battery logs, 5 min raw', 'GET', lambda r: f'/api/batteries/{r.randint(1, logged)}/health_logs'
+                                                               f'?resolution=raw&since={log_window.isoformat()}&until={END.isoformat()}', None, False),
+        ('battery_health_log', 'battery logs, auto', 'GET', lambda r: f'/api/batteries/{r.randint(1, logged)}/health_logs'
+                                                          f'?until={END.isoformat()}', None, False),
+        ('battery_health_log', 'health report', 'GET', lambda r: f'/api/batteries/health_report?since={month_ago.isoformat()}', None, True),
+        ('monthly_billing', 'billings page', 'GET', lambda r: '/api/monthly_billings?limit=50', None, False),
+        ('monthly_billing', 'user billings', 'GET', lambda r: f'/api/users/{user(r)}/monthly_billings', None, False),
+        ('monthly_billing', 'user usage', 'GET', lambda r: f'/api/users/{user(r)}/usage?month={month}', None, False),
+        ('monthly_billing', 'unpaid', 'GET', lambda r: '/api/monthly_billings/unpaid?limit=50', None, False),
+        ('analytics', 'swaps per station, 30 days', 'GET', lambda r: '/api/analytics/swaps_per_station?granularity=day'
+                                                                  f'&since={month_ago.isoformat()}&until={END.isoformat()}', None, True),
+        ('analytics', 'ah throughput, 7 days hourly', 'GET', lambda r: '/api/analytics/ah_throughput?granularity=hour'
+                                                                    f'&since={week.isoformat()}&until={END.isoformat()}', None, True),
+        ('analytics', 'station status', 'GET', lambda r: '/api/analytics/station_status', None, False),
+        ('analytics', 'battery health by type', 'GET', lambda r: '/api/analytics/battery_health', None, True),
+        ('sync', 'sync last day', 'GET', lambda r: f'/api/sync?since={day.isoformat()}&limit=500', None, False),
+        # Writes last, so the reads above see the generated fleet unchanged.
+        ('battery_health_log', 'ingest one', 'POST', lambda r: '/api/battery_health_logs', reading, False),
+        ('battery_health_log', 'ingest batch of 100', 'POST', lambda r: '/api/battery_health_logs/batch',
+         lambda r: [reading(r) for _ in range(100)], False),
+    ]
+
+
+def sql_totals(metrics):
+    snapshot = metrics.metrics_snapshot().values()
+    return sum(entry['requests'] for entry in snapshot), sum(entry['sql_queries'] for entry in snapshot)
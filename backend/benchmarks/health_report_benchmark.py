@@ -0,0 +1,115 @@
+"""Time the fleet health report over synthetic telemetry.
+
+    cd backend
+    python -m benchmarks.health_report_benchmark --batteries 10000 --readings 1000
+
+Times the vectorised fit over an in-memory fleet and checks a sample of
+batteries against a per-battery numpy.polyfit. Then it seeds a smaller fleet
+(--db-batteries) into a throwaway database and times the report end to end,
+including loading the columns.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--batteries', type=int, default=10000)
+    parser.add_argument('--readings', type=int, default=1000)
+    parser.add_argument('--db-batteries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'health.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from health_report import compute_report, health_report  # noqa: E402
+from models import db, Battery, BatteryHealthLog  # noqa: E402
+
+
+def synthetic_fleet(batteries, readings, rng):
+    # Every pack degrades linearly at its own rate plus noise; about 5% of
+    # readings miss a metric.
+    battery_id = np.repeat(np.arange(1, batteries + 1), readings)
+    cycles = np.tile(np.arange(readings, dtype=np.float64), batteries) * 2
+    soh_rate = np.repeat(rng.uniform(0.0005, 0.012, batteries), readings)
+    res_rate = np.repeat(rng.uniform(0.0, 0.003, batteries), readings)
+    imb_rate = np.repeat(rng.uniform(0.0, 0.00004, batteries), readings)
+    columns = np.stack([
+        battery_id,
+        cycles,
+        100 - soh_rate * cycles + rng.normal(0, 0.3, len(cycles)),
+        20 + res_rate * cycles + rng.normal(0, 0.2, len(cycles)),
+        0.02 + imb_rate * cycles + rng.normal(0, 0.002, len(cycles)),
+    ])
+    for metric in columns[2:]:
+        metric[rng.random(len(metric)) < 0.05] = np.nan
+    return np.ascontiguousarray(columns[:, rng.permutation(columns.shape[1])])
+
+
+def check_sample(columns, report, rng):
+    for i in rng.choice(len(report['battery_id']), 20, replace=False):
+        rows = columns[:, columns[0] == report['battery_id'][i]]
+        ok = ~np.isnan(rows[2])
+        slope = np.polyfit(rows[1, ok], rows[2, ok], 1)[0]
+        if not np.isclose(slope, report['soh_slope'][i], rtol=1e-6, atol=1e-9):
+            return f"battery {report['battery_id'][i]}: slope {report['soh_slope'][i]}, polyfit {slope}"
+    return None
+
+
+def seed(batteries, readings, rng):
+    now = datetime.utcnow()
+    db.session.execute(Battery.__table__.insert(), [
+        {'id': i, 'serial_number': f'SN{i:06d}', 'status': 'available', 'battery_type': 'LFP-48V',
+         'created_at': now, 'updated_at': now} for i in range(1, batteries + 1)])
+    names = ('battery_id', 'cycle_count', 'soh_percent', 'internal_resist', 'cell_voltage_diff')
+    rows = [{c: (None if np.isnan(v) else float(v)) for c, v in zip(names, row)}
+            for row in synthetic_fleet(batteries, readings, rng).T]
+    for row in rows:
+        row['battery_id'] = int(row['battery_id'])
+        row['created_at'] = now - timedelta(minutes=int(rng.integers(0, 60 * 24 * 30)))
+    for i in range(0, len(rows), 10000):
+        db.session.execute(BatteryHealthLog.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def main():
+    rng = np.random.default_rng(ARGS.seed)
+    columns = synthetic_fleet(ARGS.batteries, ARGS.readings, rng)
+    started = time.perf_counter()
+    report = compute_report(columns)
+    elapsed = time.perf_counter() - started
+    at_risk = int((report['risk_score'] >= 1).sum())
+    print(f'compute_report: {columns.shape[1]} readings, {ARGS.batteries} batteries, {at_risk} at risk in {elapsed:.2f}s')
+    mismatch = check_sample(columns, report, rng)
+    if mismatch:
+        print(f'FAIL: {mismatch}')
+        sys.exit(1)
+    print('OK: slopes match numpy.polyfit')
+
+    with app.app_context():
+        db.create_all()
+        try:
+            started = time.perf_counter()
+            seed(ARGS.db_batteries, ARGS.readings, rng)
+            print(f'Seeded {ARGS.db_batteries * ARGS.readings} health logs in {time.perf_counter() - started:.1f}s')
+            result = health_report('raw', limit=10)
+            print(f"health_report: {result['readings']} readings, {result['at_risk']} at risk, "
+                  f"load {result['load_ms']:.0f} ms, compute {result['compute_ms']:.0f} ms")
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
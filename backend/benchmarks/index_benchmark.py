@@ -0,0 +1,170 @@
+"""Compare query plans and latencies of the hot read paths with and without
+the secondary indexes declared in models.py.
+
+    cd backend
+    python -m benchmarks.index_benchmark --swaps 200000 --health-logs 500000
+
+Uses a throwaway SQLite file unless --database-uri points somewhere else
+(the database must be empty; its tables are created and dropped).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--stations', type=int, default=200)
+    parser.add_argument('--slots-per-station', type=int, default=20)
+    parser.add_argument('--batteries', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--swaps', type=int, default=200000)
+    parser.add_argument('--health-logs', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from app import app  # noqa: E402
+from models import (db, Battery, BatteryHealthLog, MonthlyBilling, Slot, Station,  # noqa: E402
+                    SubscriptionPlan, Swap, User)
+
+MONTHS = ['2024-%02d' % m for m in range(1, 13)]
+START = datetime(2024, 1, 1)
+
+
+def insert(model, rows):
+    for i in range(0, len(rows), 10000):
+        db.session.execute(model.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def seed(args, rng):
+    insert(SubscriptionPlan, [{'id': 1, 'name': 'Basic', 'monthly_fee': 30.0, 'included_ah': 500, 'extra_ah_rate': 0.1}])
+    insert(Station, [{'id': i, 'name': f'Station {i}', 'created_at': START, 'updated_at': START}
+                     for i in range(1, args.stations + 1)])
+    insert(Battery, [{'id': i, 'station_id': rng.randint(1, args.stations),
+                      'status': rng.choice(['available', 'charging', 'in_use', 'maintenance']),
+                      'serial_number': f'SN{i:08d}', 'created_at': START, 'updated_at': START}
+                     for i in range(1, args.batteries + 1)])
+    insert(Slot, [{'station_id': s, 'slot_number': n, 'battery_id': None,
+                   'status': rng.choice(['empty', 'occupied', 'faulty']), 'is_charging': False}
+                  for s in range(1, args.stations + 1) for n in range(1, args.slots_per_station + 1)])
+    insert(User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+                   'subscription_plan_id': 1, 'created_at': START, 'updated_at': START}
+                  for i in range(1, args.users + 1)])
+    insert(Swap, [{'user_id': rng.randint(1, args.users),
+                   'issued_battery_id': rng.randint(1, args.batteries),
+                   'returned_battery_id': rng.randint(1, args.batteries),
+                   'pickup_station_id': rng.randint(1, args.stations),
+                   'deposit_station_id': rng.randint(1, args.stations),
+                   'start_time': START + timedelta(seconds=rng.randint(0, 365 * 86400)),
+                   'ah_used': rng.uniform(5, 40), 'created_at': START, 'updated_at': START}
+                  for _ in range(args.swaps)])
+    insert(BatteryHealthLog, [{'battery_id': rng.randint(1, args.batteries), 'soh_percent': rng.uniform(70, 100),
+                               'created_at': START + timedelta(seconds=rng.randint(0, 365 * 86400))}
+                              for _ in range(args.health_logs)])
+    insert(MonthlyBilling, [{'user_id': u, 'billing_month': m,
+                             'payment_status': 'paid' if rng.random() < 0.95 else rng.choice(['unpaid', 'pending'])}
+                            for u in range(1, args.users + 1) for m in MONTHS[:3]])
+
+
+def hot_queries(args, rng):
+    user_id = rng.randint(1, args.users)
+    battery_id = rng.randint(1, args.batteries)
+    station_id = rng.randint(1, args.stations)
+    return {
+        'get_user_swaps': Swap.query.filter_by(user_id=user_id).order_by(Swap.id),
+        'swaps by time range': Swap.query.filter(Swap.start_time >= datetime(2024, 6, 1),
+                                                 Swap.start_time < datetime(2024, 6, 2)),
+        'swaps by pickup station': Swap.query.filter(Swap.pickup_station_id == station_id,
+                                                     Swap.start_time >= datetime(2024, 6, 1)),
+        'get_battery_health_logs_by_battery': BatteryHealthLog.query.filter_by(battery_id=battery_id)
+                                                                    .order_by(BatteryHealthLog.id),
+        'health logs by battery since': BatteryHealthLog.query.filter(
+            BatteryHealthLog.battery_id == battery_id, BatteryHealthLog.created_at >= datetime(2024, 12, 1)),
+        'get_unpaid_billings': MonthlyBilling.query.filter(MonthlyBilling.payment_status.in_(['unpaid', 'pending']))
+                                                   .order_by(MonthlyBilling.id).limit(100),
+        'unpaid billings for month': MonthlyBilling.query.filter(
+            MonthlyBilling.payment_status.in_(['unpaid', 'pending']), MonthlyBilling.billing_month == '2024-02'),
+        'billings by user and month': MonthlyBilling.query.filter_by(user_id=user_id, billing_month='2024-02'),
+        'slots by station and status': Slot.query.filter_by(station_id=station_id, status='empty'),
+        'batteries by station and status': Battery.query.filter_by(station_id=station_id, status='available'),
+    }
+
+
+def explain(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+        return '; '.join(row[-1] for row in rows)
+    rows = db.session.execute(text('EXPLAIN ' + sql)).mappings().fetchall()
+    return '; '.join(f"{row['table']}: {row['key'] or 'full scan'} ({row['rows']} rows)" for row in rows)
+
+
+def analyze():
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('ANALYZE'))
+    else:
+        db.session.execute(text('ANALYZE TABLE ' + ', '.join(t.name for t in db.metadata.sorted_tables)))
+
+
+def measure(args, label):
+    results = {}
+    for name in hot_queries(args, random.Random(0)):
+        timings = []
+        for i in range(args.repeat):
+            query = hot_queries(args, random.Random(i))[name]
+            started = time.perf_counter()
+            query.all()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), explain(hot_queries(args, random.Random(0))[name]))
+    print(f'\n== {label} ==')
+    for name, (median_ms, plan) in results.items():
+        print(f'{name:38s} {median_ms:9.2f} ms   {plan}')
+    return results
+
+
+def secondary_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    with app.app_context():
+        db.create_all()
+        try:
+            started = time.perf_counter()
+            seed(ARGS, rng)
+            print(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+            for index in secondary_indexes():
+                index.drop(db.engine)
+            before = measure(ARGS, 'without secondary indexes')
+
+            for index in secondary_indexes():
+                index.create(db.engine)
+            analyze()
+            after = measure(ARGS, 'with secondary indexes')
+
+            print('\n== speedup ==')
+            for name in before:
+                print(f'{name:38s} {before[name][0] / max(after[name][0], 1e-6):8.1f}x')
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
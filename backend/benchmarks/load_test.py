@@ -0,0 +1,176 @@
+"""Sustained throughput of the debug server versus the gunicorn launcher.
+
+    cd backend
+    python -m benchmarks.load_test --duration 20 --concurrency 32
+
+Seeds a throwaway database, then starts each server as a subprocess on a
+free port: `flask run` with debug on (what `python app.py` serves) and
+`gunicorn -c gunicorn.conf.py`. Client threads hold keep-alive connections
+and request /api/rfid_cards/by_code/<code> and /api/swaps for --duration
+seconds each. Reports requests per second, p50/p99 latency and errors.
+
+The client runs on the same host, so on small machines it competes with the
+server for CPU; compare the modes with each other rather than across hosts.
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--swaps', type=int, default=50000)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--modes', default='debug,gunicorn')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db')
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from app import app  # noqa: E402
+from models import db, Battery, RFIDCard, Swap, User  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def insert(model, rows):
+    for i in range(0, len(rows), 10000):
+        db.session.execute(model.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def seed(args, rng):
+    insert(User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+                   'created_at': START, 'updated_at': START} for i in range(1, args.cards + 1)])
+    insert(RFIDCard, [{'id': i, 'user_id': i, 'rfid_code': f'CARD{i:08d}', 'status': 'active',
+                       'created_at': START, 'updated_at': START} for i in range(1, args.cards + 1)])
+    insert(Battery, [{'id': i, 'serial_number': f'BAT{i:06d}', 'status': 'available',
+                      'created_at': START, 'updated_at': START} for i in range(1, 1001)])
+    insert(Swap, [{'user_id': rng.randint(1, args.cards), 'issued_battery_id': rng.randint(1, 1000),
+                   'returned_battery_id': rng.randint(1, 1000), 'start_time': START + timedelta(minutes=i),
+                   'ah_used': rng.uniform(5, 40), 'created_at': START, 'updated_at': START}
+                  for i in range(args.swaps)])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, args):
+    env = dict(os.environ, FLASK_APP='app.py')
+    if mode == 'debug':
+        # The reloader is off so the process can be stopped; the debugger stays on.
+        env['FLASK_ENV'] = 'development'
+        command = [sys.executable, '-m', 'flask', 'run', '--no-reload', '--port', str(port)]
+    else:
+        env.update(GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(args.workers),
+                   GUNICORN_THREADS=str(args.threads), GUNICORN_LOG_LEVEL='warning')
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'{mode} server exited with code {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f'{mode} server did not start on port {port}')
+
+
+def run_load(port, paths, duration, concurrency):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(rng):
+        local, failed = [], 0
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', paths(rng))
+                response = connection.getresponse()
+                response.read()
+                if response.status == 200:
+                    local.append(time.perf_counter() - started)
+                else:
+                    failed += 1
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(random.Random(i),)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('nan')
+    return len(latencies) / elapsed, statistics.median(latencies) if latencies else float('nan'), p99, errors[0]
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(ARGS, rng)
+        print(f'Seeded {ARGS.cards} cards and {ARGS.swaps} swaps in {time.perf_counter() - started:.1f}s')
+        db.session.remove()
+
+    endpoints = [
+        ('rfid_cards/by_code', lambda r: f'/api/rfid_cards/by_code/CARD{r.randint(1, ARGS.cards):08d}'),
+        ('swaps?limit=50', lambda r: '/api/swaps?limit=50'),
+    ]
+    print(f'{ARGS.concurrency} clients, {ARGS.duration:g}s per endpoint; '
+          f'gunicorn: {ARGS.workers} workers x {ARGS.threads} threads')
+    print(f"{'mode':10s} {'endpoint':20s} {'req/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'errors':>7s}")
+    try:
+        for mode in ARGS.modes.split(','):
+            port = free_port()
+            process = start_server(mode, port, ARGS)
+            try:
+                for label, paths in endpoints:
+                    rps, p50, p99, errors = run_load(port, paths, ARGS.duration, ARGS.concurrency)
+                    print(f'{mode:10s} {label:20s} {rps:9.0f} {p50 * 1000:8.1f} {p99 * 1000:8.1f} {errors:7d}')
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
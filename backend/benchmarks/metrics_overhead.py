@@ -0,0 +1,116 @@
+"""Per-request overhead of the request metrics middleware.
+
+    cd backend
+    python -m benchmarks.metrics_overhead --requests 2000
+
+Builds one app with REQUEST_METRICS off and one with it on, over the same
+throwaway database, and times the same requests through the test client
+against each, alternating request by request so both see the same load. The SQL
+event listeners are global, so the app without metrics still runs their
+early return. Fails when the overhead exceeds --max-overhead.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--swaps', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per endpoint and round')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-overhead', type=float, default=2.0, help='percent')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'metrics.db')
+os.environ['REQUEST_METRICS'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, create_app  # noqa: E402
+from models import db, Battery, RFIDCard, Swap, User  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def insert(model, rows):
+    for i in range(0, len(rows), 10000):
+        db.session.execute(model.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def seed(args, rng):
+    insert(User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+                   'created_at': START, 'updated_at': START} for i in range(1, args.cards + 1)])
+    insert(RFIDCard, [{'id': i, 'user_id': i, 'rfid_code': f'CARD{i:08d}', 'status': 'active',
+                       'created_at': START, 'updated_at': START} for i in range(1, args.cards + 1)])
+    insert(Battery, [{'id': i, 'serial_number': f'BAT{i:06d}', 'status': 'available',
+                      'created_at': START, 'updated_at': START} for i in range(1, 1001)])
+    insert(Swap, [{'user_id': rng.randint(1, args.cards), 'issued_battery_id': rng.randint(1, 1000),
+                   'returned_battery_id': rng.randint(1, 1000), 'start_time': START + timedelta(minutes=i),
+                   'ah_used': rng.uniform(5, 40), 'created_at': START, 'updated_at': START}
+                  for i in range(args.swaps)])
+
+
+def time_requests(clients, urls):
+    # Seconds per request for each client, swapping which goes first every request.
+    totals = [0.0] * len(clients)
+    for i, url in enumerate(urls):
+        order = range(len(clients)) if i % 2 else reversed(range(len(clients)))
+        for c in order:
+            started = time.perf_counter()
+            response = clients[c].get(url)
+            totals[c] += time.perf_counter() - started
+            assert response.status_code == 200, url
+    return [total / len(urls) for total in totals]
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    with app.app_context():
+        db.create_all()
+        seed(ARGS, rng)
+        db.session.remove()
+
+    endpoints = [
+        ('rfid_cards/by_code', [f'/api/rfid_cards/by_code/CARD{rng.randint(1, ARGS.cards):08d}'
+                                for _ in range(ARGS.requests)]),
+        ('swaps?limit=50', ['/api/swaps?limit=50'] * ARGS.requests),
+    ]
+    try:
+        os.environ['REQUEST_METRICS'] = '1'
+        metered_app = create_app()
+        assert 'request_metrics' in metered_app.extensions
+        clients = [app.test_client(), metered_app.test_client()]
+        baseline, metered = {}, {}
+        for label, urls in endpoints:
+            time_requests(clients, urls[:200])
+            rounds = [time_requests(clients, urls) for _ in range(ARGS.repeat)]
+            baseline[label] = min(off for off, _ in rounds)
+            metered[label] = min(on for _, on in rounds)
+
+        failed = False
+        print(f"{'endpoint':20s} {'off us':>9s} {'on us':>9s} {'overhead':>9s}")
+        for label, _ in endpoints:
+            overhead = (metered[label] / baseline[label] - 1) * 100
+            failed |= overhead > ARGS.max_overhead
+            print(f'{label:20s} {baseline[label] * 1e6:9.0f} {metered[label] * 1e6:9.0f} {overhead:8.2f}%')
+        if failed:
+            print(f'FAIL: overhead above {ARGS.max_overhead:g}%')
+            sys.exit(1)
+        print(f'OK: overhead within {ARGS.max_overhead:g}%')
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
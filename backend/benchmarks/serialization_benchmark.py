@@ -0,0 +1,192 @@
+"""Compare list serialization through ORM instances with the compiled schemas.
+
+    cd backend
+    python -m benchmarks.serialization_benchmark --swaps 200000 --logs 200000
+
+The ORM path is the one the list routes used before: load instances with a
+joinedload, build each dict by hand and encode with jsonify. The schema path
+is the route itself, which selects plain row tuples and encodes with the fast
+encoder. Each case checks that both produce the same payload.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--swaps', type=int, default=200000)
+    parser.add_argument('--logs', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serialization.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Battery, BatteryHealthLog, Swap, User  # noqa: E402
+
+START = datetime(2024, 1, 1)
+USERS = 5000
+BATTERIES = 2000
+
+
+def insert(model, rows):
+    for i in range(0, len(rows), 10000):
+        db.session.execute(model.__table__.insert(), rows[i:i + 10000])
+    db.session.commit()
+
+
+def seed(args, rng):
+    insert(User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+                   'created_at': START, 'updated_at': START} for i in range(1, USERS + 1)])
+    insert(Battery, [{'id': i, 'serial_number': f'BAT{i:06d}', 'status': 'available',
+                      'created_at': START, 'updated_at': START} for i in range(1, BATTERIES + 1)])
+    insert(Swap, [{'user_id': rng.randint(1, USERS), 'issued_battery_id': rng.randint(1, BATTERIES),
+                   'returned_battery_id': rng.randint(1, BATTERIES), 'pickup_station_id': None,
+                   'start_time': START + timedelta(minutes=i), 'end_time': START + timedelta(minutes=i + 3),
+                   'battery_percentage_start': rng.uniform(5, 30), 'battery_percentage_end': rng.uniform(80, 100),
+                   'ah_used': rng.uniform(5, 40), 'created_at': START, 'updated_at': START}
+                  for i in range(args.swaps)])
+    insert(BatteryHealthLog, [{'battery_id': rng.randint(1, BATTERIES), 'soh_percent': rng.uniform(70, 100),
+                               'pack_voltage': rng.uniform(60, 84), 'cell_voltage_min': 3.2, 'cell_voltage_max': 3.4,
+                               'cell_voltage_diff': 0.2, 'max_temp': rng.uniform(20, 45), 'ambient_temp': 25.0,
+                               'humidity': 40.0, 'internal_resist': rng.uniform(20, 40), 'cycle_count': i % 1500,
+                               'error_code': None, 'created_at': START + timedelta(seconds=i)}
+                              for i in range(args.logs)])
+
+
+def orm_swap(swap):
+    return {
+        "id": swap.id,
+        "issued_battery_id": swap.issued_battery_id,
+        "returned_battery_id": swap.returned_battery_id,
+        "user_id": swap.user_id,
+        "pickup_station_id": swap.pickup_station_id,
+        "deposit_station_id": swap.deposit_station_id,
+        "start_time": str(swap.start_time) if swap.start_time else None,
+        "end_time": str(swap.end_time) if swap.end_time else None,
+        "battery_percentage_start": swap.battery_percentage_start,
+        "battery_percentage_end": swap.battery_percentage_end,
+        "ah_used": swap.ah_used,
+        "created_at": str(swap.created_at),
+        "updated_at": str(swap.updated_at),
+        "user_name": swap.user.name if swap.user else None,
+        "user_email": swap.user.email if swap.user else None
+    }
+
+
+def orm_log(log):
+    return {
+        "id": log.id,
+        "battery_id": log.battery_id,
+        "soh_percent": log.soh_percent,
+        "pack_voltage": log.pack_voltage,
+        "cell_voltage_min": log.cell_voltage_min,
+        "cell_voltage_max": log.cell_voltage_max,
+        "cell_voltage_diff": log.cell_voltage_diff,
+        "max_temp": log.max_temp,
+        "ambient_temp": log.ambient_temp,
+        "humidity": log.humidity,
+        "internal_resist": log.internal_resist,
+        "cycle_count": log.cycle_count,
+        "error_code": log.error_code,
+        "created_at": str(log.created_at),
+        "battery_serial": log.battery.serial_number if log.battery else None
+    }
+
+
+def orm_page(model, relationship, serialize, limit):
+    with app.test_request_context():
+        rows = model.query.options(joinedload(relationship)).order_by(model.id).limit(limit + 1).all()
+        body = jsonify({"data": [serialize(row) for row in rows[:limit]], "next_cursor": None}).get_data()
+        db.session.remove()
+    return body
+
+
+def orm_export(model, relationship, serialize):
+    with app.test_request_context():
+        lines = [json.dumps(serialize(row)) for row in
+                 model.query.options(joinedload(relationship)).order_by(model.id).yield_per(1000)]
+        body = '\n'.join(lines).encode()
+        db.session.remove()
+    return body
+
+
+def route(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    return response.get_data()
+
+
+def decode(body, paged):
+    if paged:
+        return json.loads(body)["data"]
+    return [json.loads(line) for line in body.splitlines() if line]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        db.configure_mappers()
+        try:
+            started = time.perf_counter()
+            seed(ARGS, rng)
+            print(f'Seeded {ARGS.swaps} swaps and {ARGS.logs} health logs in {time.perf_counter() - started:.1f}s')
+
+            cases = [
+                ('swaps page of 1000', True, lambda: orm_page(Swap, Swap.user, orm_swap, 1000),
+                 lambda: route(client, '/api/swaps?limit=1000')),
+                ('health logs page of 1000', True, lambda: orm_page(BatteryHealthLog, BatteryHealthLog.battery, orm_log, 1000),
+                 lambda: route(client, '/api/battery_health_logs?limit=1000')),
+                ('swaps NDJSON export', False, lambda: orm_export(Swap, Swap.user, orm_swap),
+                 lambda: route(client, '/api/swaps?format=ndjson')),
+                ('health logs NDJSON export', False, lambda: orm_export(BatteryHealthLog, BatteryHealthLog.battery, orm_log),
+                 lambda: route(client, '/api/battery_health_logs?format=ndjson')),
+            ]
+            failed = False
+            print(f"{'case':28s} {'ORM ms':>9s} {'schema ms':>10s} {'speedup':>8s}")
+            for label, paged, orm, schema in cases:
+                orm_time, expected = best_of(ARGS.repeat, orm)
+                schema_time, actual = best_of(ARGS.repeat, schema)
+                same = decode(expected, paged) == decode(actual, paged)
+                failed |= not same
+                print(f"{label:28s} {orm_time * 1000:9.1f} {schema_time * 1000:10.1f} {orm_time / schema_time:7.1f}x"
+                      f"{'' if same else '  MISMATCH'}")
+
+            projected_time, _ = best_of(ARGS.repeat, lambda: route(
+                client, '/api/swaps?format=ndjson&fields=id,start_time,ah_used'))
+            print(f"{'swaps export, 3 fields':28s} {'':9s} {projected_time * 1000:10.1f}")
+            if failed:
+                print('FAIL: schema output differs from the ORM serializers')
+                sys.exit(1)
+            print('OK: schema output matches the ORM serializers')
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Latency and query-count benchmarks of every blueprint's hot endpoints.
+
+    cd backend
+    python -m benchmarks.suite --scale small --save baseline.json
+    # ... change swap_routes.py or models.py ...
+    python -m benchmarks.suite --scale small --baseline baseline.json
+
+Builds a fleet with benchmarks.datagen (same seed and scale, same rows),
+then sends each case --iterations times through the Flask test client after
+a warm-up. For every case it reports p50/p99 latency and the SQL statements
+per request, counted by the request metrics middleware.
+
+--save writes the results as JSON. --baseline compares against such a file
+and exits with 1 when a case got slower than --tolerance (p50) or
+--p99-tolerance percent, by more than --min-delta-ms, or runs more queries.
+Only compare runs made on the same machine, database and scale.
+
+--reuse skips generation and runs against a database datagen already
+filled (for example a MySQL fleet at --scale large); it is left in place.
+--sqlite-replicas N copies the generated SQLite fleet into N files and
+serves the @replica_reads routes from them, as a stand-in for read replicas.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cases import cases, sql_totals  # noqa: E402
+from benchmarks.datagen import add_scale_arguments, generate, scale_from_args  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    add_scale_arguments(parser)
+    parser.add_argument('--reuse', action='store_true', help='use the fleet already in --database-uri')
+    parser.add_argument('--sqlite-replicas', type=int, default=0, help='copies of the SQLite fleet to read from')
+    parser.add_argument('--iterations', type=int, default=200, help='requests per case (heavy cases run a tenth, at least 20)')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', help='comma-separated blueprints or case names to run')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare with results saved by --save')
+    parser.add_argument('--tolerance', type=float, default=25.0, help='allowed p50 slowdown, percent')
+    parser.add_argument('--p99-tolerance', type=float, default=50.0, help='allowed p99 slowdown, percent')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='ignore slowdowns smaller than this')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.reuse and not ARGS.database_uri:
+    sys.exit('--reuse needs --database-uri')
+if ARGS.sqlite_replicas and ARGS.database_uri:
+    sys.exit('--sqlite-replicas needs the default SQLite database')
+DIRECTORY = tempfile.mkdtemp()
+PRIMARY_PATH = os.path.join(DIRECTORY, 'suite.db')
+REPLICA_PATHS = [os.path.join(DIRECTORY, f'replica_{i}.db') for i in range(1, ARGS.sqlite_replicas + 1)]
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + PRIMARY_PATH
+if REPLICA_PATHS:
+    os.environ['DATABASE_REPLICA_URIS'] = ','.join('sqlite:///' + path for path in REPLICA_PATHS)
+os.environ['REQUEST_METRICS'] = '1'
+os.environ.setdefault('SLOW_REQUEST_MS', '60000')
+
+from app import app  # noqa: E402
+from models import db  # noqa: E402
+
+
+def run_case(client, metrics, method, url, body, iterations, warmup, rng):
+    for _ in range(warmup):
+        client.open(url(rng), method=method, json=body(rng) if body else None)
+    requests_before, queries_before = sql_totals(metrics)
+    timings, errors = [], 0
+    for _ in range(iterations):
+        path, payload = url(rng), body(rng) if body else None
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=payload)
+        timings.append(time.perf_counter() - started)
+        errors += response.status_code >= 400
+    requests_after, queries_after = sql_totals(metrics)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "queries": round((queries_after - queries_before) / max(requests_after - requests_before, 1), 2),
+        "requests": iterations,
+        "errors": errors
+    }
+
+
+def compare(results, baseline):
+    # Returns {case: [reasons]} for cases that regressed against the baseline.
+    regressions = {}
+    for name, result in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        reasons = []
+        for key, tolerance in (("p50_ms", ARGS.tolerance), ("p99_ms", ARGS.p99_tolerance)):
+            if result[key] > base[key] * (1 + tolerance / 100) and result[key] - base[key] > ARGS.min_delta_ms:
+                reasons.append(f"{key} {base[key]:.2f} -> {result[key]:.2f}")
+        if result["queries"] > base["queries"] + 0.5:
+            reasons.append(f"queries {base['queries']:g} -> {result['queries']:g}")
+        if reasons:
+            regressions[name] = reasons
+    return regressions
+
+
+def main():
+    scale = scale_from_args(ARGS)
+    with app.app_context():
+        if not ARGS.reuse:
+            db.create_all()
+            print(f'Generating {ARGS.scale} fleet: {scale}')
+            generate(random.Random(ARGS.seed), rollups=not ARGS.no_rollups, **scale)
+        dialect = db.engine.dialect.name
+        db.session.remove()
+
+    router = app.extensions.get('replica_router')
+    for key, path in zip(router.keys if router else [], REPLICA_PATHS):
+        router.engine(key).dispose()
+        shutil.copyfile(PRIMARY_PATH, path)
+        router.check(key)
+
+    metrics = app.extensions['request_metrics']
+    client = app.test_client()
+    selected = set(ARGS.only.split(',')) if ARGS.only else None
+    results = {"meta": {"scale": ARGS.scale, **scale, "seed": ARGS.seed, "dialect": dialect,
+                        "replicas": len(router.keys) if router else 0,
+                        "iterations": ARGS.iterations, "python": platform.python_version(),
+                        "machine": platform.node(), "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')},
+               "cases": {}}
+    try:
+        print(f"{'blueprint':20s} {'case':30s} {'p50 ms':>8s} {'p99 ms':>8s} {'queries':>8s} {'errors':>7s}")
+        for blueprint, name, method, url, body, heavy in cases(scale):
+            if selected and blueprint not in selected and name not in selected:
+                continue
+            iterations = max(20, ARGS.iterations // 10) if heavy else ARGS.iterations
+            result = run_case(client, metrics, method, url, body, iterations,
+                              min(ARGS.warmup, iterations), random.Random(ARGS.seed))
+            results["cases"][name] = dict(result, blueprint=blueprint)
+            print(f"{blueprint:20s} {name:30s} {result['p50_ms']:8.2f} {result['p99_ms']:8.2f} "
+                  f"{result['queries']:8g} {result['errors']:7d}")
+    finally:
+        if not ARGS.reuse:
+            with app.app_context():
+                db.drop_all()
+
+    if router is not None:
+        print(f"Replica reads: {router.metrics_snapshot()['reads']}")
+    if ARGS.save:
+        with open(ARGS.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Saved results to {ARGS.save}')
+
+    failed = any(result["errors"] for result in results["cases"].values())
+    if failed:
+        print('FAIL: some requests returned an error status')
+    if ARGS.baseline:
+        with open(ARGS.baseline) as f:
+            baseline = json.load(f)
+        changed = [key for key in ("scale", "seed", "dialect") if baseline["meta"].get(key) != results["meta"][key]]
+        if changed:
+            print(f"Warning: baseline differs in {', '.join(changed)}; timings are not comparable")
+        regressions = compare(results, baseline)
+        for name, reasons in regressions.items():
+            print(f"REGRESSION {name}: {'; '.join(reasons)}")
+        if regressions:
+            failed = True
+        else:
+            print(f"OK: no regressions against {ARGS.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
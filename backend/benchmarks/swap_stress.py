@@ -0,0 +1,138 @@
+"""Concurrency stress test for POST /api/swaps/execute.
+
+    cd backend
+    python -m benchmarks.swap_stress --threads 16 --swaps 400
+
+Many kiosks swap at the same station at once. Every card holds a battery
+it returns, and fewer charged batteries are stocked than there are
+requests. The run fails if any battery is handed out twice or a slot ends
+up in an impossible state. It reports p50/p99 latency of successful swaps.
+
+Pass --p99-target-ms to also fail on slow swaps (250 ms is the target
+for MySQL). The default SQLite database allows only one writer at a time,
+so its tail latency under many threads is mostly lock waits.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-uri')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--swaps', type=int, default=400)
+    parser.add_argument('--charged', type=int, default=300, help='charged batteries stocked at the station')
+    parser.add_argument('--p99-target-ms', type=float)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URI'] = ARGS.database_uri or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from models import db, Battery, RFIDCard, Slot, Station, Swap, User  # noqa: E402
+
+
+def seed(args):
+    station = Station(name='Stress station')
+    db.session.add(station)
+    db.session.flush()
+    charged = [Battery(status='available', serial_number=f'CH{i:06d}', station_id=station.id)
+               for i in range(args.charged)]
+    held = [Battery(status='in_use', serial_number=f'HE{i:06d}') for i in range(args.swaps)]
+    db.session.add_all(charged + held)
+    db.session.flush()
+    db.session.add_all(Slot(station_id=station.id, slot_number=i + 1, battery_id=b.id, status='occupied')
+                       for i, b in enumerate(charged))
+    db.session.add_all(Slot(station_id=station.id, slot_number=args.charged + i + 1, status='empty')
+                       for i in range(args.swaps))
+    for i, battery in enumerate(held):
+        user = User(name=f'Rider {i}', email=f'rider{i}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(RFIDCard(user_id=user.id, rfid_code=f'CARD{i:06d}', assigned_battery_id=battery.id))
+    db.session.commit()
+    return station.id
+
+
+def run(args, station_id):
+    codes = [f'CARD{i:06d}' for i in range(args.swaps)]
+    lock = threading.Lock()
+    results = []
+
+    def worker(worker_codes):
+        client = app.test_client()
+        for code in worker_codes:
+            started = time.perf_counter()
+            response = client.post('/api/swaps/execute', json={'rfid_code': code, 'station_id': station_id})
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results.append((response.status_code, response.get_json(), elapsed))
+
+    threads = [threading.Thread(target=worker, args=(codes[i::args.threads],)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def check(args, results):
+    statuses = Counter(status for status, _, _ in results)
+    issued = [body['issued_battery_id'] for status, body, _ in results if status == 201]
+    duplicates = [battery_id for battery_id, n in Counter(issued).items() if n > 1]
+
+    problems = []
+    if duplicates:
+        problems.append(f'batteries issued more than once: {duplicates[:10]}')
+    if len(issued) != min(args.charged, args.swaps):
+        problems.append(f'expected {min(args.charged, args.swaps)} successful swaps, got {len(issued)}')
+    if Swap.query.count() != len(issued):
+        problems.append('swap rows do not match successful responses')
+    slot_batteries = [b for (b,) in db.session.query(Slot.battery_id).filter(Slot.battery_id.isnot(None))]
+    if len(slot_batteries) != len(set(slot_batteries)):
+        problems.append('a battery sits in more than one slot')
+    if set(slot_batteries) & set(issued):
+        problems.append('an issued battery is still in a slot')
+    assigned = [b for (b,) in db.session.query(RFIDCard.assigned_battery_id).filter(
+        RFIDCard.assigned_battery_id.isnot(None))]
+    if len(assigned) != len(set(assigned)):
+        problems.append('a battery is assigned to more than one card')
+    return statuses, problems
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        try:
+            station_id = seed(ARGS)
+            results, elapsed = run(ARGS, station_id)
+            statuses, problems = check(ARGS, results)
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+    latencies = sorted(ms for status, _, ms in results if status == 201)
+    p50 = statistics.median(latencies) if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(f'{len(results)} requests on {ARGS.threads} threads in {elapsed:.2f}s: {dict(statuses)}')
+    print(f'successful swap latency p50={p50:.1f} ms p99={p99:.1f} ms')
+    if ARGS.p99_target_ms is not None and p99 > ARGS.p99_target_ms:
+        problems.append(f'p99 {p99:.1f} ms exceeds target of {ARGS.p99_target_ms:.0f} ms')
+    for problem in problems:
+        print('FAIL:', problem)
+    if problems:
+        sys.exit(1)
+    print('OK: no double allocation')
+
+
+if __name__ == '__main__':
+    main()
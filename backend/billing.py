@@ -0,0 +1,286 @@
+import re
+import time
+from datetime import date, datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, or_
+from models import db, MonthlyBilling, SubscriptionPlan, Swap, User, UserMonthlyUsage
+
+MONTH_PATTERN = re.compile(r'^(\d{4})-(0[1-9]|1[0-2])$')
+UPSERT_BATCH_SIZE = 5000
+# Columns a billing run owns; payment fields are left alone on re-runs.
+COMPUTED_COLUMNS = ('total_ah_used', 'ah_included', 'ah_excess', 'total_amount_due')
+
+
+def month_bounds(month):
+    match = MONTH_PATTERN.match(month or '')
+    if not match:
+        raise ValueError(f"Billing month must look like YYYY-MM, got {month!r}")
+    year, number = int(match.group(1)), int(match.group(2))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def current_month():
+    return datetime.utcnow().strftime('%Y-%m')
+
+
+def previous_month(today=None):
+    today = today or date.today()
+    year, number = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    return f"{year:04d}-{number:02d}"
+
+
+def _usage_rows(start, end):
+    # One grouped pass over the month's swaps, joined to every user that is
+    # either on a plan (the fee is due even without swaps) or swapped at all.
+    usage = db.session.query(
+        Swap.user_id.label('user_id'),
+        func.sum(Swap.ah_used).label('ah_used')
+    ).filter(Swap.start_time >= start, Swap.start_time < end).group_by(Swap.user_id).subquery()
+
+    return db.session.query(
+        User.id,
+        SubscriptionPlan.monthly_fee,
+        SubscriptionPlan.included_ah,
+        SubscriptionPlan.extra_ah_rate,
+        usage.c.ah_used
+    ).outerjoin(
+        SubscriptionPlan, User.subscription_plan_id == SubscriptionPlan.id
+    ).outerjoin(
+        usage, usage.c.user_id == User.id
+    ).filter(or_(User.subscription_plan_id.isnot(None), usage.c.user_id.isnot(None))).all()
+
+
+def _invoice(month, user_id, monthly_fee, included_ah, extra_ah_rate, ah_used):
+    ah_used = float(ah_used or 0)
+    included = float(included_ah or 0)
+    excess = max(ah_used - included, 0.0)
+    return {
+        "user_id": user_id,
+        "billing_month": month,
+        "total_ah_used": round(ah_used, 3),
+        "ah_included": included,
+        "ah_excess": round(excess, 3),
+        "total_amount_due": round((monthly_fee or 0) + excess * (extra_ah_rate or 0), 2),
+        "payment_status": 'unpaid'
+    }
+
+
+def _upsert_statement(table, key_columns, update):
+    # INSERT that turns into an UPDATE on a duplicate key; update(new) maps
+    # column names to expressions in terms of the row that failed to insert.
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update(update(stmt.inserted))
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(index_elements=key_columns, set_=update(stmt.excluded))
+    return None
+
+
+def _upsert_fallback(month, invoices):
+    existing = dict(db.session.query(MonthlyBilling.user_id, MonthlyBilling.id).filter(
+        MonthlyBilling.billing_month == month))
+    updates = [dict({c: invoice[c] for c in COMPUTED_COLUMNS}, id=existing[invoice['user_id']])
+               for invoice in invoices if invoice['user_id'] in existing]
+    inserts = [invoice for invoice in invoices if invoice['user_id'] not in existing]
+    db.session.bulk_update_mappings(MonthlyBilling, updates)
+    db.session.bulk_insert_mappings(MonthlyBilling, inserts)
+
+
+def run_billing(month):
+    start, end = month_bounds(month)
+    started = time.perf_counter()
+    invoices = [_invoice(month, *row) for row in _usage_rows(start, end)]
+
+    stmt = _upsert_statement(MonthlyBilling.__table__, ['user_id', 'billing_month'],
+                             lambda new: {c: new[c] for c in COMPUTED_COLUMNS})
+    if stmt is None:
+        _upsert_fallback(month, invoices)
+    else:
+        now = datetime.utcnow()
+        for invoice in invoices:
+            invoice['created_at'] = now
+        for i in range(0, len(invoices), UPSERT_BATCH_SIZE):
+            db.session.execute(stmt, invoices[i:i + UPSERT_BATCH_SIZE])
+    db.session.commit()
+
+    return {
+        "billing_month": month,
+        "invoices": len(invoices),
+        "total_ah_used": round(sum(i['total_ah_used'] for i in invoices), 3),
+        "total_amount_due": round(sum(i['total_amount_due'] for i in invoices), 2),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def usage_month(start_time):
+    if isinstance(start_time, str):
+        try:
+            start_time = datetime.fromisoformat(start_time)
+        except ValueError:
+            return None
+    if isinstance(start_time, (date, datetime)):
+        return start_time.strftime('%Y-%m')
+    return None
+
+
+def record_swap_usage(user_id, start_time, ah_used, sign=1):
+    # Adds (sign=1) or removes (sign=-1) one swap from the user's running
+    # monthly totals inside the caller's transaction. The increment happens in
+    # the database, so concurrent swap writes for the same user cannot lose updates.
+    month = usage_month(start_time)
+    if user_id is None or month is None:
+        return
+    table = UserMonthlyUsage.__table__
+    row = {
+        "user_id": user_id,
+        "usage_month": month,
+        "ah_used": float(ah_used or 0) * sign,
+        "swap_count": sign,
+        "updated_at": datetime.utcnow()
+    }
+    stmt = _upsert_statement(table, ['user_id', 'usage_month'], lambda new: {
+        "ah_used": table.c.ah_used + new['ah_used'],
+        "swap_count": table.c.swap_count + new['swap_count'],
+        "updated_at": new['updated_at']
+    })
+    if stmt is not None:
+        db.session.execute(stmt, row)
+        return
+    usage = UserMonthlyUsage.query.filter_by(user_id=user_id, usage_month=month).with_for_update().first()
+    if usage is None:
+        db.session.add(UserMonthlyUsage(**row))
+    else:
+        usage.ah_used += row['ah_used']
+        usage.swap_count += sign
+
+
+def usage_summary(user, month):
+    month_bounds(month)
+    usage = UserMonthlyUsage.query.filter_by(user_id=user.id, usage_month=month).first()
+    plan = user.subscription_plan
+    ah_used = usage.ah_used if usage else 0.0
+    projected = _invoice(month, user.id, plan.monthly_fee if plan else None,
+                         plan.included_ah if plan else None, plan.extra_ah_rate if plan else None, ah_used)
+    return {
+        "user_id": user.id,
+        "month": month,
+        "ah_used": projected['total_ah_used'],
+        "swap_count": usage.swap_count if usage else 0,
+        "subscription_plan_id": plan.id if plan else None,
+        "ah_included": projected['ah_included'],
+        "ah_excess": projected['ah_excess'],
+        "projected_amount_due": projected['total_amount_due'],
+        "updated_at": str(usage.updated_at) if usage else None
+    }
+
+
+def _months_between(first, last):
+    year, number = first.year, first.month
+    while (year, number) <= (last.year, last.month):
+        yield f"{year:04d}-{number:02d}"
+        year, number = (year, number + 1) if number < 12 else (year + 1, 1)
+
+
+def usage_months():
+    first, last = db.session.query(func.min(Swap.start_time), func.max(Swap.start_time)).one()
+    months = set(_months_between(first, last)) if first is not None else set()
+    months.update(m for (m,) in db.session.query(UserMonthlyUsage.usage_month).distinct())
+    return sorted(months)
+
+
+def reconcile_usage(month, fix=True):
+    # Recomputes a month's totals from swaps and compares them with the running
+    # counters. Swaps written while this runs can be miscounted by the rewrite;
+    # running it again afterwards settles them.
+    start, end = month_bounds(month)
+    expected = {user_id: (float(ah_used), swap_count) for user_id, ah_used, swap_count in db.session.query(
+        Swap.user_id,
+        func.coalesce(func.sum(Swap.ah_used), 0),
+        func.count(Swap.id)
+    ).filter(
+        Swap.start_time >= start, Swap.start_time < end, Swap.user_id.isnot(None)
+    ).group_by(Swap.user_id)}
+    actual = {user_id: (ah_used, swap_count) for user_id, ah_used, swap_count in db.session.query(
+        UserMonthlyUsage.user_id, UserMonthlyUsage.ah_used, UserMonthlyUsage.swap_count
+    ).filter(UserMonthlyUsage.usage_month == month)}
+
+    drift = []
+    for user_id in sorted(expected.keys() | actual.keys()):
+        want = expected.get(user_id, (0.0, 0))
+        have = actual.get(user_id, (0.0, 0))
+        if want[1] != have[1] or abs(want[0] - have[0]) > 1e-6:
+            drift.append({"user_id": user_id,
+                          "expected": {"ah_used": round(want[0], 3), "swap_count": want[1]},
+                          "actual": {"ah_used": round(have[0], 3), "swap_count": have[1]}})
+
+    if fix and drift:
+        now = datetime.utcnow()
+        rows = [{"user_id": d['user_id'], "usage_month": month, "ah_used": expected.get(d['user_id'], (0.0, 0))[0],
+                 "swap_count": expected.get(d['user_id'], (0.0, 0))[1], "updated_at": now} for d in drift]
+        stmt = _upsert_statement(UserMonthlyUsage.__table__, ['user_id', 'usage_month'], lambda new: {
+            "ah_used": new['ah_used'], "swap_count": new['swap_count'], "updated_at": new['updated_at']})
+        if stmt is None:
+            db.session.query(UserMonthlyUsage).filter(
+                UserMonthlyUsage.usage_month == month,
+                UserMonthlyUsage.user_id.in_([r['user_id'] for r in rows])
+            ).delete(synchronize_session=False)
+            db.session.bulk_insert_mappings(UserMonthlyUsage, rows)
+        else:
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                db.session.execute(stmt, rows[i:i + UPSERT_BATCH_SIZE])
+        db.session.commit()
+
+    return {
+        "month": month,
+        "users_checked": len(expected.keys() | actual.keys()),
+        "drifted": len(drift),
+        "fixed": bool(fix and drift),
+        "drift": drift
+    }
+
+
+billing_cli = AppGroup('billing', help='Monthly billing runs.')
+
+
+@billing_cli.command('run')
+@click.option('--month', default=previous_month, show_default='previous month', help='Billing month as YYYY-MM.')
+def run_billing_command(month):
+    """Compute and upsert every user's invoice for MONTH."""
+    try:
+        summary = run_billing(month)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--month')
+    click.echo(f"{summary['invoices']} invoices for {summary['billing_month']}, "
+               f"{summary['total_amount_due']:.2f} due, in {summary['elapsed_ms']:.0f} ms")
+
+
+@billing_cli.command('reconcile-usage')
+@click.option('--month', default=current_month, show_default='current month', help='Usage month as YYYY-MM.')
+@click.option('--all', 'all_months', is_flag=True, help='Reconcile every month that has swaps or counters.')
+@click.option('--dry-run', is_flag=True, help='Report drift without rewriting the counters.')
+def reconcile_usage_command(month, all_months, dry_run):
+    """Rebuild per-user monthly usage counters from swaps and report drift."""
+    months = usage_months() if all_months else [month]
+    total = 0
+    for m in months:
+        try:
+            report = reconcile_usage(m, fix=not dry_run)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--month')
+        total += report['drifted']
+        click.echo(f"{m}: {report['users_checked']} users, {report['drifted']} drifted"
+                   + (", fixed" if report['fixed'] else ""))
+        for d in report['drift'][:10]:
+            click.echo(f"  user {d['user_id']}: expected {d['expected']}, found {d['actual']}")
+    if dry_run and total:
+        raise SystemExit(1)
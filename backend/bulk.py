@@ -0,0 +1,313 @@
+from flask import request, jsonify
+from sqlalchemy.exc import DataError, IntegrityError
+from models import db, DeletedRecord
+
+MAX_BULK_ITEMS = 10000
+IN_CHUNK_SIZE = 1000
+# Validation reads and the write are separate statements, so a concurrent
+# writer can take a unique key or delete a referenced row in between; the
+# constraint then fails the write, and the batch is validated again. A value
+# the database itself rejects (DataError) only fails its own item.
+BULK_WRITE_ATTEMPTS = 3
+CONFLICT_ERROR = "Conflicted with concurrent writes, retry"
+
+
+def _chunks(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def bulk_items(key='items'):
+    # Accepts a JSON array or an object wrapping it under key, e.g. {"items": [...]}
+    # or {"ids": [...]} for deletes; returns None when the body is neither.
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get(key)
+    return data if isinstance(data, list) else None
+
+
+def bulk_error(items):
+    if items is None:
+        return jsonify({"error": "Request body must be a JSON array or an object wrapping one"}), 400
+    if not items:
+        return jsonify({"error": "Batch is empty"}), 400
+    if len(items) > MAX_BULK_ITEMS:
+        return jsonify({"error": f"Batch too large: at most {MAX_BULK_ITEMS} items per request"}), 413
+    return None
+
+
+def bulk_response(results, status=200):
+    succeeded = sum('id' in result for result in results)
+    body = {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+    if not succeeded:
+        return jsonify({"error": "No valid items in batch", **body}), 400
+    return jsonify(body), status
+
+
+class BulkResource:
+    # Set-based create/update/delete for one model. Validation runs a fixed
+    # number of IN queries per batch (existing ids, foreign keys, unique keys,
+    # referencing rows) instead of lookups per item; every valid item is then
+    # written in one transaction and each item gets its own result.
+
+    def __init__(self, model, unique_key, required, fields, foreign_keys=None, tombstones=False):
+        self.model = model
+        self.table = model.__table__
+        self.unique_key = unique_key
+        self.required = required
+        self.fields = fields
+        self.foreign_keys = foreign_keys or {}
+        self.tombstones = tombstones
+
+    def _type_error(self, values):
+        for field, value in values.items():
+            if value is None:
+                continue
+            column_type = self.table.c[field].type
+            expected = column_type.python_type
+            if expected is float:
+                ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+            elif expected is int:
+                ok = isinstance(value, int) and not isinstance(value, bool)
+            else:
+                ok = isinstance(value, expected)
+            if not ok:
+                return f"Field {field} must be of type {expected.__name__}"
+            length = getattr(column_type, 'length', None)
+            if length is not None and isinstance(value, str) and len(value) > length:
+                return f"Field {field} must be at most {length} characters"
+        return None
+
+    def _defaults(self):
+        # executemany compiles one statement for every row, so each row carries
+        # every field, with the column's scalar default where it was left out.
+        defaults = {}
+        for field in self.fields:
+            default = self.table.c[field].default
+            defaults[field] = default.arg if default is not None and default.is_scalar else None
+        return defaults
+
+    def _key(self, values):
+        return tuple(values.get(column) for column in self.unique_key)
+
+    def _existing_keys(self, keys):
+        # {key: id} of stored rows holding any of the given unique keys. The
+        # first key column narrows the query; the rest are matched here.
+        first = getattr(self.model, self.unique_key[0])
+        columns = [getattr(self.model, column) for column in self.unique_key]
+        wanted = set(keys)
+        found = {}
+        for chunk in _chunks({key[0] for key in wanted}):
+            for row in db.session.query(self.model.id, *columns).filter(first.in_(chunk)):
+                key = tuple(row[1:])
+                if key in wanted:
+                    found[key] = row[0]
+        return found
+
+    def _existing_ids(self, model, ids):
+        found = set()
+        for chunk in _chunks(set(ids)):
+            found.update(i for (i,) in db.session.query(model.id).filter(model.id.in_(chunk)))
+        return found
+
+    def _current(self, ids):
+        current = {}
+        columns = [getattr(self.model, field) for field in self.fields]
+        for chunk in _chunks(set(ids)):
+            for row in db.session.query(self.model.id, *columns).filter(self.model.id.in_(chunk)):
+                current[row[0]] = dict(zip(self.fields, row[1:]))
+        return current
+
+    def _foreign_key_errors(self, items):
+        errors = {}
+        for field, target in self.foreign_keys.items():
+            ids = {values[field] for _, values in items if values.get(field) is not None}
+            missing = ids - self._existing_ids(target, ids)
+            for index, values in items:
+                if values.get(field) in missing:
+                    errors.setdefault(index, f"{target.__name__} with id {values[field]} not found")
+        return errors
+
+    def _claim_keys(self, items, errors, stored, own_ids=None):
+        # Rejects keys held by another stored row or by an earlier item in the batch.
+        claimed = {}
+        for index, values in items:
+            if index in errors:
+                continue
+            key = self._key(values)
+            holder = stored.get(key)
+            own_id = own_ids.get(index) if own_ids else None
+            if key in claimed or (holder is not None and holder != own_id):
+                errors[index] = f"{', '.join(self.unique_key)} {', '.join(map(str, key))} already exists"
+            else:
+                claimed[key] = index
+
+    def _write(self, item_errors, validate, write):
+        # Validates and writes the batch; returns the written (index, values)
+        # and the errors. validate(errors) adds item errors and returns the
+        # valid items, write(rows) sends them.
+        attempts = 0
+        while True:
+            errors = dict(item_errors)
+            valid = validate(errors)
+            try:
+                write([values for _, values in valid])
+                db.session.commit()
+                return valid, errors
+            except IntegrityError:
+                db.session.rollback()
+                attempts += 1
+                if attempts == BULK_WRITE_ATTEMPTS:
+                    errors.update((index, CONFLICT_ERROR) for index, _ in valid)
+                    return [], errors
+            except DataError:
+                db.session.rollback()
+                rejected = self._rejected(valid, write)
+                if not rejected:
+                    raise
+                item_errors = {**item_errors, **rejected}
+
+    def _rejected(self, valid, write):
+        # Writes each item alone and rolls it back, to find those the database
+        # rejects; the batch is then written again without them.
+        rejected = {}
+        for index, values in valid:
+            try:
+                write([values])
+            except DataError as e:
+                rejected[index] = f"Rejected by the database: {e.orig}"
+            except IntegrityError:
+                pass
+            finally:
+                db.session.rollback()
+        return rejected
+
+    def create(self, payload):
+        # Returns the per-item results and the ids of the inserted rows.
+        errors, items, defaults = {}, [], self._defaults()
+        for index, item in enumerate(payload):
+            if not isinstance(item, dict):
+                errors[index] = "Item must be a JSON object"
+                continue
+            missing = [field for field in self.required if item.get(field) in (None, '')]
+            if missing:
+                errors[index] = f"Missing required fields: {', '.join(missing)}"
+                continue
+            values = dict(defaults, **{field: item[field] for field in self.fields if field in item})
+            error = self._type_error(values)
+            if error:
+                errors[index] = error
+                continue
+            items.append((index, values))
+
+        def validate(errors):
+            errors.update(self._foreign_key_errors(items))
+            self._claim_keys(items, errors, self._existing_keys([self._key(v) for _, v in items]))
+            return [(index, values) for index, values in items if index not in errors]
+
+        def write(rows):
+            for chunk in _chunks(rows, 5000):
+                db.session.execute(self.table.insert(), chunk)
+
+        valid, errors = self._write(errors, validate, write)
+
+        rows = [values for _, values in valid]
+        ids = self._existing_keys([self._key(values) for values in rows])
+        created = [ids[self._key(values)] for values in rows]
+        results = [{"index": index, "id": i} for (index, _), i in zip(valid, created)]
+        return self._results(results, errors), created
+
+    def update(self, payload):
+        # Returns the per-item results and {id: previous values} of the updated rows.
+        errors, items = {}, []
+        for index, item in enumerate(payload):
+            if not isinstance(item, dict) or not isinstance(item.get('id'), int) or isinstance(item['id'], bool):
+                errors[index] = "Item must be a JSON object with an integer id"
+                continue
+            items.append((index, item))
+
+        current = self._current(item['id'] for _, item in items)
+        merged, own_ids, seen = [], {}, set()
+        for index, item in items:
+            if item['id'] not in current:
+                errors[index] = f"{self.model.__name__} with id {item['id']} not found"
+            elif item['id'] in seen:
+                errors[index] = f"{self.model.__name__} with id {item['id']} appears more than once"
+            elif any(field in item and item[field] in (None, '') for field in self.required):
+                errors[index] = f"Fields {', '.join(self.required)} cannot be empty"
+            else:
+                seen.add(item['id'])
+                changes = {field: item[field] for field in self.fields if field in item}
+                error = self._type_error(changes)
+                if error:
+                    errors[index] = error
+                    continue
+                merged.append((index, dict(current[item['id']], **changes), dict(changes, id=item['id'])))
+                own_ids[index] = item['id']
+
+        def validate(errors):
+            errors.update(self._foreign_key_errors([(index, changes) for index, _, changes in merged]))
+            self._claim_keys([(index, values) for index, values, _ in merged], errors,
+                             self._existing_keys([self._key(values) for _, values, _ in merged]), own_ids)
+            return [(index, changes) for index, _, changes in merged if index not in errors]
+
+        valid, errors = self._write(errors, validate,
+                                    lambda rows: db.session.bulk_update_mappings(self.model, rows))
+        results = [{"index": index, "id": changes['id']} for index, changes in valid]
+        return self._results(results, errors), {changes['id']: current[changes['id']] for _, changes in valid}
+
+    def _referenced_ids(self, ids):
+        # Ids still referenced by a foreign key from any other table.
+        referenced = {}
+        for table in db.metadata.sorted_tables:
+            for fk in table.foreign_keys:
+                if fk.column.table is not self.table or table is self.table:
+                    continue
+                for chunk in _chunks(ids):
+                    for (i,) in db.session.query(fk.parent).filter(fk.parent.in_(chunk)).distinct():
+                        referenced.setdefault(i, []).append(table.name)
+        return referenced
+
+    def delete(self, payload):
+        # Returns the per-item results and {id: previous values} of the deleted rows.
+        errors, ids, seen = {}, [], set()
+        for index, value in enumerate(payload):
+            if not isinstance(value, int) or isinstance(value, bool):
+                errors[index] = "Item must be an integer id"
+            elif value in seen:
+                errors[index] = f"{self.model.__name__} with id {value} appears more than once"
+            else:
+                seen.add(value)
+                ids.append((index, value))
+
+        existing = self._current(i for _, i in ids)
+        referenced = self._referenced_ids([i for _, i in ids if i in existing])
+        valid = []
+        for index, i in ids:
+            if i not in existing:
+                errors[index] = f"{self.model.__name__} with id {i} not found"
+            elif i in referenced:
+                errors[index] = f"{self.model.__name__} with id {i} is still referenced by {', '.join(sorted(set(referenced[i])))}"
+            else:
+                valid.append((index, i))
+
+        deleted = {i: existing[i] for _, i in valid}
+        for chunk in _chunks(deleted):
+            db.session.query(self.model).filter(self.model.id.in_(chunk)).delete(synchronize_session=False)
+        if self.tombstones and deleted:
+            db.session.bulk_insert_mappings(DeletedRecord, [
+                {"table_name": self.table.name, "record_id": i} for i in deleted])
+        db.session.commit()
+        return self._results([{"index": index, "id": i} for index, i in valid], errors), deleted
+
+    def load(self, ids, *options):
+        rows = []
+        for chunk in _chunks(ids):
+            rows.extend(self.model.query.options(*options).filter(self.model.id.in_(chunk)).order_by(self.model.id))
+        return rows
+
+    def _results(self, results, errors):
+        results.extend({"index": index, "error": error} for index, error in errors.items())
+        results.sort(key=lambda result: result["index"])
+        return results
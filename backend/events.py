@@ -0,0 +1,258 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from models import db, EventLog
+
+RESYNC = object()
+RELAY_POLL_BATCH = 1000
+RELAY_MAX_GAPS = 1000
+RELAY_PURGE_SECONDS = 60.0
+RELAY_RETRY_SECONDS = 5.0
+
+
+class Subscription:
+    def __init__(self, types, queue_size):
+        self.types = types
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lagging = False
+
+    def offer(self, event):
+        if self.types and event[1] not in self.types:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A client that cannot keep up is told to resync from a snapshot
+            # rather than letting its backlog grow without bound.
+            self.lagging = True
+
+    def next(self, timeout):
+        if self.lagging:
+            return RESYNC
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    # In-process fan-out of change events to this process's SSE subscribers. A
+    # short history lets reconnecting clients resume from Last-Event-ID; anything
+    # older than the history gets a resync so the client refetches its snapshot.
+    # On its own it only reaches subscribers of the process that published the
+    # event, so it suits a single worker; with an EventRelay attached, published
+    # events go through the database and every process delivers all of them.
+    # Event types with a listener are internal: they go to the listeners of
+    # every process and never to SSE subscribers.
+
+    def __init__(self, history=1000, queue_size=1000, max_subscribers=1000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.relay = None
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._seq = 0
+
+    def listen(self, event_type, callback):
+        self._listeners.setdefault(event_type, []).append(callback)
+
+    def publish(self, event_type, data):
+        if self.relay is not None:
+            self.relay.enqueue(event_type, data)
+            return
+        if event_type in self._listeners:
+            self._notify(event_type, data)
+            return
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def deliver(self, event):
+        # Fans out an event that already carries its id (from the relay).
+        if event[1] in self._listeners:
+            self.advance(event[0])
+            self._notify(event[1], event[2])
+            return
+        with self._lock:
+            self._seq = max(self._seq, event[0])
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def _notify(self, event_type, data):
+        for callback in self._listeners[event_type]:
+            callback(data)
+
+    def advance(self, event_id):
+        # Moves the newest id forward without an event, for a relay that starts
+        # after events it will never deliver.
+        with self._lock:
+            self._seq = max(self._seq, event_id)
+
+    def last_id(self):
+        with self._lock:
+            return self._seq
+
+    def subscribe(self, types=None, last_event_id=None):
+        subscription = Subscription(set(types or ()), self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None and last_event_id < self._seq:
+                oldest = self._history[0][0] if self._history else self._seq + 1
+                if last_event_id + 1 < oldest:
+                    subscription.lagging = True
+                else:
+                    for event in self._history:
+                        if event[0] > last_event_id:
+                            subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class EventRelay:
+    # Cross-process fan-out through the event_log table. publish() only queues
+    # the event in memory; a background thread writes the queue in one insert
+    # every poll_interval seconds, then reads every row added since its last
+    # poll, by any process, and delivers it to the local broker with the row id
+    # as the event id, so Last-Event-ID means the same on every worker.
+    # Concurrent inserts can commit out of id order, so ids a poll skipped over
+    # are looked up again for gap_timeout seconds. Rows older than retention
+    # seconds are purged.
+
+    def __init__(self, broker, poll_interval=0.25, retention=3600, gap_timeout=5.0):
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.retention = timedelta(seconds=retention)
+        self.gap_timeout = gap_timeout
+        self._lock = threading.Lock()
+        self._outbox = []
+        self._last_id = None
+        self._gaps = {}
+        self._purged_at = 0.0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['event_relay'] = self
+        self.broker.relay = self
+        self._thread = threading.Thread(target=self._run, name='event-relay', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def enqueue(self, event_type, data):
+        # Encoded now, so later changes to data do not leak into the event.
+        row = {"event_type": event_type, "payload": json.dumps(data), "created_at": datetime.utcnow()}
+        with self._lock:
+            self._outbox.append(row)
+
+    def stop(self):
+        if not self._stopping.is_set():
+            self._stopping.set()
+            if self._thread is not None:
+                self._thread.join()
+
+    def _run(self):
+        # Writes whatever is still queued once stop() is called. While the
+        # database is unreachable it logs once and retries every few seconds.
+        failing = False
+        while True:
+            stopping = self._stopping.wait(RELAY_RETRY_SECONDS if failing else self.poll_interval)
+            with self._app.app_context():
+                try:
+                    if self._last_id is None:
+                        self._start()
+                    self._flush()
+                    if not stopping:
+                        self._poll()
+                        self._purge()
+                    failing = False
+                except Exception:
+                    if not failing:
+                        self._app.logger.exception("Event relay failed; retrying")
+                    failing = True
+            if stopping:
+                return
+
+    def _flush(self):
+        with self._lock:
+            rows, self._outbox = self._outbox, []
+        if rows:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(EventLog.__table__.insert(), rows)
+            except Exception:
+                with self._lock:
+                    self._outbox[:0] = rows
+                raise
+
+    def _start(self):
+        # Begins after the newest stored event, before this process writes any.
+        with db.engine.connect() as connection:
+            self._last_id = connection.execute(select(func.max(EventLog.__table__.c.id))).scalar() or 0
+        self.broker.advance(self._last_id)
+
+    def _poll(self):
+        table = EventLog.__table__
+        columns = (table.c.id, table.c.event_type, table.c.payload)
+        with db.engine.connect() as connection:
+            rows = connection.execute(select(*columns).where(table.c.id > self._last_id)
+                                      .order_by(table.c.id).limit(RELAY_POLL_BATCH)).all()
+            late = []
+            if self._gaps:
+                late = connection.execute(select(*columns).where(table.c.id.in_(list(self._gaps)))).all()
+
+        now = time.monotonic()
+        for event_id, event_type, payload in late:
+            if self._gaps.pop(event_id, None) is not None:
+                self.broker.deliver((event_id, event_type, json.loads(payload)))
+        for event_id, event_type, payload in rows:
+            for missing in range(self._last_id + 1, min(event_id, self._last_id + 1 + RELAY_MAX_GAPS)):
+                self._gaps[missing] = now
+            self._last_id = event_id
+            self.broker.deliver((event_id, event_type, json.loads(payload)))
+        # Ids skipped by a rolled-back insert never show up.
+        self._gaps = {event_id: seen for event_id, seen in self._gaps.items() if now - seen < self.gap_timeout}
+
+    def _purge(self):
+        now = time.monotonic()
+        if now - self._purged_at < RELAY_PURGE_SECONDS:
+            return
+        self._purged_at = now
+        with db.engine.begin() as connection:
+            connection.execute(EventLog.__table__.delete().where(
+                EventLog.__table__.c.created_at < datetime.utcnow() - self.retention))
+
+
+broker = EventBroker(max_subscribers=int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 1000)))
+
+
+def publish(event_type, data):
+    broker.publish(event_type, data)
+
+
+def format_event(event):
+    seq, event_type, data = event
+    return f"id: {seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,39 @@
+# Production launcher: `gunicorn -c gunicorn.conf.py` from backend/.
+# Every setting can be overridden from the environment.
+import multiprocessing
+import os
+
+wsgi_app = os.environ.get('GUNICORN_APP', 'app:app')
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# gthread workers serve each request on a thread from a fixed pool, so a
+# worker never holds more than `threads` database connections at once; keep
+# DB_POOL_SIZE >= GUNICORN_THREADS.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# An open /api/events stream holds its thread for as long as the client stays
+# connected. Serve the stream from gunicorn_events.conf.py (gevent) and route
+# /api/events there at the proxy; streams that still reach these workers are
+# capped at half the threads so they cannot take the whole pool.
+if worker_class == 'gthread':
+    os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(max(threads // 2, 1)))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks do not build up; the jitter keeps
+# them from restarting together.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# The app is imported in each worker, so every worker opens its own pool and
+# starts its own background threads rather than inheriting them across fork.
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
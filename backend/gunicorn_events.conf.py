@@ -0,0 +1,27 @@
+# Launcher for the /api/events Server-Sent Events stream:
+# `gunicorn -c gunicorn_events.conf.py` from backend/, next to the API launcher
+# in gunicorn.conf.py, with the proxy routing /api/events here.
+# gevent workers serve every open stream as a greenlet instead of a pool
+# thread, so one worker holds hundreds of subscribers. Events published by the
+# API workers reach these workers through the event_log relay (EVENTS_FANOUT
+# must stay `database`). Every setting can be overridden from the environment.
+import os
+
+wsgi_app = os.environ.get('GUNICORN_APP', 'app:app')
+bind = os.environ.get('EVENTS_GUNICORN_BIND', '0.0.0.0:5001')
+
+worker_class = 'gevent'
+workers = int(os.environ.get('EVENTS_WORKERS', 1))
+worker_connections = int(os.environ.get('EVENTS_WORKER_CONNECTIONS', 1000))
+os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(worker_connections - 10))
+
+# Streams never finish on their own; don't hold restarts for them.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('EVENTS_GRACEFUL_TIMEOUT', 5))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
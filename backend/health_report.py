@@ -0,0 +1,189 @@
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select
+from models import db, Battery, BatteryHealthLog, BatteryHealthRollup
+
+REPORT_WINDOW = timedelta(days=int(os.environ.get('HEALTH_REPORT_WINDOW_DAYS', 180)))
+MIN_SAMPLES = 5
+# A pack is at its end of life for swapping below this SoH.
+EOL_SOH = 70.0
+# Flag packs whose fitted trend crosses a limit within this many more cycles.
+FORECAST_CYCLES = 200
+MAX_RESISTANCE_DRIFT_PERCENT = 25.0
+MAX_CELL_IMBALANCE = 0.1
+MAX_RISK_SCORE = 10.0
+REPORT_METRICS = ('soh_percent', 'internal_resist', 'cell_voltage_diff')
+LOAD_CHUNK_SIZE = 100000
+
+
+def _load_columns(source, since, battery_ids=None):
+    # Pulls only the columns the fit needs and returns them as one float array
+    # per column, NULLs as NaN. Rows are read straight from the DBAPI cursor in
+    # chunks: building arrays from SQLAlchemy Row objects is ~20x slower than
+    # from the driver's plain tuples. Rollups stand in for raw logs with one
+    # averaged point per bucket.
+    if source == 'raw':
+        table = BatteryHealthLog.__table__
+        columns = [table.c.battery_id, table.c.cycle_count] + [table.c[m] for m in REPORT_METRICS]
+        filters = [table.c.created_at >= since]
+    else:
+        table = BatteryHealthRollup.__table__
+        columns = [table.c.battery_id, table.c.cycle_count] + [table.c[m + '_avg'] for m in REPORT_METRICS]
+        filters = [table.c.resolution == source, table.c.bucket_start >= since]
+    if battery_ids is not None:
+        filters.append(table.c.battery_id.in_(battery_ids))
+    result = db.session.execute(select(*columns).where(*filters))
+    chunks = [np.empty((0, len(columns)))]
+    try:
+        while True:
+            rows = result.cursor.fetchmany(LOAD_CHUNK_SIZE)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        result.close()
+    return np.ascontiguousarray(np.concatenate(chunks).T)
+
+
+def _grouped_fit(group, x, y, n_groups):
+    # Least-squares line y = intercept + slope * x for every battery at once
+    # from per-battery sums; readings missing either value get zero weight.
+    ok = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(ok, x, 0.0)
+    y = np.where(ok, y, 0.0)
+    n = np.bincount(group, ok, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(group, x, n_groups) / n
+        mean_y = np.bincount(group, y, n_groups) / n
+        sxx = np.bincount(group, x * x, n_groups) - n * mean_x * mean_x
+        sxy = np.bincount(group, x * y, n_groups) - n * mean_x * mean_y
+        slope = np.where((n >= MIN_SAMPLES) & (sxx > 0), sxy / sxx, np.nan)
+    return slope, mean_y - slope * mean_x
+
+
+def _finite(value, digits):
+    return round(float(value), digits) + 0.0 if np.isfinite(value) else None
+
+
+def compute_report(columns):
+    # columns: battery_id, cycle_count, soh, internal resistance and cell
+    # imbalance arrays. Returns per-battery arrays; nothing loops per battery.
+    # Battery ids are dense primary keys, so a lookup table numbers the groups
+    # in one pass instead of sorting every reading.
+    ids = columns[0].astype(np.int64)
+    battery_ids = np.flatnonzero(np.bincount(ids))
+    lookup = np.zeros(battery_ids[-1] + 1 if len(battery_ids) else 1, dtype=np.int64)
+    lookup[battery_ids] = np.arange(len(battery_ids))
+    group = lookup[ids]
+    n_groups = len(battery_ids)
+    cycles = columns[1]
+    has_cycles = ~np.isnan(cycles)
+    first = np.full(n_groups, np.inf)
+    last = np.full(n_groups, -np.inf)
+    np.minimum.at(first, group[has_cycles], cycles[has_cycles])
+    np.maximum.at(last, group[has_cycles], cycles[has_cycles])
+
+    soh_slope, soh_intercept = _grouped_fit(group, cycles, columns[2], n_groups)
+    res_slope, res_intercept = _grouped_fit(group, cycles, columns[3], n_groups)
+    imb_slope, imb_intercept = _grouped_fit(group, cycles, columns[4], n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        soh_now = soh_intercept + soh_slope * last
+        cycles_to_eol = np.where(soh_now <= EOL_SOH, 0.0,
+                                 np.where(soh_slope < 0, (soh_now - EOL_SOH) / -soh_slope, np.inf))
+        res_start = res_intercept + res_slope * first
+        res_now = res_intercept + res_slope * last
+        res_drift = np.where(res_start > 0, (res_now - res_start) / res_start * 100, np.nan)
+        imb_now = imb_intercept + imb_slope * last
+        imb_forecast = imb_now + np.maximum(imb_slope, 0) * FORECAST_CYCLES
+
+        # Each score is 1.0 where its metric reaches the limit, so >= 1 means at risk.
+        scores = np.stack([
+            np.clip(FORECAST_CYCLES / cycles_to_eol, 0, MAX_RISK_SCORE),
+            np.clip(res_drift / MAX_RESISTANCE_DRIFT_PERCENT, 0, MAX_RISK_SCORE),
+            np.clip(imb_forecast / MAX_CELL_IMBALANCE, 0, MAX_RISK_SCORE),
+        ])
+    scores = np.nan_to_num(scores, nan=0.0)
+    return {
+        "battery_id": battery_ids,
+        "samples": np.bincount(group, minlength=n_groups),
+        "first_cycle": first,
+        "last_cycle": last,
+        "soh_now": soh_now,
+        "soh_slope": soh_slope,
+        "cycles_to_eol": cycles_to_eol,
+        "resistance_now": res_now,
+        "resistance_drift": res_drift,
+        "imbalance_now": imb_now,
+        "imbalance_slope": imb_slope,
+        "scores": scores,
+        "risk_score": scores.max(axis=0),
+    }
+
+
+def _battery_entry(report, i, battery):
+    scores = report['scores'][:, i]
+    reasons = [reason for reason, score in zip(('soh_degradation', 'resistance_drift', 'cell_imbalance'), scores)
+               if score >= 1]
+    return {
+        "battery_id": int(report['battery_id'][i]),
+        "serial_number": battery.serial_number if battery else None,
+        "battery_type": battery.battery_type if battery else None,
+        "station_id": battery.station_id if battery else None,
+        "samples": int(report['samples'][i]),
+        "cycle_range": [_finite(report['first_cycle'][i], 0), _finite(report['last_cycle'][i], 0)],
+        "soh": {
+            "current": _finite(report['soh_now'][i], 2),
+            "slope_per_100_cycles": _finite(report['soh_slope'][i] * 100, 4),
+            "cycles_to_eol": _finite(report['cycles_to_eol'][i], 0)
+        },
+        "internal_resist": {
+            "current": _finite(report['resistance_now'][i], 4),
+            "drift_percent": _finite(report['resistance_drift'][i], 2)
+        },
+        "cell_imbalance": {
+            "current": _finite(report['imbalance_now'][i], 4),
+            "slope_per_100_cycles": _finite(report['imbalance_slope'][i] * 100, 5)
+        },
+        "risk_score": round(float(scores.max()), 3),
+        "reasons": reasons
+    }
+
+
+def default_source():
+    has_daily = db.session.query(BatteryHealthRollup.id).filter(BatteryHealthRollup.resolution == '1d').first()
+    return '1d' if has_daily else 'raw'
+
+
+def health_report(source=None, since=None, battery_ids=None, limit=50, include_all=False):
+    started = time.perf_counter()
+    source = source or default_source()
+    since = since or datetime.utcnow() - REPORT_WINDOW
+    columns = _load_columns(source, since, battery_ids)
+    loaded = time.perf_counter()
+
+    report = compute_report(columns)
+    risk = report['risk_score']
+    candidates = np.arange(len(risk)) if include_all else np.flatnonzero(risk >= 1)
+    ranked = candidates[np.argsort(-risk[candidates], kind='stable')][:limit]
+    batteries = {b.id: b for b in Battery.query.filter(
+        Battery.id.in_([int(report['battery_id'][i]) for i in ranked]))} if len(ranked) else {}
+
+    return {
+        "source": source,
+        "since": since.isoformat(),
+        "readings": columns.shape[1],
+        "batteries_analysed": len(risk),
+        "at_risk": int((risk >= 1).sum()),
+        "thresholds": {
+            "eol_soh": EOL_SOH,
+            "forecast_cycles": FORECAST_CYCLES,
+            "max_resistance_drift_percent": MAX_RESISTANCE_DRIFT_PERCENT,
+            "max_cell_imbalance": MAX_CELL_IMBALANCE
+        },
+        "data": [_battery_entry(report, i, batteries.get(int(report['battery_id'][i]))) for i in ranked],
+        "load_ms": round((loaded - started) * 1000, 1),
+        "compute_ms": round((time.perf_counter() - loaded) * 1000, 1)
+    }
@@ -0,0 +1,201 @@
+import os
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, func
+from models import db, BatteryHealthLog, BatteryHealthRollup
+from analytics import time_bucket, parse_bucket
+
+ROLLUP_METRICS = ('soh_percent', 'pack_voltage', 'cell_voltage_diff', 'max_temp', 'internal_resist')
+# Each resolution is built from the next finer one, so a refresh never rescans
+# more raw readings than the minute rollup needs.
+RESOLUTIONS = {
+    '1m': ('minute', None),
+    '1h': ('hour', '1m'),
+    '1d': ('day', '1h'),
+}
+LOOKBACK = timedelta(minutes=int(os.environ.get('HEALTH_ROLLUP_LOOKBACK_MINUTES', 60)))
+PURGE_BATCH_SIZE = int(os.environ.get('HEALTH_PURGE_BATCH_SIZE', 5000))
+# Days of data kept per resolution; daily rollups are kept forever.
+RETENTION_DAYS = {
+    'raw': int(os.environ.get('HEALTH_LOG_RETENTION_DAYS', 30)),
+    '1m': int(os.environ.get('HEALTH_ROLLUP_1M_RETENTION_DAYS', 14)),
+    '1h': int(os.environ.get('HEALTH_ROLLUP_1H_RETENTION_DAYS', 400)),
+}
+# Finest resolution whose points for the requested span stay in the low thousands.
+AUTO_RESOLUTIONS = (
+    ('raw', timedelta(hours=2)),
+    ('1m', timedelta(days=2)),
+    ('1h', timedelta(days=90)),
+)
+
+
+def floor_bucket(value, resolution):
+    value = value.replace(second=0, microsecond=0)
+    if resolution in ('1h', '1d'):
+        value = value.replace(minute=0)
+    if resolution == '1d':
+        value = value.replace(hour=0)
+    return value
+
+
+def _newest_bucket(resolution):
+    return db.session.query(func.max(BatteryHealthRollup.bucket_start)).filter(
+        BatteryHealthRollup.resolution == resolution).scalar()
+
+
+def _next_refresh_since(resolution):
+    newest = _newest_bucket(resolution)
+    return floor_bucket(newest - LOOKBACK, resolution) if newest else None
+
+
+def _aggregate_raw(bucket, since, until):
+    log = BatteryHealthLog
+    columns = [log.battery_id, bucket, func.count(log.id)]
+    for metric in ROLLUP_METRICS:
+        column = getattr(log, metric)
+        columns += [func.min(column), func.avg(column), func.max(column)]
+    columns.append(func.max(log.cycle_count))
+    return db.session.query(*columns).filter(
+        log.created_at >= since, log.created_at < until
+    ).group_by(log.battery_id, bucket)
+
+
+def _aggregate_rollup(source, bucket, since, until):
+    # Averages of averages are weighted by sample count; cycle counts only grow,
+    # so the bucket's last value is its maximum.
+    rollup = BatteryHealthRollup
+    columns = [rollup.battery_id, bucket, func.sum(rollup.samples)]
+    for metric in ROLLUP_METRICS:
+        avg = getattr(rollup, metric + '_avg')
+        weight = func.sum(case((avg.isnot(None), rollup.samples), else_=0))
+        columns += [func.min(getattr(rollup, metric + '_min')),
+                    func.sum(avg * rollup.samples) / func.nullif(weight, 0),
+                    func.max(getattr(rollup, metric + '_max'))]
+    columns.append(func.max(rollup.cycle_count))
+    return db.session.query(*columns).filter(
+        rollup.resolution == source, rollup.bucket_start >= since, rollup.bucket_start < until
+    ).group_by(rollup.battery_id, bucket)
+
+
+def refresh_rollup(resolution, since=None, until=None):
+    # Rebuilds [since, until) for one resolution. Without since it resumes a
+    # lookback before the newest bucket, which picks up late or batched readings.
+    granularity, source = RESOLUTIONS[resolution]
+    until = until or datetime.utcnow()
+    if since is None:
+        since = _next_refresh_since(resolution)
+    if since is None:
+        if source is None:
+            since = db.session.query(func.min(BatteryHealthLog.created_at)).scalar()
+        else:
+            since = db.session.query(func.min(BatteryHealthRollup.bucket_start)).filter(
+                BatteryHealthRollup.resolution == source).scalar()
+        if since is None:
+            return {"resolution": resolution, "since": None, "buckets": 0}
+    since = floor_bucket(since, resolution)
+
+    if source is None:
+        rows = _aggregate_raw(time_bucket(BatteryHealthLog.created_at, granularity), since, until).all()
+    else:
+        rows = _aggregate_rollup(source, time_bucket(BatteryHealthRollup.bucket_start, granularity), since, until).all()
+
+    names = ['samples'] + [f"{metric}_{stat}" for metric in ROLLUP_METRICS for stat in ('min', 'avg', 'max')] + ['cycle_count']
+    db.session.query(BatteryHealthRollup).filter(
+        BatteryHealthRollup.resolution == resolution,
+        BatteryHealthRollup.bucket_start >= since,
+        BatteryHealthRollup.bucket_start < until
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(BatteryHealthRollup, [
+        dict(zip(names, row[2:]), battery_id=row[0], resolution=resolution, bucket_start=parse_bucket(row[1]))
+        for row in rows
+    ])
+    db.session.commit()
+    return {"resolution": resolution, "since": since.isoformat(), "buckets": len(rows)}
+
+
+def refresh_all(since=None):
+    return [refresh_rollup(resolution, since) for resolution in RESOLUTIONS]
+
+
+def _purge_cutoff(level, now):
+    # Never purge data the next incremental refresh of the coarser level still reads.
+    coarser = {'raw': '1m', '1m': '1h', '1h': '1d'}[level]
+    covered = _next_refresh_since(coarser)
+    if covered is None:
+        return None
+    return min(now - timedelta(days=RETENTION_DAYS[level]), covered)
+
+
+def _purge_level(level, cutoff, max_batches):
+    if level == 'raw':
+        model, time_column, scope = BatteryHealthLog, BatteryHealthLog.created_at, []
+    else:
+        model, time_column = BatteryHealthRollup, BatteryHealthRollup.bucket_start
+        scope = [BatteryHealthRollup.resolution == level]
+    deleted = 0
+    for _ in range(max_batches):
+        # Small id batches keep each delete's locks and undo log short.
+        ids = [row_id for (row_id,) in db.session.query(model.id).filter(
+            time_column < cutoff, *scope).order_by(time_column).limit(PURGE_BATCH_SIZE)]
+        if not ids:
+            break
+        db.session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < PURGE_BATCH_SIZE:
+            break
+    return deleted
+
+
+def purge_expired(max_batches=100):
+    now = datetime.utcnow()
+    report = {}
+    for level in RETENTION_DAYS:
+        cutoff = _purge_cutoff(level, now)
+        report[level] = {
+            "cutoff": cutoff.isoformat() if cutoff else None,
+            "deleted": _purge_level(level, cutoff, max_batches) if cutoff else 0
+        }
+    return report
+
+
+def pick_resolution(since, until, now=None):
+    now = now or datetime.utcnow()
+    for resolution, max_span in AUTO_RESOLUTIONS:
+        retained_from = now - timedelta(days=RETENTION_DAYS[resolution])
+        if until - since <= max_span and since >= retained_from:
+            if resolution == 'raw' or _newest_bucket(resolution) is not None:
+                return resolution
+    # Until the rollup job has run there is nothing coarser than the raw logs.
+    return '1d' if _newest_bucket('1d') is not None else 'raw'
+
+
+def serialize_rollup(rollup):
+    item = {"bucket_start": rollup.bucket_start.isoformat(), "samples": rollup.samples}
+    for metric in ROLLUP_METRICS:
+        item[metric] = {stat: getattr(rollup, f"{metric}_{stat}") for stat in ('min', 'avg', 'max')}
+    item["cycle_count"] = rollup.cycle_count
+    return item
+
+
+health_cli = AppGroup('health', help='Battery health telemetry rollups and retention.')
+
+
+@health_cli.command('rollup')
+@click.option('--since', type=click.DateTime(), help='Rebuild from this time instead of resuming.')
+def rollup_command(since):
+    """Downsample health logs into 1m, 1h and 1d buckets."""
+    for result in refresh_all(since):
+        click.echo(f"{result['resolution']}: {result['buckets']} buckets rebuilt from {result['since']}")
+
+
+@health_cli.command('purge')
+@click.option('--max-batches', default=100, show_default=True, help='Delete at most this many batches per level.')
+def purge_command(max_batches):
+    """Delete raw logs and rollups older than their retention period."""
+    for level, result in purge_expired(max_batches).items():
+        if result['cutoff'] is None:
+            click.echo(f"{level}: skipped, the coarser rollup has not run yet")
+        else:
+            click.echo(f"{level}: {result['deleted']} rows older than {result['cutoff']} deleted")
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_LOG_STATEMENTS = 20
+SLOW_LOG_STATEMENT_CHARS = 500
+
+# Per-request counters of the current thread (greenlet under gevent), set
+# only while a request is being handled so SQL from background threads such
+# as the health-log writer is not attributed to a request.
+_current = threading.local()
+_listening = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and getattr(_current, 'stats', None) is not None:
+        context._request_metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_current, 'stats', None)
+    started = getattr(context, '_request_metrics_started', None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats[0] += 1
+    stats[1] += elapsed
+    stats[2].append((elapsed, statement))
+
+
+def _listen():
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+class _EndpointStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'sql_queries', 'sql_seconds', 'response_bytes', 'errors', 'slow')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.errors = 0
+        self.slow = 0
+
+
+class RequestMetrics:
+    # Latency histogram, SQL query count and time, response bytes and 5xx
+    # errors per Flask endpoint, kept in process memory and rendered in the
+    # Prometheus text format. Each gunicorn worker counts its own requests and
+    # labels its series with its pid. Requests slower than slow_request_ms are
+    # logged with their slowest SQL statements. Streamed responses are timed
+    # until their headers are returned and their body size is not counted.
+
+    def __init__(self, slow_request_ms=500.0):
+        self.slow_request_seconds = slow_request_ms / 1000.0
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._requests = {}
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['request_metrics'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._clear)
+        _listen()
+
+    def _start(self):
+        _current.started = time.perf_counter()
+        _current.stats = [0, 0.0, []]
+
+    def _clear(self, error=None):
+        _current.stats = None
+
+    def _finish(self, response):
+        stats = getattr(_current, 'stats', None)
+        if stats is None:
+            return response
+        _current.stats = None
+        elapsed = time.perf_counter() - _current.started
+        endpoint = request.endpoint or 'unmatched'
+        slow = elapsed >= self.slow_request_seconds
+        # Measuring a streamed body would drain its generator before it is sent.
+        size = None if response.is_streamed else response.calculate_content_length()
+        self._record(endpoint, request.method, response.status_code, elapsed, stats, size, slow)
+        if slow:
+            self._log_slow(endpoint, response.status_code, elapsed, stats)
+        return response
+
+    def _record(self, endpoint, method, status, elapsed, stats, size, slow):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = _EndpointStats()
+            entry.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            entry.count += 1
+            entry.seconds += elapsed
+            entry.sql_queries += stats[0]
+            entry.sql_seconds += stats[1]
+            entry.response_bytes += size or 0
+            entry.errors += status >= 500
+            entry.slow += slow
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def _log_slow(self, endpoint, status, elapsed, stats):
+        statements = sorted(stats[2], key=lambda item: item[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+        lines = [f"{seconds * 1000:8.1f} ms  {' '.join(statement.split())[:SLOW_LOG_STATEMENT_CHARS]}"
+                 for seconds, statement in statements]
+        self._app.logger.warning(
+            "Slow request %s %s (%s) -> %d in %.1f ms, %d SQL queries in %.1f ms%s",
+            request.method, request.full_path.rstrip('?'), endpoint, status, elapsed * 1000,
+            stats[0], stats[1] * 1000, ''.join('\n  ' + line for line in lines))
+
+    def metrics_snapshot(self):
+        with self._lock:
+            return {endpoint: {"requests": entry.count, "seconds": entry.seconds,
+                               "sql_queries": entry.sql_queries, "sql_seconds": entry.sql_seconds,
+                               "response_bytes": entry.response_bytes, "errors": entry.errors}
+                    for endpoint, entry in self._endpoints.items()}
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            requests = sorted(self._requests.items())
+        pid = os.getpid()
+        out = [
+            '# HELP bss_http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE bss_http_requests_total counter',
+        ]
+        out.extend(f'bss_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}",pid="{pid}"}} {count}'
+                   for (endpoint, method, status), count in requests)
+
+        out.append('# HELP bss_http_request_duration_seconds Request latency until the response headers are ready.')
+        out.append('# TYPE bss_http_request_duration_seconds histogram')
+        for endpoint, entry in endpoints:
+            labels = f'endpoint="{endpoint}",pid="{pid}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, entry.buckets):
+                cumulative += count
+                out.append(f'bss_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            out.append(f'bss_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry.count}')
+            out.append(f'bss_http_request_duration_seconds_sum{{{labels}}} {entry.seconds}')
+            out.append(f'bss_http_request_duration_seconds_count{{{labels}}} {entry.count}')
+
+        for name, help_text, attribute in (
+            ('bss_http_request_sql_queries_total', 'SQL statements executed while handling requests.', 'sql_queries'),
+            ('bss_http_request_sql_seconds_total', 'Time spent executing SQL while handling requests.', 'sql_seconds'),
+            ('bss_http_response_bytes_total', 'Bytes in non-streamed response bodies.', 'response_bytes'),
+            ('bss_http_request_errors_total', 'Requests answered with a 5xx status.', 'errors'),
+            ('bss_http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', 'slow'),
+        ):
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} counter')
+            out.extend(f'{name}{{endpoint="{endpoint}",pid="{pid}"}} {getattr(entry, attribute)}'
+                       for endpoint, entry in endpoints)
+        return '\n'.join(out) + '\n'
@@ -0,0 +1,39 @@
+"""billing run constraints
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:02:34.993401
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Billing runs upsert on (user_id, billing_month); duplicate rows entered by
+    # hand must be merged before upgrading. The unique index is created before
+    # the old one is dropped so MySQL always has an index for the user_id FK.
+    with op.batch_alter_table('monthly_billing', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_monthly_billing_user_month', ['user_id', 'billing_month'])
+        batch_op.drop_index('ix_monthly_billing_user_month')
+
+    with op.batch_alter_table('swaps', schema=None) as batch_op:
+        batch_op.create_index('ix_swaps_start_user_ah', ['start_time', 'user_id', 'ah_used'], unique=False)
+        batch_op.drop_index('ix_swaps_start')
+
+
+def downgrade():
+    with op.batch_alter_table('swaps', schema=None) as batch_op:
+        batch_op.create_index('ix_swaps_start', ['start_time'], unique=False)
+        batch_op.drop_index('ix_swaps_start_user_ah')
+
+    with op.batch_alter_table('monthly_billing', schema=None) as batch_op:
+        batch_op.create_index('ix_monthly_billing_user_month', ['user_id', 'billing_month'], unique=False)
+        batch_op.drop_constraint('uq_monthly_billing_user_month', type_='unique')
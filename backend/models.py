@@ -1,11 +1,14 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date
+from replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 
 # ---------------- USERS ----------------
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_updated', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
@@ -51,6 +54,11 @@ class RFIDCard(db.Model):
 # ---------------- BATTERIES ----------------
 class Battery(db.Model):
     __tablename__ = 'batteries'
+    __table_args__ = (
+        db.Index('ix_batteries_station_status', 'station_id', 'status'),
+        db.Index('ix_batteries_status', 'status'),
+        db.Index('ix_batteries_updated', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     station_id = db.Column(db.Integer, db.ForeignKey('stations.id'))
     status = db.Column(db.String(50), nullable=False)  # e.g., 'available', 'in_use', 'charging'
@@ -68,6 +76,10 @@ class Battery(db.Model):
 # ---------------- BATTERY HEALTH LOGS ----------------
 class BatteryHealthLog(db.Model):
     __tablename__ = 'battery_health_logs'
+    __table_args__ = (
+        db.Index('ix_battery_health_logs_battery_created', 'battery_id', 'created_at'),
+        db.Index('ix_battery_health_logs_created', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     battery_id = db.Column(db.Integer, db.ForeignKey('batteries.id'), nullable=False)
     soh_percent = db.Column(db.Float)
@@ -86,9 +98,14 @@ class BatteryHealthLog(db.Model):
 # ---------------- STATIONS ----------------
 class Station(db.Model):
     __tablename__ = 'stations'
+    __table_args__ = (
+        db.Index('ix_stations_updated', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     location = db.Column(db.String(255))
     name = db.Column(db.String(255))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -98,17 +115,30 @@ class Station(db.Model):
 # ---------------- SLOTS ----------------
 class Slot(db.Model):
     __tablename__ = 'slots'
+    __table_args__ = (
+        db.UniqueConstraint('station_id', 'slot_number', name='uq_slots_station_slot_number'),
+        db.Index('ix_slots_station_status', 'station_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     station_id = db.Column(db.Integer, db.ForeignKey('stations.id'), nullable=False)
     slot_number = db.Column(db.Integer, nullable=False)
     battery_id = db.Column(db.Integer, db.ForeignKey('batteries.id'), nullable=True)
     status = db.Column(db.String(50), default='empty')  # 'empty', 'occupied', 'faulty'
     is_charging = db.Column(db.Boolean, default=False)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 # ---------------- SWAPS ----------------
 class Swap(db.Model):
     __tablename__ = 'swaps'
+    __table_args__ = (
+        db.Index('ix_swaps_user_start', 'user_id', 'start_time'),
+        # Leading start_time serves time-range filters; user_id and ah_used make it
+        # covering for the billing run's per-user aggregation over a month.
+        db.Index('ix_swaps_start_user_ah', 'start_time', 'user_id', 'ah_used'),
+        db.Index('ix_swaps_pickup_station_start', 'pickup_station_id', 'start_time'),
+        db.Index('ix_swaps_deposit_station_start', 'deposit_station_id', 'start_time'),
+        db.Index('ix_swaps_updated', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     issued_battery_id = db.Column(db.Integer, db.ForeignKey('batteries.id'))
     returned_battery_id = db.Column(db.Integer, db.ForeignKey('batteries.id'))
@@ -126,6 +156,11 @@ class Swap(db.Model):
 # ---------------- MONTHLY BILLING ----------------
 class MonthlyBilling(db.Model):
     __tablename__ = 'monthly_billing'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'billing_month', name='uq_monthly_billing_user_month'),
+        db.Index('ix_monthly_billing_month', 'billing_month'),
+        db.Index('ix_monthly_billing_status_month', 'payment_status', 'billing_month'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     billing_month = db.Column(db.String(10))
@@ -136,4 +171,205 @@ class MonthlyBilling(db.Model):
     paid_amount = db.Column(db.Float)
     payment_status = db.Column(db.String(50))
     payment_date = db.Column(db.Date)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserMonthlyUsage(db.Model):
+    # Running per-user/month totals kept in step with swap writes
+    __tablename__ = 'user_monthly_usage'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'usage_month', name='uq_user_monthly_usage_user_month'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    usage_month = db.Column(db.String(7), nullable=False)
+    ah_used = db.Column(db.Float, nullable=False, default=0)
+    swap_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ---------------- DELETED RECORDS ----------------
+class DeletedRecord(db.Model):
+    # Tombstones written by the delete routes so /api/sync can report deletions
+    __tablename__ = 'deleted_records'
+    __table_args__ = (
+        db.Index('ix_deleted_records_table_deleted', 'table_name', 'deleted_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def for_row(cls, row):
+        return cls(table_name=row.__tablename__, record_id=row.id)
+
+# ---------------- ANALYTICS ROLLUPS ----------------
+class SwapHourlyRollup(db.Model):
+    # Swaps and Ah per pickup station per hour, rebuilt by `flask analytics refresh-rollup`
+    __tablename__ = 'swap_hourly_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('bucket_start', 'station_id', name='uq_swap_hourly_rollup_bucket_station'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    station_id = db.Column(db.Integer, db.ForeignKey('stations.id'), nullable=False)
+    swap_count = db.Column(db.Integer, nullable=False, default=0)
+    ah_used = db.Column(db.Float, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BatteryHealthRollup(db.Model):
+    # Per-battery health readings downsampled to 1m/1h/1d buckets by `flask health rollup`
+    __tablename__ = 'battery_health_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('battery_id', 'resolution', 'bucket_start', name='uq_battery_health_rollups_bucket'),
+        db.Index('ix_battery_health_rollups_resolution_bucket', 'resolution', 'bucket_start'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    battery_id = db.Column(db.Integer, db.ForeignKey('batteries.id'), nullable=False)
+    resolution = db.Column(db.String(8), nullable=False)  # '1m', '1h', '1d'
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    samples = db.Column(db.Integer, nullable=False)
+    soh_percent_min = db.Column(db.Float)
+    soh_percent_avg = db.Column(db.Float)
+    soh_percent_max = db.Column(db.Float)
+    pack_voltage_min = db.Column(db.Float)
+    pack_voltage_avg = db.Column(db.Float)
+    pack_voltage_max = db.Column(db.Float)
+    cell_voltage_diff_min = db.Column(db.Float)
+    cell_voltage_diff_avg = db.Column(db.Float)
+    cell_voltage_diff_max = db.Column(db.Float)
+    max_temp_min = db.Column(db.Float)
+    max_temp_avg = db.Column(db.Float)
+    max_temp_max = db.Column(db.Float)
+    internal_resist_min = db.Column(db.Float)
+    internal_resist_avg = db.Column(db.Float)
+    internal_resist_max = db.Column(db.Float)
+    cycle_count = db.Column(db.Integer)
+
+# ---------------- EVENTS ----------------
+class EventLog(db.Model):
+    # Change events shared by every worker process; the id is the SSE event id
+    __tablename__ = 'event_log'
+    __table_args__ = (
+        db.Index('ix_event_log_created', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# ---------------- SERIALIZATION ----------------
+class Schema:
+    # One serializer per model: its column names plus fields read through a
+    # many-to-one relationship, as {name: (relationship, column)}. For each set
+    # of fields it compiles, once, a function that builds the dict straight
+    # from a row tuple, rendering dates as text, together with the matching
+    # column list. List routes therefore SELECT only the requested columns,
+    # outer-join a related table only when one of its fields is requested, and
+    # never build ORM instances. dump() serializes an instance the same way,
+    # for single-row routes and events.
+
+    def __init__(self, model, columns, related=None):
+        self.model = model
+        self.columns = list(columns)
+        self.related = related or {}
+        self.names = self.columns + list(self.related)
+        self._projections = {}
+        self._dumpers = {}
+
+    def _column(self, name):
+        if name in self.related:
+            return self.related[name][1]
+        return getattr(self.model, name)
+
+    def _to_text(self, name, value, from_row):
+        # Rows always carry date/datetime objects, and calling isoformat()
+        # directly is faster than str(), which returns the same text. Instance
+        # attributes may still hold the raw value assigned by a route.
+        column_type = self._column(name).type
+        if not isinstance(column_type, (db.Date, db.DateTime)):
+            return value
+        if not from_row:
+            return f"(None if {value} is None else str({value}))"
+        separator = "' '" if isinstance(column_type, db.DateTime) else ''
+        return f"(None if {value} is None else {value}.isoformat({separator}))"
+
+    def _compile(self, names, values, from_row):
+        # values[i] is the expression reading names[i] from source; the body is
+        # a single dict display, with no per-field calls or loops at run time.
+        items = [f"{name!r}: {self._to_text(name, value, from_row)}" for name, value in zip(names, values)]
+        namespace = {}
+        exec(f"def serialize(source):\n    return {{{', '.join(items)}}}\n", namespace)
+        return namespace['serialize']
+
+    def projection(self, names=None):
+        names = tuple(names or self.names)
+        compiled = self._projections.get(names)
+        if compiled is None:
+            # Relationships declared through backrefs exist once mappers are configured.
+            db.configure_mappers()
+            columns = [self._column(name).label(name) for name in names]
+            if 'id' not in names:
+                # Keyset pagination reads the cursor from the row's id.
+                columns.append(self.model.id.label('id'))
+            serialize = self._compile(names, [f"source[{i}]" for i in range(len(names))], True)
+            joins = list(dict.fromkeys(self.related[name][0] for name in names if name in self.related))
+            compiled = self._projections[names] = (columns, joins, serialize)
+        return compiled
+
+    def select(self, names=None):
+        columns, joins, serialize = self.projection(names)
+        query = db.session.query(*columns).select_from(self.model)
+        for relationship in joins:
+            query = query.outerjoin(getattr(self.model, relationship))
+        return query, serialize
+
+    def dump(self, obj, names=None):
+        names = tuple(names or self.names)
+        dumper = self._dumpers.get(names)
+        if dumper is None:
+            values = []
+            for name in names:
+                if name in self.related:
+                    relationship, column = self.related[name]
+                    values.append(f"(source.{relationship}.{column.key} if source.{relationship} is not None else None)")
+                else:
+                    values.append(f"source.{name}")
+            dumper = self._dumpers[names] = self._compile(names, values, False)
+        return dumper(obj)
+
+
+user_schema = Schema(User, [
+    'id', 'name', 'email', 'phone', 'address', 'license_number', 'license_expiry',
+    'motocycle_model', 'motocycle_year', 'subscription_plan_id', 'subscription_start',
+    'is_active', 'role', 'created_at', 'updated_at'
+])
+
+subscription_plan_schema = Schema(SubscriptionPlan, ['id', 'name', 'monthly_fee', 'included_ah', 'extra_ah_rate'])
+
+rfid_card_schema = Schema(RFIDCard, [
+    'id', 'user_id', 'rfid_code', 'assigned_battery_id', 'issued_at', 'status'
+], related={'user_email': ('user', User.email)})
+
+battery_schema = Schema(Battery, [
+    'id', 'station_id', 'status', 'serial_number', 'battery_type', 'battery_capacity',
+    'manufacture_date', 'created_at', 'updated_at'
+])
+
+battery_health_log_schema = Schema(BatteryHealthLog, [
+    'id', 'battery_id', 'soh_percent', 'pack_voltage', 'cell_voltage_min', 'cell_voltage_max',
+    'cell_voltage_diff', 'max_temp', 'ambient_temp', 'humidity', 'internal_resist', 'cycle_count',
+    'error_code', 'created_at'
+], related={'battery_serial': ('battery', Battery.serial_number)})
+
+station_schema = Schema(Station, ['id', 'location', 'name', 'latitude', 'longitude', 'created_at', 'updated_at'])
+
+swap_schema = Schema(Swap, [
+    'id', 'issued_battery_id', 'returned_battery_id', 'user_id', 'pickup_station_id',
+    'deposit_station_id', 'start_time', 'end_time', 'battery_percentage_start',
+    'battery_percentage_end', 'ah_used', 'created_at', 'updated_at'
+], related={'user_name': ('user', User.name), 'user_email': ('user', User.email)})
+
+monthly_billing_schema = Schema(MonthlyBilling, [
+    'id', 'user_id', 'billing_month', 'total_ah_used', 'ah_included', 'ah_excess',
+    'total_amount_due', 'paid_amount', 'payment_status', 'payment_date', 'created_at'
+], related={'user_name': ('user', User.name), 'user_email': ('user', User.email)})
@@ -0,0 +1,100 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from flask import request
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class InvalidParameter(ValueError):
+    pass
+
+
+def encode_cursor(last_id):
+    return urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse=int):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return parse(urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidParameter(f"Invalid cursor: {cursor}")
+
+
+def int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidParameter(f"Query parameter '{name}' must be an integer")
+
+
+def float_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidParameter(f"Query parameter '{name}' must be a number")
+
+
+def int_list_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return []
+    try:
+        return [int(v) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise InvalidParameter(f"Query parameter '{name}' must be a comma-separated list of integers")
+
+
+def datetime_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidParameter(f"Query parameter '{name}' must be an ISO 8601 datetime")
+
+
+def fields_arg(allowed):
+    # ?fields=id,status,... selects a subset of a route's fields, in that order.
+    value = request.args.get('fields')
+    if not value:
+        return allowed
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown or not names:
+        raise InvalidParameter(f"Query parameter 'fields' must list fields from: {', '.join(allowed)}")
+    return names
+
+
+def limit_arg():
+    limit = int_arg('limit')
+    if limit is None:
+        return DEFAULT_LIMIT
+    if limit < 1:
+        raise InvalidParameter("Query parameter 'limit' must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def paginate(query, key_column, serialize, parse=int):
+    # Keyset pagination on a monotonically increasing key (the primary key, which
+    # follows insertion order and therefore created_at). Fetching one extra row
+    # tells us whether another page exists without a COUNT(*). Any other unique
+    # key works too, given parse to read it back from the cursor.
+    limit = limit_arg()
+    after = request.args.get('after')
+    if after:
+        query = query.filter(key_column > decode_cursor(after, parse))
+
+    rows = query.order_by(key_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(getattr(rows[-1], key_column.key)) if has_more else None
+    return {"data": [serialize(row) for row in rows], "next_cursor": next_cursor}
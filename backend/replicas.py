@@ -0,0 +1,186 @@
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm, text
+from sqlalchemy.exc import DBAPIError
+
+READ_METHODS = ('GET', 'HEAD')
+PRIMARY_COOKIE = 'read_primary_until'
+PRIMARY_HEADER = 'X-Read-Consistency'
+# MySQL ER_SPECIFIC_ACCESS_DENIED_ERROR: SHOW SLAVE STATUS needs REPLICATION CLIENT.
+ACCESS_DENIED_ERRNO = 1227
+
+
+class ReplicaRouter:
+    # Read replicas, one engine per URI with the primary's engine options, kept
+    # out of SQLALCHEMY_BINDS so create_all and migrations never touch them.
+    # Routes marked with @replica_reads pick one replica per request,
+    # round-robin over those that passed their last health check; with none
+    # healthy they read from the primary. A background thread pings every replica each check_interval
+    # seconds (and, on MySQL, drops replicas lagging more than max_lag
+    # seconds); a connection error on a replica takes it out at once. A
+    # replica whose user may not read its replication status stays in rotation
+    # with its lag unknown. A read that fails on a replica is retried once on
+    # the primary.
+    # A successful write sets a cookie that keeps that client's reads on the
+    # primary for sticky_seconds, so it reads its own writes.
+
+    def __init__(self, uris, check_interval=5.0, max_lag=10.0, sticky_seconds=5):
+        self.uris = {f'replica_{i}': uri for i, uri in enumerate(uris, 1)}
+        self.keys = list(self.uris)
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self._lock = threading.Lock()
+        self._healthy = {key: True for key in self.keys}
+        self._cycle = itertools.cycle(self.keys)
+        self._stats = {key: 0 for key in self.keys}
+        self._stats["primary"] = 0
+        self._engines = {}
+        self._lag_unknown = set()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['replica_router'] = self
+        app.after_request(self._pin_writer)
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        for key, uri in self.uris.items():
+            self._engines[key] = create_engine(uri, **options)
+            event.listen(self._engines[key], 'handle_error', self._on_error(key))
+        self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+        self._thread.start()
+
+    def engine(self, key):
+        return self._engines[key]
+
+    def choose(self):
+        # Returns the key of the next healthy replica, or None for the primary.
+        with self._lock:
+            for _ in range(len(self.keys)):
+                key = next(self._cycle)
+                if self._healthy[key]:
+                    self._stats[key] += 1
+                    return key
+            self._stats["primary"] += 1
+            return None
+
+    def pins_primary(self):
+        if request.headers.get(PRIMARY_HEADER, '').lower() == 'primary':
+            return True
+        try:
+            return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _pin_writer(self, response):
+        if request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400:
+            response.set_cookie(PRIMARY_COOKIE, str(int(time.time()) + self.sticky_seconds),
+                                max_age=self.sticky_seconds, httponly=True)
+        return response
+
+    def mark(self, key, healthy, reason=None):
+        with self._lock:
+            changed = self._healthy[key] != healthy
+            self._healthy[key] = healthy
+        if changed:
+            if healthy:
+                self._app.logger.warning("Read replica %s is back in rotation", key)
+            else:
+                self._app.logger.warning("Read replica %s taken out of rotation: %s", key, reason)
+
+    def _on_error(self, key):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark(key, False, context.original_exception)
+        return handle_error
+
+    def check(self, key):
+        try:
+            with self.engine(key).connect() as connection:
+                connection.execute(text('SELECT 1'))
+                if connection.dialect.name == 'mysql':
+                    status = self._replication_status(key, connection)
+                    if status is not None:
+                        lag = status.get('Seconds_Behind_Master')
+                        if lag is None or lag > self.max_lag:
+                            self.mark(key, False, f"replication lag {lag}")
+                            return False
+        except Exception as e:  # noqa: BLE001 - any failure takes the replica out
+            self.mark(key, False, e)
+            return False
+        self.mark(key, True)
+        return True
+
+    def _replication_status(self, key, connection):
+        try:
+            return connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+        except DBAPIError as e:
+            if getattr(e.orig, 'errno', None) != ACCESS_DENIED_ERRNO:
+                raise
+            if key not in self._lag_unknown:
+                self._lag_unknown.add(key)
+                self._app.logger.warning("Read replica %s: cannot read replication status, lag unknown: %s",
+                                         key, e.orig)
+            return None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            for key in self.keys:
+                self.check(key)
+            self._stopping.wait(self.check_interval)
+
+    def stop(self):
+        self._stopping.set()
+        for engine in self._engines.values():
+            engine.dispose()
+
+    def metrics_snapshot(self):
+        with self._lock:
+            return {"replicas": dict(self._healthy), "reads": dict(self._stats)}
+
+
+def replica_reads(view):
+    # Serves a read-only GET route from a replica; see ReplicaRouter.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('replica_router')
+        if router is not None and request.method in READ_METHODS and not router.pins_primary():
+            g.read_replica = router.choose()
+            if g.read_replica is not None:
+                try:
+                    return view(*args, **kwargs)
+                except DBAPIError as e:
+                    current_app.logger.warning("Read on replica %s failed, retrying on the primary: %s",
+                                               g.read_replica, e.orig)
+                    current_app.extensions['sqlalchemy'].db.session.remove()
+                    g.read_replica = None
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+    # Sends SELECTs to the request's replica. Flushes and any other statement go
+    # to the primary, and once the session has written, so do its later reads.
+
+    def __init__(self, db, **options):
+        self._wrote = False
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._wrote:
+            key = g.get('read_replica') if g else None
+            if key is not None:
+                if not self._flushing and getattr(clause, 'is_select', False):
+                    return self.app.extensions['replica_router'].engine(key)
+                self._wrote = True
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
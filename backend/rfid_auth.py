@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from events import broker
+from models import db, RFIDCard, User, SubscriptionPlan, rfid_card_schema, user_schema, subscription_plan_schema
+
+NOT_FOUND = object()
+INVALIDATE_EVENT = 'rfid_auth.invalidate'
+
+
+class RFIDAuthCache:
+    # Card, user and plan for each rfid_code, loaded in one joined query and
+    # kept as plain dicts in an LRU of at most maxsize codes. Unknown codes are
+    # cached too, so a tap with an unregistered card does not hit the database
+    # again until ttl expires or a card with that code is created. Writes to
+    # cards, users and plans invalidate the affected codes, in this process at
+    # once and in every other worker through the broker's event_log relay, so a
+    # deactivated card is denied everywhere within a relay poll. Entries still
+    # expire after ttl seconds in case an invalidation is lost.
+
+    def __init__(self, maxsize=100000, ttl=60.0, broker=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._version = 0
+        self._stats = {"hits": 0, "misses": 0}
+        if broker is not None:
+            broker.listen(INVALIDATE_EVENT, self._apply)
+
+    def get(self, rfid_code):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(rfid_code)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(rfid_code)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            version = self._version
+
+        record = _load(rfid_code)
+        with self._lock:
+            if self._version != version:
+                # An invalidation landed while loading; serve this result uncached.
+                return record
+            self._forget(rfid_code)
+            self._entries[rfid_code] = (now, record)
+            if record is not NOT_FOUND:
+                self._by_user.setdefault(record["user"]["id"], set()).add(rfid_code)
+            while len(self._entries) > self.maxsize:
+                self._forget(next(iter(self._entries)))
+            return record
+
+    def _forget(self, rfid_code):
+        entry = self._entries.pop(rfid_code, None)
+        if entry is not None and entry[1] is not NOT_FOUND:
+            codes = self._by_user.get(entry[1]["user"]["id"])
+            if codes is not None:
+                codes.discard(rfid_code)
+                if not codes:
+                    del self._by_user[entry[1]["user"]["id"]]
+
+    def invalidate(self, *rfid_codes):
+        self._broadcast({"codes": list(rfid_codes)})
+
+    def invalidate_user(self, user_id):
+        self._broadcast({"user_id": user_id})
+
+    def clear(self):
+        self._broadcast({"all": True})
+
+    def _broadcast(self, invalidation):
+        self._apply(invalidation)
+        if self.broker is not None:
+            self.broker.publish(INVALIDATE_EVENT, invalidation)
+
+    def _apply(self, invalidation):
+        with self._lock:
+            self._version += 1
+            if invalidation.get("all"):
+                self._entries.clear()
+                self._by_user.clear()
+                return
+            codes = invalidation.get("codes") or list(self._by_user.get(invalidation.get("user_id"), ()))
+            for rfid_code in codes:
+                self._forget(rfid_code)
+
+    def metrics_snapshot(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+
+def _load(rfid_code):
+    row = db.session.query(RFIDCard, User, SubscriptionPlan).outerjoin(
+        User, User.id == RFIDCard.user_id
+    ).outerjoin(
+        SubscriptionPlan, SubscriptionPlan.id == User.subscription_plan_id
+    ).filter(RFIDCard.rfid_code == rfid_code).first()
+    if row is None or row[1] is None:
+        return NOT_FOUND
+    card, user, plan = row
+    return {
+        "card": rfid_card_schema.dump(card),
+        "user": user_schema.dump(user),
+        "plan": subscription_plan_schema.dump(plan) if plan else None
+    }
+
+
+rfid_auth_cache = RFIDAuthCache(
+    maxsize=int(os.environ.get('RFID_AUTH_CACHE_SIZE', 100000)),
+    ttl=float(os.environ.get('RFID_AUTH_CACHE_TTL', 60.0)),
+    broker=broker
+)
+
+
+def authorize(rfid_code, today=None):
+    # Returns None for an unknown card. The decision and the subscription state
+    # depend on today's date, so they are derived per tap rather than cached.
+    record = rfid_auth_cache.get(rfid_code)
+    if record is NOT_FOUND:
+        return None
+    card, user, plan = record["card"], record["user"], record["plan"]
+    today = (today or date.today()).isoformat()
+    subscription_active = bool(user["is_active"]) and plan is not None and (
+        user["subscription_start"] is None or user["subscription_start"] <= today)
+
+    reason = None
+    if card["status"] != 'active':
+        reason = f"RFID card is not active (status: {card['status']})"
+    elif not user["is_active"]:
+        reason = "User is not active"
+    return dict(record, authorized=reason is None, reason=reason, subscription={
+        "active": subscription_active,
+        "plan_id": user["subscription_plan_id"],
+        "start": user["subscription_start"]
+    })
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from pagination import datetime_arg, int_list_arg, InvalidParameter
+from analytics import check_window, swap_series, station_status_counts, soh_by_battery_type
+from replicas import replica_reads
+
+analytics_bp = Blueprint('analytics', __name__)
+
+DEFAULT_WINDOW = timedelta(days=7)
+
+def _series_args():
+    granularity = request.args.get('granularity', 'day')
+    until = datetime_arg('until') or datetime.utcnow()
+    since = datetime_arg('since') or until - DEFAULT_WINDOW
+    source = request.args.get('source') or ('rollup' if current_app.config.get('ANALYTICS_ROLLUP') else 'live')
+    if source not in ('live', 'rollup'):
+        raise InvalidParameter("Query parameter 'source' must be live or rollup")
+    try:
+        check_window(granularity, since, until)
+    except ValueError as e:
+        raise InvalidParameter(str(e))
+    return granularity, since, until, source
+
+def _series_response(granularity, since, until, source, data):
+    return jsonify({
+        "granularity": granularity,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "source": source,
+        "data": data
+    })
+
+@analytics_bp.route('/analytics/swaps_per_station', methods=['GET'])
+@replica_reads
+def get_swaps_per_station():
+    granularity, since, until, source = _series_args()
+    data = swap_series(granularity, since, until, int_list_arg('station_id'), by_station=True, source=source)
+    return _series_response(granularity, since, until, source, data)
+
+@analytics_bp.route('/analytics/ah_throughput', methods=['GET'])
+@replica_reads
+def get_ah_throughput():
+    granularity, since, until, source = _series_args()
+    data = swap_series(granularity, since, until, int_list_arg('station_id'), by_station=False, source=source)
+    return _series_response(granularity, since, until, source, data)
+
+@analytics_bp.route('/analytics/station_status', methods=['GET'])
+@replica_reads
+def get_station_status():
+    return jsonify({"data": station_status_counts(int_list_arg('station_id'))})
+
+@analytics_bp.route('/analytics/battery_health', methods=['GET'])
+@replica_reads
+def get_battery_health_by_type():
+    return jsonify({"data": soh_by_battery_type()})
@@ -0,0 +1,19 @@
+from flask import Blueprint, request, jsonify
+from rfid_auth import authorize, rfid_auth_cache
+
+auth_bp = Blueprint('auth', __name__)
+
+@auth_bp.route('/auth/rfid', methods=['POST'])
+def authenticate_rfid():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('rfid_code'), str) or not data['rfid_code']:
+        return jsonify({"error": "Missing required field: rfid_code"}), 400
+
+    result = authorize(data['rfid_code'])
+    if result is None:
+        return jsonify({"error": "RFID card not found"}), 404
+    return jsonify(result)
+
+@auth_bp.route('/auth/rfid/cache_metrics', methods=['GET'])
+def get_rfid_auth_cache_metrics():
+    return jsonify(rfid_auth_cache.metrics_snapshot())
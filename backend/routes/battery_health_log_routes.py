@@ -1,13 +1,33 @@
-from flask import Blueprint, request, jsonify
-from models import db, BatteryHealthLog, Battery
+import json
+from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import func
+from models import db, BatteryHealthLog, BatteryHealthRollup, Battery, battery_health_log_schema
+from pagination import int_list_arg, datetime_arg, fields_arg, limit_arg, paginate, InvalidParameter
+from streaming import list_response, json_response, requested_format, NDJSON_MIMETYPE
+from health_rollups import RESOLUTIONS, floor_bucket, pick_resolution, serialize_rollup
+from health_report import health_report
+from anomaly import detector
+from telemetry import validate_readings, insert_readings, process_readings, publish_alerts, INSERT_COLUMNS, ERROR_CODE_COLUMN, MAX_BATCH_SIZE
+from replicas import replica_reads
 
 battery_health_log_bp = Blueprint('battery_health_log', __name__)
 
+LOG_FIELDS = battery_health_log_schema.columns
+
 @battery_health_log_bp.route('/battery_health_logs', methods=['POST'])
 def create_battery_health_log():
     data = request.get_json()
     if not data or not data.get('battery_id'):
         return jsonify({"error": "Missing required field: battery_id"}), 400
+
+    buffer = current_app.extensions.get('health_log_buffer')
+    if buffer is not None:
+        reading = dict(data)
+        reading.setdefault('created_at', datetime.utcnow().isoformat())
+        if not buffer.submit(reading):
+            return jsonify({"error": "Ingestion buffer is full, retry later"}), 429, {"Retry-After": "1"}
+        return jsonify({"message": "BatteryHealthLog accepted"}), 202
     
     battery = Battery.query.get(data['battery_id'])
     if not battery:
@@ -29,49 +49,79 @@ def create_battery_health_log():
     )
     db.session.add(new_log)
     db.session.commit()
+    reading = battery_health_log_schema.dump(new_log, LOG_FIELDS)
+    publish_alerts([reading])
+    process_readings([reading])
     return jsonify({"message": "BatteryHealthLog created successfully", "log_id": new_log.id}), 201
 
+def _filter_logs(query):
+    since = datetime_arg('since')
+    if since is not None:
+        query = query.filter(BatteryHealthLog.created_at >= since)
+    until = datetime_arg('until')
+    if until is not None:
+        query = query.filter(BatteryHealthLog.created_at < until)
+    return query
+
+def _parse_batch():
+    if request.mimetype == NDJSON_MIMETYPE:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('logs')
+    return data if isinstance(data, list) else None
+
+@battery_health_log_bp.route('/battery_health_logs/batch', methods=['POST'])
+def create_battery_health_logs_batch():
+    items = _parse_batch()
+    if items is None:
+        return jsonify({"error": "Request body must be a JSON array of readings, {\"logs\": [...]} or NDJSON"}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large: at most {MAX_BATCH_SIZE} readings per request"}), 413
+
+    rows, errors = validate_readings(items)
+    if not rows:
+        return jsonify({"error": "No valid readings in batch", "inserted": 0, "errors": errors}), 400
+
+    insert_readings(rows)
+    publish_alerts(dict(zip(INSERT_COLUMNS, row)) for row in rows if row[ERROR_CODE_COLUMN])
+    process_readings(dict(zip(INSERT_COLUMNS, row)) for row in rows)
+    return jsonify({
+        "message": "BatteryHealthLogs created successfully",
+        "inserted": len(rows),
+        "errors": errors
+    }), 201
+
+@battery_health_log_bp.route('/battery_health_logs/ingest_metrics', methods=['GET'])
+def get_ingest_metrics():
+    buffer = current_app.extensions.get('health_log_buffer')
+    if buffer is None:
+        return jsonify({"enabled": False, "anomaly_detector": detector.metrics_snapshot()})
+    return jsonify({"enabled": True, **buffer.metrics(), "anomaly_detector": detector.metrics_snapshot()})
+
 @battery_health_log_bp.route('/battery_health_logs', methods=['GET'])
+@replica_reads
 def get_battery_health_logs():
-    logs = BatteryHealthLog.query.all()
-    return jsonify([{
-        "id": log.id,
-        "battery_id": log.battery_id,
-        "soh_percent": log.soh_percent,
-        "pack_voltage": log.pack_voltage,
-        "cell_voltage_min": log.cell_voltage_min,
-        "cell_voltage_max": log.cell_voltage_max,
-        "cell_voltage_diff": log.cell_voltage_diff,
-        "max_temp": log.max_temp,
-        "ambient_temp": log.ambient_temp,
-        "humidity": log.humidity,
-        "internal_resist": log.internal_resist,
-        "cycle_count": log.cycle_count,
-        "error_code": log.error_code,
-        "created_at": str(log.created_at),
-        "battery_serial": log.battery.serial_number if log.battery else None
-    } for log in logs])
+    query, serialize = battery_health_log_schema.select(fields_arg(battery_health_log_schema.names))
+    query = _filter_logs(query)
+    battery_ids = int_list_arg('battery_id')
+    if battery_ids:
+        query = query.filter(BatteryHealthLog.battery_id.in_(battery_ids))
+    return list_response(query, BatteryHealthLog.id, serialize)
 
 @battery_health_log_bp.route('/battery_health_logs/<int:log_id>', methods=['GET'])
 def get_battery_health_log(log_id):
     log = BatteryHealthLog.query.get_or_404(log_id)
-    return jsonify({
-        "id": log.id,
-        "battery_id": log.battery_id,
-        "soh_percent": log.soh_percent,
-        "pack_voltage": log.pack_voltage,
-        "cell_voltage_min": log.cell_voltage_min,
-        "cell_voltage_max": log.cell_voltage_max,
-        "cell_voltage_diff": log.cell_voltage_diff,
-        "max_temp": log.max_temp,
-        "ambient_temp": log.ambient_temp,
-        "humidity": log.humidity,
-        "internal_resist": log.internal_resist,
-        "cycle_count": log.cycle_count,
-        "error_code": log.error_code,
-        "created_at": str(log.created_at),
-        "battery_serial": log.battery.serial_number if log.battery else None
-    })
+    return jsonify(battery_health_log_schema.dump(log, fields_arg(battery_health_log_schema.names)))
 
 @battery_health_log_bp.route('/battery_health_logs/<int:log_id>', methods=['PUT'])
 def update_battery_health_log(log_id):
@@ -106,23 +156,62 @@ def delete_battery_health_log(log_id):
     db.session.commit()
     return jsonify({"message": "BatteryHealthLog deleted successfully"})
 
+@battery_health_log_bp.route('/batteries/health_report', methods=['GET'])
+@replica_reads
+def get_battery_health_report():
+    source = request.args.get('source')
+    if source not in (None, 'raw', '1h', '1d'):
+        raise InvalidParameter("Query parameter 'source' must be raw, 1h or 1d")
+    battery_ids = int_list_arg('battery_id') or None
+    station_ids = int_list_arg('station_id')
+    battery_type = request.args.get('battery_type')
+    if station_ids or battery_type:
+        query = db.session.query(Battery.id)
+        if battery_ids:
+            query = query.filter(Battery.id.in_(battery_ids))
+        if station_ids:
+            query = query.filter(Battery.station_id.in_(station_ids))
+        if battery_type:
+            query = query.filter(Battery.battery_type == battery_type)
+        battery_ids = [battery_id for (battery_id,) in query]
+    report = health_report(source, datetime_arg('since'), battery_ids, limit=limit_arg(),
+                           include_all=request.args.get('all') in ('1', 'true'))
+    return jsonify(report)
+
 @battery_health_log_bp.route('/batteries/<int:battery_id>/health_logs', methods=['GET'])
+@replica_reads
 def get_battery_health_logs_by_battery(battery_id):
     battery = Battery.query.get_or_404(battery_id)
-    logs = BatteryHealthLog.query.filter_by(battery_id=battery_id).all()
-    return jsonify([{
-        "id": log.id,
-        "battery_id": log.battery_id,
-        "soh_percent": log.soh_percent,
-        "pack_voltage": log.pack_voltage,
-        "cell_voltage_min": log.cell_voltage_min,
-        "cell_voltage_max": log.cell_voltage_max,
-        "cell_voltage_diff": log.cell_voltage_diff,
-        "max_temp": log.max_temp,
-        "ambient_temp": log.ambient_temp,
-        "humidity": log.humidity,
-        "internal_resist": log.internal_resist,
-        "cycle_count": log.cycle_count,
-        "error_code": log.error_code,
-        "created_at": str(log.created_at)
-    } for log in logs])
+    since = datetime_arg('since')
+    until = datetime_arg('until') or datetime.utcnow()
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in ('auto', 'raw') + tuple(RESOLUTIONS):
+        raise InvalidParameter("Query parameter 'resolution' must be auto, raw, 1m, 1h or 1d")
+    if resolution == 'auto':
+        # Without since the range covers the battery's whole history, which may
+        # only survive in the daily rollups once raw logs have been purged.
+        oldest = since or min(filter(None, [
+            db.session.query(func.min(BatteryHealthLog.created_at)).filter(
+                BatteryHealthLog.battery_id == battery_id).scalar(),
+            db.session.query(func.min(BatteryHealthRollup.bucket_start)).filter(
+                BatteryHealthRollup.battery_id == battery_id, BatteryHealthRollup.resolution == '1d').scalar()
+        ]), default=until)
+        resolution = pick_resolution(oldest, until)
+
+    if resolution == 'raw':
+        query, serialize = battery_health_log_schema.select(fields_arg(LOG_FIELDS))
+        query = _filter_logs(query.filter(BatteryHealthLog.battery_id == battery_id))
+        if requested_format() != 'json':
+            return list_response(query, BatteryHealthLog.id, serialize)
+        return json_response({"resolution": "raw", **paginate(query, BatteryHealthLog.id, serialize)})
+
+    query = BatteryHealthRollup.query.filter(
+        BatteryHealthRollup.battery_id == battery_id,
+        BatteryHealthRollup.resolution == resolution,
+        BatteryHealthRollup.bucket_start < until
+    )
+    if since is not None:
+        query = query.filter(BatteryHealthRollup.bucket_start >= floor_bucket(since, resolution))
+    # One row per bucket for a battery and resolution, so bucket_start is the page key.
+    return json_response({"resolution": resolution,
+                          **paginate(query, BatteryHealthRollup.bucket_start, serialize_rollup, datetime.fromisoformat)})
@@ -1,8 +1,26 @@
 from flask import Blueprint, request, jsonify
-from models import db, Battery
+from models import db, Battery, DeletedRecord, Station, battery_schema
+from pagination import fields_arg
+from streaming import list_response
+from slot_cache import slot_cache, ALL_SLOTS
+from events import publish
+from anomaly import detector, FAULTY
+from allocation import allocation_index
+from station_index import station_index
+from bulk import BulkResource, bulk_items, bulk_error, bulk_response
+from replicas import replica_reads
 
 battery_bp = Blueprint('battery', __name__)
 
+battery_bulk = BulkResource(
+    Battery,
+    unique_key=('serial_number',),
+    required=('serial_number', 'status'),
+    fields=('station_id', 'status', 'serial_number', 'battery_type', 'battery_capacity', 'manufacture_date'),
+    foreign_keys={'station_id': Station},
+    tombstones=True
+)
+
 @battery_bp.route('/batteries', methods=['POST'])
 def create_battery():
     data = request.get_json()
@@ -19,34 +37,27 @@ def create_battery():
     )
     db.session.add(new_battery)
     db.session.commit()
+    publish('battery.changed', battery_schema.dump(new_battery))
     return jsonify({"message": "Battery created successfully", "battery_id": new_battery.id}), 201
 
+
 @battery_bp.route('/batteries', methods=['GET'])
+@replica_reads
 def get_batteries():
-    batteries = Battery.query.all()
-    return jsonify([{
-        "id": battery.id, "station_id": battery.station_id, "status": battery.status,
-        "serial_number": battery.serial_number, "battery_type": battery.battery_type,
-        "battery_capacity": battery.battery_capacity,
-        "manufacture_date": str(battery.manufacture_date) if battery.manufacture_date else None,
-        "created_at": str(battery.created_at), "updated_at": str(battery.updated_at)
-    } for battery in batteries])
+    query, serialize = battery_schema.select(fields_arg(battery_schema.names))
+    return list_response(query, Battery.id, serialize)
 
 @battery_bp.route('/batteries/<int:battery_id>', methods=['GET'])
 def get_battery(battery_id):
     battery = Battery.query.get_or_404(battery_id)
-    return jsonify({
-        "id": battery.id, "station_id": battery.station_id, "status": battery.status,
-        "serial_number": battery.serial_number, "battery_type": battery.battery_type,
-        "battery_capacity": battery.battery_capacity,
-        "manufacture_date": str(battery.manufacture_date) if battery.manufacture_date else None,
-        "created_at": str(battery.created_at), "updated_at": str(battery.updated_at)
-    })
+    return jsonify(battery_schema.dump(battery, fields_arg(battery_schema.names)))
 
 @battery_bp.route('/batteries/<int:battery_id>', methods=['PUT'])
 def update_battery(battery_id):
     battery = Battery.query.get_or_404(battery_id)
     data = request.get_json()
+    previous_status = battery.status
+    previous_station_id = battery.station_id
 
     battery.station_id = data.get('station_id', battery.station_id)
     battery.status = data.get('status', battery.status)
@@ -56,11 +67,74 @@ def update_battery(battery_id):
     battery.manufacture_date = data.get('manufacture_date', battery.manufacture_date)
     
     db.session.commit()
+    if previous_status == FAULTY and battery.status != FAULTY:
+        # Repaired or cleared by an operator: rebuild the baseline from new readings.
+        detector.reset(battery_id)
+    slot_cache.invalidate(ALL_SLOTS)
+    allocation_index.invalidate()
+    for station_id in {previous_station_id, battery.station_id} - {None}:
+        station_index.mark_dirty(station_id)
+    publish('battery.changed', battery_schema.dump(battery))
     return jsonify({"message": "Battery updated successfully"})
 
 @battery_bp.route('/batteries/<int:battery_id>', methods=['DELETE'])
 def delete_battery(battery_id):
     battery = Battery.query.get_or_404(battery_id)
     db.session.delete(battery)
+    db.session.add(DeletedRecord.for_row(battery))
     db.session.commit()
-    return jsonify({"message": "Battery deleted successfully"})
\ No newline at end of file
+    detector.reset(battery_id)
+    slot_cache.invalidate(ALL_SLOTS)
+    allocation_index.invalidate()
+    if battery.station_id is not None:
+        station_index.mark_dirty(battery.station_id)
+    publish('battery.deleted', {"id": battery_id})
+    return jsonify({"message": "Battery deleted successfully"})
+
+@battery_bp.route('/batteries/batch', methods=['POST'])
+def create_batteries_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, created = battery_bulk.create(items)
+    for battery in battery_bulk.load(created):
+        publish('battery.changed', battery_schema.dump(battery))
+    return bulk_response(results, 201)
+
+@battery_bp.route('/batteries/batch', methods=['PUT'])
+def update_batteries_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, previous = battery_bulk.update(items)
+    if previous:
+        slot_cache.invalidate(ALL_SLOTS)
+        allocation_index.invalidate()
+    stations = {values['station_id'] for values in previous.values()}
+    for battery in battery_bulk.load(previous):
+        if previous[battery.id]['status'] == FAULTY and battery.status != FAULTY:
+            detector.reset(battery.id)
+        stations.add(battery.station_id)
+        publish('battery.changed', battery_schema.dump(battery))
+    for station_id in stations - {None}:
+        station_index.mark_dirty(station_id)
+    return bulk_response(results)
+
+@battery_bp.route('/batteries/batch', methods=['DELETE'])
+def delete_batteries_batch():
+    items = bulk_items('ids')
+    error = bulk_error(items)
+    if error:
+        return error
+    results, deleted = battery_bulk.delete(items)
+    if deleted:
+        slot_cache.invalidate(ALL_SLOTS)
+        allocation_index.invalidate()
+    for battery_id, values in deleted.items():
+        detector.reset(battery_id)
+        if values['station_id'] is not None:
+            station_index.mark_dirty(values['station_id'])
+        publish('battery.deleted', {"id": battery_id})
+    return bulk_response(results)
@@ -0,0 +1,43 @@
+from flask import Blueprint, Response, request, jsonify
+from events import broker, format_event, RESYNC
+
+event_bp = Blueprint('event', __name__)
+
+HEARTBEAT_SECONDS = 15
+
+def _stream(subscription):
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = subscription.next(timeout=HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+            elif event is RESYNC:
+                # The id moves the client's Last-Event-ID to the present, so its
+                # reconnect after refetching the snapshot is not resynced again.
+                yield f"id: {broker.last_id()}\nevent: resync\ndata: {{}}\n\n"
+                return
+            else:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+@event_bp.route('/events', methods=['GET'])
+def stream_events():
+    types = [t for t in request.args.get('types', '').split(',') if t]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+
+    subscription = broker.subscribe(types, last_event_id)
+    if subscription is None:
+        return jsonify({"error": "Too many event subscribers, retry later"}), 503, {"Retry-After": "5"}
+
+    response = Response(_stream(subscription), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
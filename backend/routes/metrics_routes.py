@@ -0,0 +1,10 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = current_app.extensions.get('request_metrics')
+    if metrics is None:
+        return jsonify({"error": "Request metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
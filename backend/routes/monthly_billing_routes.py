@@ -1,8 +1,15 @@
 from flask import Blueprint, request, jsonify
-from models import db, MonthlyBilling, User
+from sqlalchemy import or_
+from models import db, MonthlyBilling, User, monthly_billing_schema
+from pagination import int_arg, datetime_arg, fields_arg, InvalidParameter
+from streaming import list_response
+from billing import run_billing, usage_summary, current_month
+from replicas import replica_reads
 
 monthly_billing_bp = Blueprint('monthly_billing', __name__)
 
+USER_BILLING_FIELDS = [name for name in monthly_billing_schema.names if name not in ('user_id', 'user_name', 'user_email')]
+
 @monthly_billing_bp.route('/monthly_billings', methods=['POST'])
 def create_monthly_billing():
     data = request.get_json()
@@ -12,6 +19,8 @@ def create_monthly_billing():
     user = User.query.get(data['user_id'])
     if not user:
         return jsonify({"error": f"User with id {data['user_id']} not found"}), 404
+    if MonthlyBilling.query.filter_by(user_id=data['user_id'], billing_month=data['billing_month']).first():
+        return jsonify({"error": f"Billing for user {data['user_id']} and month {data['billing_month']} already exists"}), 409
 
     new_billing = MonthlyBilling(
         user_id=data['user_id'],
@@ -28,43 +37,43 @@ def create_monthly_billing():
     db.session.commit()
     return jsonify({"message": "MonthlyBilling created successfully", "billing_id": new_billing.id}), 201
 
+@monthly_billing_bp.route('/monthly_billings/run', methods=['POST'])
+def run_monthly_billing():
+    try:
+        summary = run_billing(request.args.get('month'))
+    except ValueError as e:
+        raise InvalidParameter(str(e))
+    return jsonify(summary)
+
+def _filter_billings(query):
+    billing_month = request.args.get('billing_month')
+    if billing_month:
+        query = query.filter(MonthlyBilling.billing_month == billing_month)
+    payment_statuses = [s for s in request.args.get('payment_status', '').split(',') if s]
+    if payment_statuses:
+        query = query.filter(MonthlyBilling.payment_status.in_(payment_statuses))
+    since = datetime_arg('since')
+    if since is not None:
+        query = query.filter(MonthlyBilling.created_at >= since)
+    until = datetime_arg('until')
+    if until is not None:
+        query = query.filter(MonthlyBilling.created_at < until)
+    return query
+
 @monthly_billing_bp.route('/monthly_billings', methods=['GET'])
+@replica_reads
 def get_monthly_billings():
-    billings = MonthlyBilling.query.all()
-    return jsonify([{
-        "id": billing.id,
-        "user_id": billing.user_id,
-        "billing_month": billing.billing_month,
-        "total_ah_used": billing.total_ah_used,
-        "ah_included": billing.ah_included,
-        "ah_excess": billing.ah_excess,
-        "total_amount_due": billing.total_amount_due,
-        "paid_amount": billing.paid_amount,
-        "payment_status": billing.payment_status,
-        "payment_date": str(billing.payment_date) if billing.payment_date else None,
-        "created_at": str(billing.created_at),
-        "user_name": billing.user.name if billing.user else None,
-        "user_email": billing.user.email if billing.user else None
-    } for billing in billings])
+    query, serialize = monthly_billing_schema.select(fields_arg(monthly_billing_schema.names))
+    query = _filter_billings(query)
+    user_id = int_arg('user_id')
+    if user_id is not None:
+        query = query.filter(MonthlyBilling.user_id == user_id)
+    return list_response(query, MonthlyBilling.id, serialize)
 
 @monthly_billing_bp.route('/monthly_billings/<int:billing_id>', methods=['GET'])
 def get_monthly_billing(billing_id):
     billing = MonthlyBilling.query.get_or_404(billing_id)
-    return jsonify({
-        "id": billing.id,
-        "user_id": billing.user_id,
-        "billing_month": billing.billing_month,
-        "total_ah_used": billing.total_ah_used,
-        "ah_included": billing.ah_included,
-        "ah_excess": billing.ah_excess,
-        "total_amount_due": billing.total_amount_due,
-        "paid_amount": billing.paid_amount,
-        "payment_status": billing.payment_status,
-        "payment_date": str(billing.payment_date) if billing.payment_date else None,
-        "created_at": str(billing.created_at),
-        "user_name": billing.user.name if billing.user else None,
-        "user_email": billing.user.email if billing.user else None
-    })
+    return jsonify(monthly_billing_schema.dump(billing, fields_arg(monthly_billing_schema.names)))
 
 @monthly_billing_bp.route('/monthly_billings/<int:billing_id>', methods=['PUT'])
 def update_monthly_billing(billing_id):
@@ -97,21 +106,20 @@ def delete_monthly_billing(billing_id):
     return jsonify({"message": "MonthlyBilling deleted successfully"})
 
 @monthly_billing_bp.route('/users/<int:user_id>/monthly_billings', methods=['GET'])
+@replica_reads
 def get_user_monthly_billings(user_id):
     user = User.query.get_or_404(user_id)
-    billings = MonthlyBilling.query.filter_by(user_id=user_id).all()
-    return jsonify([{
-        "id": billing.id,
-        "billing_month": billing.billing_month,
-        "total_ah_used": billing.total_ah_used,
-        "ah_included": billing.ah_included,
-        "ah_excess": billing.ah_excess,
-        "total_amount_due": billing.total_amount_due,
-        "paid_amount": billing.paid_amount,
-        "payment_status": billing.payment_status,
-        "payment_date": str(billing.payment_date) if billing.payment_date else None,
-        "created_at": str(billing.created_at)
-    } for billing in billings])
+    query, serialize = monthly_billing_schema.select(fields_arg(USER_BILLING_FIELDS))
+    query = _filter_billings(query.filter(MonthlyBilling.user_id == user_id))
+    return list_response(query, MonthlyBilling.id, serialize)
+
+@monthly_billing_bp.route('/users/<int:user_id>/usage', methods=['GET'])
+def get_user_usage(user_id):
+    user = User.query.get_or_404(user_id)
+    try:
+        return jsonify(usage_summary(user, request.args.get('month') or current_month()))
+    except ValueError as e:
+        raise InvalidParameter(str(e))
 
 @monthly_billing_bp.route('/monthly_billings/<int:billing_id>/mark_paid', methods=['POST'])
 def mark_billing_paid(billing_id):
@@ -126,22 +134,17 @@ def mark_billing_paid(billing_id):
     return jsonify({"message": "Billing marked as paid successfully"})
 
 @monthly_billing_bp.route('/monthly_billings/unpaid', methods=['GET'])
+@replica_reads
 def get_unpaid_billings():
-    unpaid_billings = MonthlyBilling.query.filter(
-        MonthlyBilling.payment_status.in_(['unpaid', 'pending', None])
-    ).all()
-    return jsonify([{
-        "id": billing.id,
-        "user_id": billing.user_id,
-        "billing_month": billing.billing_month,
-        "total_ah_used": billing.total_ah_used,
-        "ah_included": billing.ah_included,
-        "ah_excess": billing.ah_excess,
-        "total_amount_due": billing.total_amount_due,
-        "paid_amount": billing.paid_amount,
-        "payment_status": billing.payment_status,
-        "payment_date": str(billing.payment_date) if billing.payment_date else None,
-        "created_at": str(billing.created_at),
-        "user_name": billing.user.name if billing.user else None,
-        "user_email": billing.user.email if billing.user else None
-    } for billing in unpaid_billings])
+    query, serialize = monthly_billing_schema.select(fields_arg(monthly_billing_schema.names))
+    query = query.filter(or_(
+        MonthlyBilling.payment_status.in_(['unpaid', 'pending']),
+        MonthlyBilling.payment_status.is_(None)
+    ))
+    user_id = int_arg('user_id')
+    if user_id is not None:
+        query = query.filter(MonthlyBilling.user_id == user_id)
+    billing_month = request.args.get('billing_month')
+    if billing_month:
+        query = query.filter(MonthlyBilling.billing_month == billing_month)
+    return list_response(query, MonthlyBilling.id, serialize)
@@ -1,8 +1,21 @@
 from flask import Blueprint, request, jsonify
-from models import db, RFIDCard, User
+from models import db, RFIDCard, User, Battery, rfid_card_schema
+from pagination import fields_arg
+from streaming import list_response
+from rfid_auth import rfid_auth_cache
+from bulk import BulkResource, bulk_items, bulk_error, bulk_response
+from replicas import replica_reads
 
 rfid_card_bp = Blueprint('rfid_card', __name__)
 
+rfid_card_bulk = BulkResource(
+    RFIDCard,
+    unique_key=('rfid_code',),
+    required=('user_id', 'rfid_code'),
+    fields=('user_id', 'rfid_code', 'assigned_battery_id', 'status'),
+    foreign_keys={'user_id': User, 'assigned_battery_id': Battery}
+)
+
 @rfid_card_bp.route('/rfid_cards', methods=['POST'])
 def create_rfid_card():
     data = request.get_json()
@@ -21,18 +34,14 @@ def create_rfid_card():
     )
     db.session.add(new_card)
     db.session.commit()
+    rfid_auth_cache.invalidate(new_card.rfid_code)
     return jsonify({"message": "RFIDCard created successfully", "card_id": new_card.id}), 201
 
 @rfid_card_bp.route('/rfid_cards', methods=['GET'])
+@replica_reads
 def get_rfid_cards():
-    cards = RFIDCard.query.all()
-    return jsonify([{
-        "id": card.id, "user_id": card.user_id, "rfid_code": card.rfid_code,
-        "assigned_battery_id": card.assigned_battery_id,
-        "issued_at": str(card.issued_at) if card.issued_at else None,
-        "status": card.status,
-        "user_email": card.user.email if card.user else None
-    } for card in cards])
+    query, serialize = rfid_card_schema.select(fields_arg(rfid_card_schema.names))
+    return list_response(query, RFIDCard.id, serialize)
 
 @rfid_card_bp.route('/rfid_cards/by_code/<string:rfid_code>', methods=['GET'])
 def get_rfid_card_by_code(rfid_code):
@@ -40,29 +49,18 @@ def get_rfid_card_by_code(rfid_code):
     if not card:
         return jsonify({"error": "RFID card not found"}), 404
     
-    return jsonify({
-        "id": card.id, "user_id": card.user_id, "rfid_code": card.rfid_code,
-        "assigned_battery_id": card.assigned_battery_id,
-        "issued_at": str(card.issued_at) if card.issued_at else None,
-        "status": card.status,
-        "user_email": card.user.email if card.user else None
-    })
+    return jsonify(rfid_card_schema.dump(card, fields_arg(rfid_card_schema.names)))
 
 @rfid_card_bp.route('/rfid_cards/<int:card_id>', methods=['GET'])
 def get_rfid_card(card_id):
     card = RFIDCard.query.get_or_404(card_id)
-    return jsonify({
-        "id": card.id, "user_id": card.user_id, "rfid_code": card.rfid_code,
-        "assigned_battery_id": card.assigned_battery_id,
-        "issued_at": str(card.issued_at) if card.issued_at else None,
-        "status": card.status,
-        "user_email": card.user.email if card.user else None
-    })
+    return jsonify(rfid_card_schema.dump(card, fields_arg(rfid_card_schema.names)))
 
 @rfid_card_bp.route('/rfid_cards/<int:card_id>', methods=['PUT'])
 def update_rfid_card(card_id):
     card = RFIDCard.query.get_or_404(card_id)
     data = request.get_json()
+    previous_code = card.rfid_code
 
     if 'user_id' in data:
         user = User.query.get(data['user_id'])
@@ -75,6 +73,7 @@ def update_rfid_card(card_id):
     card.status = data.get('status', card.status)
     
     db.session.commit()
+    rfid_auth_cache.invalidate(previous_code, card.rfid_code)
     return jsonify({"message": "RFIDCard updated successfully"})
 
 @rfid_card_bp.route('/rfid_cards/<int:card_id>', methods=['DELETE'])
@@ -82,4 +81,36 @@ def delete_rfid_card(card_id):
     card = RFIDCard.query.get_or_404(card_id)
     db.session.delete(card)
     db.session.commit()
-    return jsonify({"message": "RFIDCard deleted successfully"})
\ No newline at end of file
+    rfid_auth_cache.invalidate(card.rfid_code)
+    return jsonify({"message": "RFIDCard deleted successfully"})
+
+@rfid_card_bp.route('/rfid_cards/batch', methods=['POST'])
+def create_rfid_cards_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, _ = rfid_card_bulk.create(items)
+    rfid_auth_cache.invalidate(*(item['rfid_code'] for item in items if isinstance(item, dict) and 'rfid_code' in item))
+    return bulk_response(results, 201)
+
+@rfid_card_bp.route('/rfid_cards/batch', methods=['PUT'])
+def update_rfid_cards_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, previous = rfid_card_bulk.update(items)
+    rfid_auth_cache.invalidate(*(values['rfid_code'] for values in previous.values()),
+                               *(item['rfid_code'] for item in items if isinstance(item, dict) and 'rfid_code' in item))
+    return bulk_response(results)
+
+@rfid_card_bp.route('/rfid_cards/batch', methods=['DELETE'])
+def delete_rfid_cards_batch():
+    items = bulk_items('ids')
+    error = bulk_error(items)
+    if error:
+        return error
+    results, deleted = rfid_card_bulk.delete(items)
+    rfid_auth_cache.invalidate(*(values['rfid_code'] for values in deleted.values()))
+    return bulk_response(results)
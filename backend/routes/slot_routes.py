@@ -1,8 +1,24 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import joinedload
 from models import db, Slot, Station, Battery
+from slot_cache import slot_cache, slot_item, write_through, write_through_delete, conditional_json, ALL_SLOTS
+from pagination import decode_cursor, limit_arg
+from streaming import list_response, requested_format
+from events import publish
+from allocation import allocation_index
+from station_index import station_index
+from bulk import BulkResource, bulk_items, bulk_error, bulk_response
 
 slot_bp = Blueprint('slot', __name__)
 
+slot_bulk = BulkResource(
+    Slot,
+    unique_key=('station_id', 'slot_number'),
+    required=('station_id', 'slot_number'),
+    fields=('station_id', 'slot_number', 'battery_id', 'status', 'is_charging'),
+    foreign_keys={'station_id': Station, 'battery_id': Battery}
+)
+
 @slot_bp.route('/slots', methods=['POST'])
 def create_slot():
     data = request.get_json()
@@ -27,42 +43,31 @@ def create_slot():
     )
     db.session.add(new_slot)
     db.session.commit()
+    write_through(new_slot)
+    publish('slot.changed', slot_item(new_slot))
     return jsonify({"message": "Slot created successfully", "slot_id": new_slot.id}), 201
 
 @slot_bp.route('/slots', methods=['GET'])
 def get_slots():
-    slots = Slot.query.all()
-    return jsonify([{
-        "id": slot.id,
-        "station_id": slot.station_id,
-        "slot_number": slot.slot_number,
-        "battery_id": slot.battery_id,
-        "status": slot.status,
-        "is_charging": slot.is_charging,
-        "last_updated": str(slot.last_updated),
-        "station_name": slot.station.name if slot.station else None,
-        "battery_serial": slot.battery.serial_number if slot.battery else None
-    } for slot in slots])
+    query = Slot.query.options(joinedload(Slot.station), joinedload(Slot.battery))
+    if requested_format() != 'json':
+        return list_response(query, Slot.id, slot_item)
+    # JSON pages are cut from the cached slot list.
+    after = request.args.get('after')
+    page = (decode_cursor(after) if after else 0, limit_arg())
+    etag, body = slot_cache.get(ALL_SLOTS, lambda: [slot_item(slot) for slot in query.order_by(Slot.id)], page)
+    return conditional_json(etag, body)
 
 @slot_bp.route('/slots/<int:slot_id>', methods=['GET'])
 def get_slot(slot_id):
     slot = Slot.query.get_or_404(slot_id)
-    return jsonify({
-        "id": slot.id,
-        "station_id": slot.station_id,
-        "slot_number": slot.slot_number,
-        "battery_id": slot.battery_id,
-        "status": slot.status,
-        "is_charging": slot.is_charging,
-        "last_updated": str(slot.last_updated),
-        "station_name": slot.station.name if slot.station else None,
-        "battery_serial": slot.battery.serial_number if slot.battery else None
-    })
+    return jsonify(slot_item(slot))
 
 @slot_bp.route('/slots/<int:slot_id>', methods=['PUT'])
 def update_slot(slot_id):
     slot = Slot.query.get_or_404(slot_id)
     data = request.get_json()
+    previous_station_id = slot.station_id
 
     if 'station_id' in data:
         station = Station.query.get(data['station_id'])
@@ -83,13 +88,18 @@ def update_slot(slot_id):
     slot.is_charging = data.get('is_charging', slot.is_charging)
     
     db.session.commit()
+    write_through(slot, previous_station_id)
+    publish('slot.changed', slot_item(slot))
     return jsonify({"message": "Slot updated successfully"})
 
 @slot_bp.route('/slots/<int:slot_id>', methods=['DELETE'])
 def delete_slot(slot_id):
     slot = Slot.query.get_or_404(slot_id)
+    station_id = slot.station_id
     db.session.delete(slot)
     db.session.commit()
+    write_through_delete(station_id, slot_id)
+    publish('slot.deleted', {"id": slot_id, "station_id": station_id})
     return jsonify({"message": "Slot deleted successfully"})
 
 @slot_bp.route('/slots/<int:slot_id>/assign_battery', methods=['POST'])
@@ -107,6 +117,8 @@ def assign_battery_to_slot(slot_id):
     slot.battery_id = data['battery_id']
     slot.status = 'occupied'
     db.session.commit()
+    write_through(slot)
+    publish('slot.changed', slot_item(slot))
     return jsonify({"message": "Battery assigned to slot successfully"})
 
 @slot_bp.route('/slots/<int:slot_id>/remove_battery', methods=['POST'])
@@ -116,4 +128,53 @@ def remove_battery_from_slot(slot_id):
     slot.status = 'empty'
     slot.is_charging = False
     db.session.commit()
+    write_through(slot)
+    publish('slot.changed', slot_item(slot))
     return jsonify({"message": "Battery removed from slot successfully"})
+
+def _slots_changed(slot_ids, stations):
+    # Batches touch too many slots to write through one by one.
+    slot_cache.invalidate()
+    allocation_index.invalidate()
+    for slot in slot_bulk.load(slot_ids, joinedload(Slot.station), joinedload(Slot.battery)):
+        stations.add(slot.station_id)
+        publish('slot.changed', slot_item(slot))
+    for station_id in stations:
+        station_index.mark_dirty(station_id)
+
+@slot_bp.route('/slots/batch', methods=['POST'])
+def create_slots_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, created = slot_bulk.create(items)
+    if created:
+        _slots_changed(created, set())
+    return bulk_response(results, 201)
+
+@slot_bp.route('/slots/batch', methods=['PUT'])
+def update_slots_batch():
+    items = bulk_items()
+    error = bulk_error(items)
+    if error:
+        return error
+    results, previous = slot_bulk.update(items)
+    if previous:
+        _slots_changed(list(previous), {values['station_id'] for values in previous.values()})
+    return bulk_response(results)
+
+@slot_bp.route('/slots/batch', methods=['DELETE'])
+def delete_slots_batch():
+    items = bulk_items('ids')
+    error = bulk_error(items)
+    if error:
+        return error
+    results, deleted = slot_bulk.delete(items)
+    if deleted:
+        slot_cache.invalidate()
+        allocation_index.invalidate()
+    for slot_id, values in deleted.items():
+        station_index.mark_dirty(values['station_id'])
+        publish('slot.deleted', {"id": slot_id, "station_id": values['station_id']})
+    return bulk_response(results)
@@ -1,86 +1,135 @@
 from flask import Blueprint, request, jsonify
-from models import db, Station
+from models import db, Station, Slot, Battery, DeletedRecord, station_schema, battery_schema
+from slot_cache import slot_cache, station_key, station_slot_item, conditional_json, ALL_SLOTS
+from allocation import allocation_index
+from station_index import station_index
+from pagination import float_arg, int_arg, fields_arg, InvalidParameter
+from streaming import list_response
+from replicas import replica_reads
+
+MAX_NEARBY_LIMIT = 100
+MAX_NEARBY_RADIUS_KM = 500.0
+STATION_BATTERY_FIELDS = [name for name in battery_schema.names if name != 'station_id']
 
 station_bp = Blueprint('station', __name__)
 
+def _coordinates_error(data):
+    for field, bound in (('latitude', 90), ('longitude', 180)):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or abs(value) > bound):
+            return f"Field '{field}' must be a number between -{bound} and {bound}"
+    return None
+
 @station_bp.route('/stations', methods=['POST'])
 def create_station():
     data = request.get_json()
     if not data or not data.get('name'):
         return jsonify({"error": "Missing required field: name"}), 400
     
+    error = _coordinates_error(data)
+    if error:
+        return jsonify({"error": error}), 400
+
     new_station = Station(
         location=data.get('location'),
-        name=data['name']
+        name=data['name'],
+        latitude=data.get('latitude'),
+        longitude=data.get('longitude')
     )
     db.session.add(new_station)
     db.session.commit()
+    station_index.invalidate_stations()
     return jsonify({"message": "Station created successfully", "station_id": new_station.id}), 201
 
 @station_bp.route('/stations', methods=['GET'])
+@replica_reads
 def get_stations():
-    stations = Station.query.all()
-    return jsonify([{
-        "id": station.id,
-        "location": station.location,
-        "name": station.name,
-        "created_at": str(station.created_at),
-        "updated_at": str(station.updated_at)
-    } for station in stations])
+    query, serialize = station_schema.select(fields_arg(station_schema.names))
+    return list_response(query, Station.id, serialize)
+
+@station_bp.route('/stations/nearby', methods=['GET'])
+def get_nearby_stations():
+    lat, lon = float_arg('lat'), float_arg('lon')
+    if lat is None or lon is None:
+        raise InvalidParameter("Query parameters 'lat' and 'lon' are required")
+    if abs(lat) > 90 or abs(lon) > 180:
+        raise InvalidParameter("Query parameters 'lat' and 'lon' must be valid coordinates")
+    limit = int_arg('limit') or 10
+    min_available = int_arg('min_available')
+    radius_km = float_arg('radius_km') or 50.0
+    if not 1 <= limit <= MAX_NEARBY_LIMIT:
+        raise InvalidParameter(f"Query parameter 'limit' must be between 1 and {MAX_NEARBY_LIMIT}")
+    if min_available is not None and min_available < 0:
+        raise InvalidParameter("Query parameter 'min_available' must not be negative")
+    if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+        raise InvalidParameter(f"Query parameter 'radius_km' must be between 0 and {MAX_NEARBY_RADIUS_KM:g}")
+    return jsonify(station_index.nearby(lat, lon, limit, 1 if min_available is None else min_available, radius_km))
 
 @station_bp.route('/stations/<int:station_id>', methods=['GET'])
 def get_station(station_id):
     station = Station.query.get_or_404(station_id)
-    return jsonify({
-        "id": station.id,
-        "location": station.location,
-        "name": station.name,
-        "created_at": str(station.created_at),
-        "updated_at": str(station.updated_at)
-    })
+    return jsonify(station_schema.dump(station, fields_arg(station_schema.names)))
 
 @station_bp.route('/stations/<int:station_id>', methods=['PUT'])
 def update_station(station_id):
     station = Station.query.get_or_404(station_id)
     data = request.get_json()
+    error = _coordinates_error(data)
+    if error:
+        return jsonify({"error": error}), 400
 
     station.location = data.get('location', station.location)
     station.name = data.get('name', station.name)
+    station.latitude = data.get('latitude', station.latitude)
+    station.longitude = data.get('longitude', station.longitude)
     
     db.session.commit()
+    slot_cache.invalidate(ALL_SLOTS)
+    station_index.invalidate_stations()
     return jsonify({"message": "Station updated successfully"})
 
 @station_bp.route('/stations/<int:station_id>', methods=['DELETE'])
 def delete_station(station_id):
     station = Station.query.get_or_404(station_id)
     db.session.delete(station)
+    db.session.add(DeletedRecord.for_row(station))
     db.session.commit()
+    slot_cache.invalidate(station_key(station_id))
+    slot_cache.invalidate(ALL_SLOTS)
+    allocation_index.invalidate(station_id)
+    station_index.invalidate_stations()
     return jsonify({"message": "Station deleted successfully"})
 
 @station_bp.route('/stations/<int:station_id>/batteries', methods=['GET'])
 def get_station_batteries(station_id):
     station = Station.query.get_or_404(station_id)
-    batteries = station.batteries
-    return jsonify([{
-        "id": battery.id,
-        "status": battery.status,
-        "serial_number": battery.serial_number,
-        "battery_type": battery.battery_type,
-        "battery_capacity": battery.battery_capacity,
-        "manufacture_date": str(battery.manufacture_date) if battery.manufacture_date else None,
-        "created_at": str(battery.created_at),
-        "updated_at": str(battery.updated_at)
-    } for battery in batteries])
+    query, serialize = battery_schema.select(fields_arg(STATION_BATTERY_FIELDS))
+    return list_response(query.filter(Battery.station_id == station_id), Battery.id, serialize)
 
 @station_bp.route('/stations/<int:station_id>/slots', methods=['GET'])
 def get_station_slots(station_id):
-    station = Station.query.get_or_404(station_id)
-    slots = station.slots
-    return jsonify([{
-        "id": slot.id,
+    def load():
+        if not db.session.query(Station.id).filter_by(id=station_id).first():
+            return None
+        return [station_slot_item(slot) for slot in Slot.query.filter_by(station_id=station_id).order_by(Slot.id)]
+
+    etag, body = slot_cache.get(station_key(station_id), load)
+    if body is None:
+        return jsonify({"error": "Station not found"}), 404
+    return conditional_json(etag, body)
+
+
+@station_bp.route('/stations/<int:station_id>/next_battery', methods=['GET'])
+def get_next_battery(station_id):
+    slot = allocation_index.peek(station_id)
+    if slot is None:
+        Station.query.get_or_404(station_id)
+        return jsonify({"error": "No charged battery available at this station"}), 404
+    return jsonify({
+        "station_id": station_id,
+        "slot_id": slot.id,
         "slot_number": slot.slot_number,
         "battery_id": slot.battery_id,
-        "status": slot.status,
-        "is_charging": slot.is_charging,
-        "last_updated": str(slot.last_updated)
-    } for slot in slots])
+        "soh_percent": slot.soh_percent,
+        "pack_voltage": slot.pack_voltage
+    })
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from models import db, SubscriptionPlan
+from models import db, SubscriptionPlan, subscription_plan_schema
+from pagination import fields_arg
+from streaming import list_response
+from rfid_auth import rfid_auth_cache
 
 subscription_plan_bp = Blueprint('subscription_plan', __name__)
 
@@ -21,25 +24,13 @@ def create_subscription_plan():
 
 @subscription_plan_bp.route('/subscription_plans', methods=['GET'])
 def get_subscription_plans():
-    plans = SubscriptionPlan.query.all()
-    return jsonify([{
-        "id": plan.id,
-        "name": plan.name,
-        "monthly_fee": plan.monthly_fee,
-        "included_ah": plan.included_ah,
-        "extra_ah_rate": plan.extra_ah_rate
-    } for plan in plans])
+    query, serialize = subscription_plan_schema.select(fields_arg(subscription_plan_schema.names))
+    return list_response(query, SubscriptionPlan.id, serialize)
 
 @subscription_plan_bp.route('/subscription_plans/<int:plan_id>', methods=['GET'])
 def get_subscription_plan(plan_id):
     plan = SubscriptionPlan.query.get_or_404(plan_id)
-    return jsonify({
-        "id": plan.id,
-        "name": plan.name,
-        "monthly_fee": plan.monthly_fee,
-        "included_ah": plan.included_ah,
-        "extra_ah_rate": plan.extra_ah_rate
-    })
+    return jsonify(subscription_plan_schema.dump(plan, fields_arg(subscription_plan_schema.names)))
 
 @subscription_plan_bp.route('/subscription_plans/<int:plan_id>', methods=['PUT'])
 def update_subscription_plan(plan_id):
@@ -52,6 +43,8 @@ def update_subscription_plan(plan_id):
     plan.extra_ah_rate = data.get('extra_ah_rate', plan.extra_ah_rate)
     
     db.session.commit()
+    # Plans are shared by many cards and rarely change.
+    rfid_auth_cache.clear()
     return jsonify({"message": "SubscriptionPlan updated successfully"})
 
 @subscription_plan_bp.route('/subscription_plans/<int:plan_id>', methods=['DELETE'])
@@ -59,4 +52,5 @@ def delete_subscription_plan(plan_id):
     plan = SubscriptionPlan.query.get_or_404(plan_id)
     db.session.delete(plan)
     db.session.commit()
+    rfid_auth_cache.clear()
     return jsonify({"message": "SubscriptionPlan deleted successfully"})
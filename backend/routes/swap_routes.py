@@ -1,8 +1,23 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
-from models import db, Swap, User, Battery, Station
+from sqlalchemy import or_
+from sqlalchemy.exc import OperationalError
+from models import db, Swap, User, Battery, Station, RFIDCard, Slot, DeletedRecord, swap_schema
+from pagination import int_arg, int_list_arg, datetime_arg, fields_arg
+from streaming import list_response
+from slot_cache import slot_cache, station_key, ALL_SLOTS
+from events import publish
+from billing import record_swap_usage
+from analytics import refresh_swap_buckets
+from allocation import allocation_index
+from station_index import station_index
+from rfid_auth import rfid_auth_cache
+from replicas import replica_reads
 
 swap_bp = Blueprint('swap', __name__)
 
+USER_SWAP_FIELDS = [name for name in swap_schema.names if name not in ('user_id', 'user_name', 'user_email')]
+
 @swap_bp.route('/swaps', methods=['POST'])
 def create_swap():
     data = request.get_json()
@@ -46,55 +61,214 @@ def create_swap():
         ah_used=data.get('ah_used')
     )
     db.session.add(new_swap)
+    record_swap_usage(new_swap.user_id, new_swap.start_time, new_swap.ah_used)
+    refresh_swap_buckets([(new_swap.pickup_station_id, new_swap.start_time)])
     db.session.commit()
+    publish('swap.created', swap_schema.dump(new_swap))
     return jsonify({"message": "Swap created successfully", "swap_id": new_swap.id}), 201
 
+EXECUTE_SWAP_ATTEMPTS = 3
+
+class SwapRejected(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _claim_slot(slot_id, expected_battery_id, *conditions, **values):
+    # Compare-and-set on the slot row: only succeeds if nobody else changed the
+    # slot since we selected it, so a battery can never be handed out twice even
+    # on databases that ignore FOR UPDATE.
+    return db.session.query(Slot).filter(
+        Slot.id == slot_id,
+        Slot.battery_id.is_(None) if expected_battery_id is None else Slot.battery_id == expected_battery_id,
+        *conditions
+    ).update(dict(values, last_updated=datetime.utcnow()), synchronize_session=False) == 1
+
+def _claim_charged_slot(slot):
+    # The allocation index may lag writes from other workers, so the claim
+    # re-checks in the database that the slot is still ready to hand out.
+    available = db.session.query(Battery.id).filter(Battery.id == slot.battery_id, Battery.status == 'available')
+    return _claim_slot(slot.id, slot.battery_id, Slot.status == 'occupied', Slot.is_charging.is_(False),
+                       available.exists(), battery_id=None, status='empty', is_charging=False)
+
+def _pick_empty_slot(station_id, slot_id=None):
+    query = db.session.query(Slot.id, Slot.slot_number).filter(
+        Slot.station_id == station_id,
+        Slot.status == 'empty',
+        Slot.battery_id.is_(None)
+    )
+    if slot_id is not None:
+        query = query.filter(Slot.id == slot_id)
+    return query.order_by(Slot.slot_number).with_for_update(skip_locked=True).first()
+
+def _execute_swap(data):
+    card = RFIDCard.query.filter_by(rfid_code=data['rfid_code']).with_for_update().first()
+    if not card:
+        raise SwapRejected("RFID card not found", 404)
+    if card.status != 'active':
+        raise SwapRejected(f"RFID card is not active (status: {card.status})", 403)
+    user = User.query.get(card.user_id)
+    if not user or not user.is_active:
+        raise SwapRejected("User is not active", 403)
+
+    station_id = data['station_id']
+    returned_battery_id = card.assigned_battery_id
+    return_slot = None
+    if returned_battery_id is not None:
+        for _ in range(EXECUTE_SWAP_ATTEMPTS):
+            return_slot = _pick_empty_slot(station_id, data.get('return_slot_id'))
+            if not return_slot:
+                raise SwapRejected("No empty slot available to return the battery", 409)
+            if _claim_slot(return_slot.id, None, battery_id=returned_battery_id, status='occupied', is_charging=True):
+                break
+        else:
+            raise SwapRejected("Station is busy, please retry", 409)
+
+    for _ in range(EXECUTE_SWAP_ATTEMPTS):
+        issued_slot = allocation_index.pop(station_id)
+        if not issued_slot:
+            raise SwapRejected("No charged battery available at this station", 409)
+        if _claim_charged_slot(issued_slot):
+            break
+        allocation_index.invalidate(station_id)
+    else:
+        raise SwapRejected("Station is busy, please retry", 409)
+
+    if returned_battery_id is not None:
+        db.session.query(Battery).filter(Battery.id == returned_battery_id).update(
+            {"status": "charging", "station_id": station_id}, synchronize_session=False)
+
+    db.session.query(Battery).filter(Battery.id == issued_slot.battery_id).update(
+        {"status": "in_use", "station_id": None}, synchronize_session=False)
+    card.assigned_battery_id = issued_slot.battery_id
+
+    now = datetime.utcnow()
+    swap = Swap(
+        issued_battery_id=issued_slot.battery_id,
+        returned_battery_id=returned_battery_id,
+        user_id=card.user_id,
+        pickup_station_id=station_id,
+        deposit_station_id=station_id if returned_battery_id is not None else None,
+        start_time=now,
+        end_time=now,
+        battery_percentage_start=data.get('battery_percentage_start'),
+        battery_percentage_end=data.get('battery_percentage_end'),
+        ah_used=data.get('ah_used')
+    )
+    db.session.add(swap)
+    record_swap_usage(swap.user_id, swap.start_time, swap.ah_used)
+    refresh_swap_buckets([(station_id, now)])
+    db.session.commit()
+    rfid_auth_cache.invalidate(card.rfid_code)
+    slot_cache.invalidate(station_key(station_id))
+    slot_cache.invalidate(ALL_SLOTS)
+    station_index.mark_dirty(station_id)
+    _publish_executed_swap(swap, station_id, issued_slot, return_slot)
+    return {
+        "swap_id": swap.id,
+        "user_id": card.user_id,
+        "issued_battery_id": issued_slot.battery_id,
+        "issued_slot_id": issued_slot.id,
+        "issued_slot_number": issued_slot.slot_number,
+        "returned_battery_id": returned_battery_id,
+        "return_slot_id": return_slot.id if return_slot else None,
+        "return_slot_number": return_slot.slot_number if return_slot else None
+    }
+
+def _publish_executed_swap(swap, station_id, issued_slot, return_slot):
+    publish('swap.created', swap_schema.dump(swap))
+    publish('slot.changed', {"id": issued_slot.id, "station_id": station_id, "slot_number": issued_slot.slot_number,
+                             "battery_id": None, "status": "empty", "is_charging": False})
+    publish('battery.changed', {"id": swap.issued_battery_id, "station_id": None, "status": "in_use"})
+    if return_slot is not None:
+        publish('slot.changed', {"id": return_slot.id, "station_id": station_id, "slot_number": return_slot.slot_number,
+                                 "battery_id": swap.returned_battery_id, "status": "occupied", "is_charging": True})
+        publish('battery.changed', {"id": swap.returned_battery_id, "station_id": station_id, "status": "charging"})
+
+def _id_field(data, name):
+    # JSON ids as ints; "3" and 3 must key the same allocation heap.
+    value = data.get(name)
+    if value is None or isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(f"Field '{name}' must be an integer")
+
+@swap_bp.route('/swaps/execute', methods=['POST'])
+def execute_swap():
+    data = request.get_json()
+    if not isinstance(data, dict) or not data.get('rfid_code') or not data.get('station_id'):
+        return jsonify({"error": "Missing required fields: rfid_code, station_id"}), 400
+    if not isinstance(data['rfid_code'], str):
+        return jsonify({"error": "Field 'rfid_code' must be a string"}), 400
+    try:
+        data = dict(data, station_id=_id_field(data, 'station_id'),
+                    return_slot_id=_id_field(data, 'return_slot_id'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Lock waits and deadlocks (or SQLITE_BUSY) abort the whole transaction,
+    # which is safe to replay from the start.
+    for attempt in range(EXECUTE_SWAP_ATTEMPTS):
+        try:
+            result = _execute_swap(data)
+            return jsonify({"message": "Swap executed successfully", **result}), 201
+        except SwapRejected as e:
+            db.session.rollback()
+            allocation_index.invalidate(data['station_id'])
+            return jsonify({"error": str(e)}), e.status_code
+        except OperationalError:
+            db.session.rollback()
+            allocation_index.invalidate(data['station_id'])
+            if attempt == EXECUTE_SWAP_ATTEMPTS - 1:
+                raise
+
+def _filter_swaps(query):
+    station_ids = int_list_arg('station_id')
+    if station_ids:
+        query = query.filter(or_(Swap.pickup_station_id.in_(station_ids),
+                                 Swap.deposit_station_id.in_(station_ids)))
+    pickup_station_ids = int_list_arg('pickup_station_id')
+    if pickup_station_ids:
+        query = query.filter(Swap.pickup_station_id.in_(pickup_station_ids))
+    deposit_station_ids = int_list_arg('deposit_station_id')
+    if deposit_station_ids:
+        query = query.filter(Swap.deposit_station_id.in_(deposit_station_ids))
+
+    battery_id = int_arg('battery_id')
+    if battery_id is not None:
+        query = query.filter(or_(Swap.issued_battery_id == battery_id,
+                                 Swap.returned_battery_id == battery_id))
+
+    since = datetime_arg('since')
+    if since is not None:
+        query = query.filter(Swap.start_time >= since)
+    until = datetime_arg('until')
+    if until is not None:
+        query = query.filter(Swap.start_time < until)
+    return query
+
 @swap_bp.route('/swaps', methods=['GET'])
+@replica_reads
 def get_swaps():
-    swaps = Swap.query.all()
-    return jsonify([{
-        "id": swap.id,
-        "issued_battery_id": swap.issued_battery_id,
-        "returned_battery_id": swap.returned_battery_id,
-        "user_id": swap.user_id,
-        "pickup_station_id": swap.pickup_station_id,
-        "deposit_station_id": swap.deposit_station_id,
-        "start_time": str(swap.start_time) if swap.start_time else None,
-        "end_time": str(swap.end_time) if swap.end_time else None,
-        "battery_percentage_start": swap.battery_percentage_start,
-        "battery_percentage_end": swap.battery_percentage_end,
-        "ah_used": swap.ah_used,
-        "created_at": str(swap.created_at),
-        "updated_at": str(swap.updated_at),
-        "user_name": swap.user.name if swap.user else None,
-        "user_email": swap.user.email if swap.user else None
-    } for swap in swaps])
+    query, serialize = swap_schema.select(fields_arg(swap_schema.names))
+    query = _filter_swaps(query)
+    user_id = int_arg('user_id')
+    if user_id is not None:
+        query = query.filter(Swap.user_id == user_id)
+    return list_response(query, Swap.id, serialize)
 
 @swap_bp.route('/swaps/<int:swap_id>', methods=['GET'])
 def get_swap(swap_id):
     swap = Swap.query.get_or_404(swap_id)
-    return jsonify({
-        "id": swap.id,
-        "issued_battery_id": swap.issued_battery_id,
-        "returned_battery_id": swap.returned_battery_id,
-        "user_id": swap.user_id,
-        "pickup_station_id": swap.pickup_station_id,
-        "deposit_station_id": swap.deposit_station_id,
-        "start_time": str(swap.start_time) if swap.start_time else None,
-        "end_time": str(swap.end_time) if swap.end_time else None,
-        "battery_percentage_start": swap.battery_percentage_start,
-        "battery_percentage_end": swap.battery_percentage_end,
-        "ah_used": swap.ah_used,
-        "created_at": str(swap.created_at),
-        "updated_at": str(swap.updated_at),
-        "user_name": swap.user.name if swap.user else None,
-        "user_email": swap.user.email if swap.user else None
-    })
+    return jsonify(swap_schema.dump(swap, fields_arg(swap_schema.names)))
 
 @swap_bp.route('/swaps/<int:swap_id>', methods=['PUT'])
 def update_swap(swap_id):
     swap = Swap.query.get_or_404(swap_id)
     data = request.get_json()
+    previous_usage = (swap.user_id, swap.start_time, swap.ah_used)
+    previous_bucket = (swap.pickup_station_id, swap.start_time, swap.ah_used)
 
     if 'user_id' in data:
         user = User.query.get(data['user_id'])
@@ -139,32 +313,31 @@ def update_swap(swap_id):
     swap.battery_percentage_start = data.get('battery_percentage_start', swap.battery_percentage_start)
     swap.battery_percentage_end = data.get('battery_percentage_end', swap.battery_percentage_end)
     swap.ah_used = data.get('ah_used', swap.ah_used)
-    
+
+    if (swap.user_id, swap.start_time, swap.ah_used) != previous_usage:
+        record_swap_usage(*previous_usage, sign=-1)
+        record_swap_usage(swap.user_id, swap.start_time, swap.ah_used)
+    if (swap.pickup_station_id, swap.start_time, swap.ah_used) != previous_bucket:
+        refresh_swap_buckets([previous_bucket[:2], (swap.pickup_station_id, swap.start_time)])
     db.session.commit()
+    publish('swap.updated', swap_schema.dump(swap))
     return jsonify({"message": "Swap updated successfully"})
 
 @swap_bp.route('/swaps/<int:swap_id>', methods=['DELETE'])
 def delete_swap(swap_id):
     swap = Swap.query.get_or_404(swap_id)
     db.session.delete(swap)
+    db.session.add(DeletedRecord.for_row(swap))
+    record_swap_usage(swap.user_id, swap.start_time, swap.ah_used, sign=-1)
+    refresh_swap_buckets([(swap.pickup_station_id, swap.start_time)])
     db.session.commit()
+    publish('swap.deleted', {"id": swap_id})
     return jsonify({"message": "Swap deleted successfully"})
 
 @swap_bp.route('/users/<int:user_id>/swaps', methods=['GET'])
+@replica_reads
 def get_user_swaps(user_id):
     user = User.query.get_or_404(user_id)
-    swaps = Swap.query.filter_by(user_id=user_id).all()
-    return jsonify([{
-        "id": swap.id,
-        "issued_battery_id": swap.issued_battery_id,
-        "returned_battery_id": swap.returned_battery_id,
-        "pickup_station_id": swap.pickup_station_id,
-        "deposit_station_id": swap.deposit_station_id,
-        "start_time": str(swap.start_time) if swap.start_time else None,
-        "end_time": str(swap.end_time) if swap.end_time else None,
-        "battery_percentage_start": swap.battery_percentage_start,
-        "battery_percentage_end": swap.battery_percentage_end,
-        "ah_used": swap.ah_used,
-        "created_at": str(swap.created_at),
-        "updated_at": str(swap.updated_at)
-    } for swap in swaps])
+    query, serialize = swap_schema.select(fields_arg(USER_SWAP_FIELDS))
+    query = _filter_swaps(query.filter(Swap.user_id == user_id))
+    return list_response(query, Swap.id, serialize)
@@ -0,0 +1,106 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, timedelta
+from flask import Blueprint, jsonify, request
+from sqlalchemy import and_, or_
+from models import db, User, Battery, Station, Swap, DeletedRecord
+from pagination import datetime_arg, int_arg, InvalidParameter
+
+sync_bp = Blueprint('sync', __name__)
+
+SYNC_MODELS = (User, Battery, Station, Swap)
+EXCLUDED_COLUMNS = {'password_hash'}
+DEFAULT_SYNC_LIMIT = 5000
+MAX_SYNC_LIMIT = 20000
+# Rows committed by transactions that started just before the query can carry
+# an updated_at slightly older than "now"; handing out a position a little in
+# the past makes the next call pick them up (clients upsert, so repeats are harmless).
+SAFETY_WINDOW = timedelta(seconds=2)
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return str(value)
+    return value
+
+def _row(model, obj):
+    return {column.key: _json_value(getattr(obj, column.key))
+            for column in model.__table__.columns if column.key not in EXCLUDED_COLUMNS}
+
+def _encode_cursor(positions):
+    payload = {stream: [moment.isoformat(), last_id] for stream, (moment, last_id) in positions.items()}
+    return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor, streams):
+    # The cursor holds one (timestamp, id) position per stream: each synced
+    # table and each table's tombstones.
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(urlsafe_b64decode(padded.encode()).decode())
+        return {stream: (datetime.fromisoformat(payload[stream][0]), int(payload[stream][1]))
+                for stream in streams}
+    except (ValueError, TypeError, KeyError, IndexError, UnicodeDecodeError):
+        raise InvalidParameter(f"Invalid cursor: {cursor}")
+
+def _after(query, time_column, id_column, position):
+    # Rows strictly after (timestamp, id), so a page boundary inside a run of
+    # rows sharing one updated_at resumes where it stopped.
+    if position is None:
+        return query
+    moment, last_id = position
+    return query.filter(or_(time_column > moment, and_(time_column == moment, id_column > last_id)))
+
+def _page(query, time_column, id_column, position, limit, fallback):
+    rows = _after(query, time_column, id_column, position).order_by(
+        time_column, id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (getattr(last, time_column.key), getattr(last, id_column.key)), True
+    return rows, fallback, False
+
+@sync_bp.route('/sync', methods=['GET'])
+def sync():
+    # First call with ?since=<ISO datetime> (or nothing for a full snapshot),
+    # then pass the returned cursor back until has_more is false, and keep
+    # polling with the latest cursor.
+    streams = [model.__tablename__ for model in SYNC_MODELS]
+    streams += ['deleted:' + stream for stream in streams]
+    cursor = request.args.get('cursor')
+    since = datetime_arg('since')
+    if cursor:
+        positions = _decode_cursor(cursor, streams)
+    else:
+        positions = {stream: None if since is None else (since, 0) for stream in streams}
+    limit = int_arg('limit')
+    if limit is None:
+        limit = DEFAULT_SYNC_LIMIT
+    elif limit < 1:
+        raise InvalidParameter("Query parameter 'limit' must be positive")
+    limit = min(limit, MAX_SYNC_LIMIT)
+
+    fallback = (datetime.utcnow() - SAFETY_WINDOW, 0)
+    changes, deleted, next_positions, has_more = {}, {}, {}, False
+    for model in SYNC_MODELS:
+        table = model.__tablename__
+        rows, next_positions[table], truncated = _page(
+            model.query, model.updated_at, model.id, positions[table], limit, fallback)
+        has_more |= truncated
+        changes[table] = [_row(model, obj) for obj in rows]
+
+        stream = 'deleted:' + table
+        if positions[stream] is None:
+            # A full snapshot has nothing to delete; later calls start at its time.
+            deleted[table], next_positions[stream] = [], fallback
+            continue
+        tombstones, next_positions[stream], truncated = _page(
+            DeletedRecord.query.filter(DeletedRecord.table_name == table),
+            DeletedRecord.deleted_at, DeletedRecord.id, positions[stream], limit, fallback)
+        has_more |= truncated
+        deleted[table] = [record.record_id for record in tombstones]
+
+    return jsonify({
+        "cursor": _encode_cursor(next_positions),
+        "has_more": has_more,
+        "changes": changes,
+        "deleted": deleted
+    })
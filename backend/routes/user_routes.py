@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
-from models import db, User
+from models import db, User, DeletedRecord, user_schema
+from pagination import fields_arg
+from streaming import list_response
+from rfid_auth import rfid_auth_cache
+from replicas import replica_reads
 
 user_bp = Blueprint('user', __name__)
 
@@ -29,32 +33,15 @@ def create_user():
     return jsonify({"message": "User created successfully", "user_id": new_user.id}), 201
 
 @user_bp.route('/users', methods=['GET'])
+@replica_reads
 def get_users():
-    users = User.query.all()
-    return jsonify([{
-        "id": user.id, "name": user.name, "email": user.email, "phone": user.phone,
-        "address": user.address, "license_number": user.license_number,
-        "license_expiry": str(user.license_expiry) if user.license_expiry else None,
-        "motocycle_model": user.motocycle_model, "motocycle_year": user.motocycle_year,
-        "subscription_plan_id": user.subscription_plan_id,
-        "subscription_start": str(user.subscription_start) if user.subscription_start else None,
-        "is_active": user.is_active, "role": user.role,
-        "created_at": str(user.created_at), "updated_at": str(user.updated_at)
-    } for user in users])
+    query, serialize = user_schema.select(fields_arg(user_schema.names))
+    return list_response(query, User.id, serialize)
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
-    return jsonify({
-        "id": user.id, "name": user.name, "email": user.email, "phone": user.phone,
-        "address": user.address, "license_number": user.license_number,
-        "license_expiry": str(user.license_expiry) if user.license_expiry else None,
-        "motocycle_model": user.motocycle_model, "motocycle_year": user.motocycle_year,
-        "subscription_plan_id": user.subscription_plan_id,
-        "subscription_start": str(user.subscription_start) if user.subscription_start else None,
-        "is_active": user.is_active, "role": user.role,
-        "created_at": str(user.created_at), "updated_at": str(user.updated_at)
-    })
+    return jsonify(user_schema.dump(user, fields_arg(user_schema.names)))
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
@@ -77,11 +64,14 @@ def update_user(user_id):
         user.password_hash = data.get('password_hash')
 
     db.session.commit()
+    rfid_auth_cache.invalidate_user(user_id)
     return jsonify({"message": "User updated successfully"})
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
+    db.session.add(DeletedRecord.for_row(user))
     db.session.commit()
+    rfid_auth_cache.invalidate_user(user_id)
     return jsonify({"message": "User deleted successfully"})
\ No newline at end of file
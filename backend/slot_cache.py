@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+from flask import Response, request
+from allocation import allocation_index
+from station_index import station_index
+from pagination import encode_cursor
+from streaming import dumps
+
+ALL_SLOTS = 'all'
+# Distinct /slots pages (after, limit) kept encoded per cache entry.
+MAX_ENCODED_PAGES = 64
+
+
+def station_key(station_id):
+    return ('station', station_id)
+
+
+def _encoded(items):
+    # The ETag is a hash of the JSON body, so every worker process hands out
+    # the same tag for the same grid and If-None-Match holds across workers.
+    body = dumps(items)
+    return hashlib.sha1(body).hexdigest()[:20], body
+
+
+def _page(items, after, limit):
+    # One keyset page of an id-ordered list, in the same envelope as paginate().
+    start = next((n for n, item in enumerate(items) if item['id'] > after), len(items))
+    rows = items[start:start + limit]
+    has_more = len(items) > start + limit
+    return {"data": rows, "next_cursor": encode_cursor(rows[-1]['id']) if has_more else None}
+
+
+class SlotStateCache:
+    # Serialized slot lists keyed per station (plus one for /slots), updated
+    # write-through by the write routes and encoded once per change (per page
+    # for /slots). The ETag
+    # is a hash of the encoded body, so unchanged grids can be answered with 304
+    # without touching the DB. A version counter per key detects writes that
+    # land while a grid is loading. Entries older than ttl seconds are
+    # reloaded, which bounds staleness when several worker processes each hold
+    # their own cache.
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._versions = {}
+
+    def get(self, key, loader, page=None):
+        # Returns (etag, body) with the JSON-encoded list, or with one page of
+        # it when page is (after_id, limit), or (None, None) when the loader
+        # returns None.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                if page in entry[2]:
+                    return entry[2][page]
+                loaded_at, items = entry[0], entry[1]
+            else:
+                loaded_at, items = now, None
+            version = self._versions.get(key, 0)
+
+        if items is None:
+            items = loader()
+            if items is None:
+                return None, None
+        encoded = _encoded(items if page is None else _page(items, *page))
+        with self._lock:
+            # A write that landed meanwhile wins; serve this result uncached.
+            if self._versions.get(key, 0) == version:
+                entry = self._entries.get(key)
+                if entry is None or entry[1] is not items or len(entry[2]) >= MAX_ENCODED_PAGES:
+                    entry = self._entries[key] = (loaded_at, items, {})
+                entry[2][page] = encoded
+        return encoded
+
+    def upsert(self, key, item):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            items = [i for i in entry[1] if i['id'] != item['id']] + [item]
+            items.sort(key=lambda i: i['id'])
+            self._entries[key] = (entry[0], items, {})
+
+    def discard(self, key, item_id):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], [i for i in entry[1] if i['id'] != item_id], {})
+
+    def invalidate(self, key=None):
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                self._versions[k] = self._versions.get(k, 0) + 1
+                self._entries.pop(k, None)
+
+
+def station_slot_item(slot):
+    return {
+        "id": slot.id,
+        "slot_number": slot.slot_number,
+        "battery_id": slot.battery_id,
+        "status": slot.status,
+        "is_charging": slot.is_charging,
+        "last_updated": str(slot.last_updated)
+    }
+
+
+def slot_item(slot):
+    return {
+        "id": slot.id,
+        "station_id": slot.station_id,
+        "slot_number": slot.slot_number,
+        "battery_id": slot.battery_id,
+        "status": slot.status,
+        "is_charging": slot.is_charging,
+        "last_updated": str(slot.last_updated),
+        "station_name": slot.station.name if slot.station else None,
+        "battery_serial": slot.battery.serial_number if slot.battery else None
+    }
+
+
+slot_cache = SlotStateCache(ttl=float(os.environ.get('SLOT_CACHE_TTL', 5.0)))
+
+
+def conditional_json(etag, body):
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
+def write_through(slot, previous_station_id=None):
+    if previous_station_id is not None and previous_station_id != slot.station_id:
+        slot_cache.discard(station_key(previous_station_id), slot.id)
+        allocation_index.invalidate(previous_station_id)
+        station_index.mark_dirty(previous_station_id)
+    slot_cache.upsert(station_key(slot.station_id), station_slot_item(slot))
+    slot_cache.upsert(ALL_SLOTS, slot_item(slot))
+    allocation_index.invalidate(slot.station_id)
+    station_index.mark_dirty(slot.station_id)
+
+
+def write_through_delete(station_id, slot_id):
+    slot_cache.discard(station_key(station_id), slot_id)
+    slot_cache.discard(ALL_SLOTS, slot_id)
+    allocation_index.invalidate(station_id)
+    station_index.mark_dirty(station_id)
@@ -0,0 +1,153 @@
+import heapq
+import os
+import threading
+import time
+from math import asin, cos, floor, radians, sin, sqrt
+from models import db, Station
+from allocation import ready_slot_counts
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.19
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class StationGeoIndex:
+    # Stations with coordinates bucketed into a fixed grid of cell_degrees
+    # squares, plus a cache of ready-battery counts per station. A search walks
+    # rings of cells outwards from the query point and stops as soon as the k
+    # nearest matches found so far are closer than anything in the next ring.
+    # Station writes reload the grid; slot and battery writes mark counts
+    # dirty, and only dirty stations are re-counted on the next search. Both
+    # are also reloaded after ttl seconds for writes made by other workers.
+
+    def __init__(self, cell_degrees=0.05, ttl=30.0):
+        self.cell = cell_degrees
+        self.columns = int(round(360 / cell_degrees))
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._grid = None
+        self._stations = {}
+        self._counts = None
+        self._dirty = set()
+        self._loaded_at = 0.0
+        self._generation = 0
+
+    def _cell(self, lat, lon):
+        return floor((lat + 90) / self.cell), floor((lon + 180) / self.cell) % self.columns
+
+    def _load_stations(self):
+        grid = {}
+        stations = {}
+        for station_id, name, location, lat, lon in db.session.query(
+                Station.id, Station.name, Station.location, Station.latitude, Station.longitude
+        ).filter(Station.latitude.isnot(None), Station.longitude.isnot(None)):
+            stations[station_id] = (name, location, lat, lon)
+            grid.setdefault(self._cell(lat, lon), []).append((station_id, lat, lon))
+        return grid, stations
+
+    def _snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._grid is not None and now - self._loaded_at < self.ttl:
+                dirty, self._dirty = self._dirty, set()
+                # Keep this snapshot: invalidate_stations() may clear _grid
+                # while the dirty counts are re-read without the lock.
+                grid, stations, counts = self._grid, self._stations, self._counts
+                if not dirty:
+                    return grid, stations, counts
+            else:
+                dirty, self._dirty = None, set()
+            generation = self._generation
+
+        if dirty is None:
+            grid, stations = self._load_stations()
+            counts = ready_slot_counts()
+        else:
+            fresh = ready_slot_counts(list(dirty))
+        with self._lock:
+            if dirty is None:
+                if generation == self._generation:
+                    self._grid, self._stations, self._counts = grid, stations, counts
+                    self._loaded_at = now
+                return grid, stations, counts
+            for station_id in dirty:
+                counts[station_id] = fresh.get(station_id, 0)
+            return grid, stations, counts
+
+    def invalidate_stations(self):
+        with self._lock:
+            self._generation += 1
+            self._grid = None
+
+    def mark_dirty(self, station_id):
+        with self._lock:
+            self._dirty.add(station_id)
+
+    def nearby(self, lat, lon, limit=10, min_available=1, radius_km=50.0):
+        grid, stations, counts = self._snapshot()
+        row, column = self._cell(lat, lon)
+        best = []
+        ring = 0
+        max_rings = int(radius_km / (KM_PER_DEGREE * self.cell)) + 1
+        # Longitude degrees shrink towards the poles, so widen the walk to cover
+        # radius_km east and west at this latitude.
+        lon_scale = max(cos(radians(min(abs(lat) + radius_km / KM_PER_DEGREE, 89.0))), 0.01)
+        max_lon_rings = min(int(max_rings / lon_scale) + 1, self.columns // 2)
+        while ring <= max(max_rings, max_lon_rings):
+            for cell in self._ring(row, column, ring, max_rings, max_lon_rings):
+                for station_id, s_lat, s_lon in grid.get(cell, ()):
+                    if counts.get(station_id, 0) < min_available:
+                        continue
+                    distance = haversine_km(lat, lon, s_lat, s_lon)
+                    if distance > radius_km:
+                        continue
+                    if len(best) < limit:
+                        heapq.heappush(best, (-distance, station_id))
+                    elif -best[0][0] > distance:
+                        heapq.heapreplace(best, (-distance, station_id))
+            # Every cell outside this ring is at least ring cells of latitude,
+            # or ring cells of longitude at the narrowest latitude, away.
+            reach = ring * self.cell * KM_PER_DEGREE * lon_scale
+            if len(best) == limit and -best[0][0] <= reach:
+                break
+            ring += 1
+
+        return [{
+            "station_id": station_id,
+            "name": stations[station_id][0],
+            "location": stations[station_id][1],
+            "latitude": stations[station_id][2],
+            "longitude": stations[station_id][3],
+            "distance_km": round(-negative, 3),
+            "available": counts.get(station_id, 0)
+        } for negative, station_id in sorted(best, reverse=True)]
+
+    def _ring(self, row, column, ring, max_rows, max_columns):
+        # Cells whose Chebyshev distance from (row, column) is exactly ring,
+        # clipped to the latitude and longitude extents of the search.
+        if ring == 0:
+            yield row, column
+            return
+        rows = range(max(row - min(ring, max_rows), 0), row + min(ring, max_rows) + 1)
+        if ring <= max_columns:
+            for r in rows:
+                yield r, (column - ring) % self.columns
+                if ring * 2 < self.columns:
+                    yield r, (column + ring) % self.columns
+        if ring <= max_rows:
+            for dc in range(-min(ring - 1, max_columns), min(ring - 1, max_columns) + 1):
+                c = (column + dc) % self.columns
+                yield row - ring, c
+                yield row + ring, c
+
+
+station_index = StationGeoIndex(
+    cell_degrees=float(os.environ.get('STATION_INDEX_CELL_DEGREES', 0.05)),
+    ttl=float(os.environ.get('STATION_INDEX_TTL', 30.0))
+)
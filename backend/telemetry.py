@@ -0,0 +1,240 @@
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from models import db, Battery, BatteryHealthLog
+from events import publish
+from anomaly import check_readings
+from allocation import allocation_index
+
+HEALTH_LOG_FIELDS = (
+    'soh_percent', 'pack_voltage', 'cell_voltage_min', 'cell_voltage_max',
+    'cell_voltage_diff', 'max_temp', 'ambient_temp', 'humidity',
+    'internal_resist', 'cycle_count', 'error_code'
+)
+NUMERIC_FIELDS = HEALTH_LOG_FIELDS[:-1]
+INTEGER_FIELDS = ('cycle_count',)
+INSERT_COLUMNS = ('battery_id',) + HEALTH_LOG_FIELDS + ('created_at',)
+ERROR_CODE_COLUMN = INSERT_COLUMNS.index('error_code')
+CREATED_AT_COLUMN = INSERT_COLUMNS.index('created_at')
+ERROR_CODE_LENGTH = BatteryHealthLog.__table__.c.error_code.type.length
+MAX_BATCH_SIZE = 50000
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _reading_row(item, known_battery_ids, received_at):
+    if not isinstance(item, dict):
+        return None, "Reading must be a JSON object"
+    battery_id = item.get('battery_id')
+    if battery_id is None:
+        return None, "Missing required field: battery_id"
+    if not _is_integer(battery_id):
+        return None, "Field 'battery_id' must be an integer"
+    if battery_id not in known_battery_ids:
+        return None, f"Battery with id {battery_id} not found"
+
+    values = [battery_id]
+    for field in NUMERIC_FIELDS:
+        value = item.get(field)
+        if value is not None:
+            if field in INTEGER_FIELDS and not _is_integer(value):
+                return None, f"Field '{field}' must be an integer"
+            if not _is_number(value):
+                return None, f"Field '{field}' must be a number"
+        values.append(value)
+
+    # Devices report codes as strings or plain numbers; the column is a string.
+    error_code = item.get('error_code')
+    if _is_integer(error_code):
+        error_code = str(error_code)
+    elif error_code is not None and (not isinstance(error_code, str) or len(error_code) > ERROR_CODE_LENGTH):
+        return None, f"Field 'error_code' must be a string of at most {ERROR_CODE_LENGTH} characters"
+    values.append(error_code)
+
+    created_at = item.get('created_at')
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            return None, "Field 'created_at' must be an ISO 8601 datetime"
+    values.append(created_at or received_at)
+    return tuple(values), None
+
+
+def validate_readings(items):
+    # One IN query checks every referenced battery instead of a lookup per reading.
+    battery_ids = {item.get('battery_id') for item in items
+                   if isinstance(item, dict) and _is_integer(item.get('battery_id'))}
+    known_battery_ids = set()
+    if battery_ids:
+        known_battery_ids = {battery_id for (battery_id,) in
+                             db.session.query(Battery.id).filter(Battery.id.in_(battery_ids))}
+
+    received_at = datetime.utcnow()
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        row, error = _reading_row(item, known_battery_ids, received_at)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def publish_alerts(readings):
+    for reading in readings:
+        if reading.get('error_code'):
+            publish('health_log.alert', {
+                "battery_id": reading['battery_id'],
+                "error_code": reading['error_code'],
+                "created_at": str(reading.get('created_at'))
+            })
+
+
+def process_readings(readings):
+    # Runs after readings are stored: re-ranks batteries waiting in slots and
+    # checks the readings for anomalies.
+    readings = list(readings)
+    allocation_index.update_health(readings)
+    check_readings(readings)
+
+
+_PLACEHOLDERS = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+
+
+def _insert_sql(dialect):
+    placeholder = _PLACEHOLDERS.get(dialect.paramstyle)
+    if placeholder is None:
+        return None
+    return (f"INSERT INTO {BatteryHealthLog.__tablename__} ({', '.join(INSERT_COLUMNS)}) "
+            f"VALUES ({', '.join([placeholder] * len(INSERT_COLUMNS))})")
+
+
+def insert_readings(rows):
+    # Rows are tuples ordered like INSERT_COLUMNS and are sent straight to the driver's executemany: Core's per-row bind
+    # processing costs more than the insert itself at these volumes. The MySQL
+    # driver rewrites the executemany into multi-row INSERT statements.
+    if rows:
+        connection = db.session.connection()
+        sql = _insert_sql(connection.dialect)
+        if sql is None:
+            connection.execute(BatteryHealthLog.__table__.insert(),
+                               [dict(zip(INSERT_COLUMNS, row)) for row in rows])
+        else:
+            # Timestamps go through the column type's bind processor so they are
+            # stored in the ORM's format (SQLite keeps them as text and compares
+            # them as strings).
+            dialect = connection.dialect
+            to_db = dialect.type_descriptor(BatteryHealthLog.__table__.c.created_at.type).bind_processor(dialect)
+            if to_db is not None:
+                rows = [row[:CREATED_AT_COLUMN] + (to_db(row[CREATED_AT_COLUMN]),) + row[CREATED_AT_COLUMN + 1:]
+                        for row in rows]
+            connection.exec_driver_sql(sql, rows)
+    db.session.commit()
+
+
+class WriteBehindBuffer:
+    # Bounded in-process queue for single health-log posts. Requests return as
+    # soon as a reading is queued; a background thread validates and inserts
+    # readings in batches when batch_size is reached or flush_interval elapses.
+
+    def __init__(self, max_size=100000, batch_size=5000, flush_interval=1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._app = None
+        self._stats = {
+            "accepted": 0, "rejected": 0, "flushed_rows": 0, "dropped_rows": 0,
+            "flush_count": 0, "flush_seconds_total": 0.0, "last_flush_ms": None, "max_flush_ms": 0.0
+        }
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['health_log_buffer'] = self
+        self._thread = threading.Thread(target=self._run, name='health-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, reading):
+        with self._cond:
+            if len(self._items) >= self.max_size:
+                self._stats["rejected"] += 1
+                return False
+            self._items.append(reading)
+            self._stats["accepted"] += 1
+            if len(self._items) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def stop(self):
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def metrics(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._items)
+        stats["capacity"] = self.max_size
+        flushes = stats.pop("flush_seconds_total")
+        stats["avg_flush_ms"] = flushes * 1000 / stats["flush_count"] if stats["flush_count"] else None
+        return stats
+
+    def _take_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._items) >= self.batch_size or self._stopping,
+                                timeout=self.flush_interval)
+            count = min(len(self._items), self.batch_size)
+            return [self._items.popleft() for _ in range(count)], self._stopping
+
+    def _run(self):
+        # Keeps draining after stop() so readings queued before shutdown are written.
+        while True:
+            batch, stopping = self._take_batch()
+            if batch:
+                self._flush(batch)
+            elif stopping:
+                return
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self._app.app_context():
+            try:
+                rows, errors = validate_readings(batch)
+                insert_readings(rows)
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception("Failed to flush %d battery health logs", len(batch))
+                rows, errors = [], batch
+            try:
+                # Alerts only for readings that passed validation and were stored.
+                publish_alerts(dict(zip(INSERT_COLUMNS, row)) for row in rows if row[ERROR_CODE_COLUMN])
+                process_readings(dict(zip(INSERT_COLUMNS, row)) for row in rows)
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception("Failed to process %d stored battery health logs", len(rows))
+        elapsed = time.perf_counter() - started
+
+        with self._cond:
+            self._stats["flushed_rows"] += len(rows)
+            self._stats["dropped_rows"] += len(errors)
+            self._stats["flush_count"] += 1
+            self._stats["flush_seconds_total"] += elapsed
+            self._stats["last_flush_ms"] = elapsed * 1000
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed * 1000)
@@ -0,0 +1,58 @@
+"""pytest-benchmark port of benchmarks.suite over a small generated fleet.
+
+    cd backend
+    python -m pytest tests/benchmarks --benchmark-autosave
+    # ... change swap_routes.py or models.py ...
+    python -m pytest tests/benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+
+Each case is timed through the Flask test client and grouped by blueprint;
+the SQL statements per request are stored in the run's extra_info. Only
+compare runs made on the same machine. Skip the cases with --benchmark-skip.
+"""
+import random
+
+import pytest
+
+from app import create_app
+from benchmarks.cases import cases, sql_totals
+from benchmarks.datagen import SCALES, generate
+from models import db
+
+SCALE = SCALES['small']
+SEED = 42
+CASES = cases(SCALE)
+HEAVY_ROUNDS = 20
+
+
+@pytest.fixture(scope='session')
+def fleet(tmp_path_factory):
+    path = tmp_path_factory.mktemp('fleet') / 'fleet.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    with app.app_context():
+        db.create_all()
+        generate(random.Random(SEED), log=lambda line: None, **SCALE)
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize('blueprint, name, method, url, body, heavy', CASES, ids=[case[1] for case in CASES])
+def test_endpoint(benchmark, fleet, blueprint, name, method, url, body, heavy):
+    client = fleet.test_client()
+    metrics = fleet.extensions['request_metrics']
+    rng = random.Random(SEED)
+    statuses = []
+
+    def send():
+        statuses.append(client.open(url(rng), method=method, json=body(rng) if body else None).status_code)
+
+    benchmark.group = blueprint
+    requests_before, queries_before = sql_totals(metrics)
+    if heavy:
+        benchmark.pedantic(send, rounds=HEAVY_ROUNDS, warmup_rounds=2)
+    else:
+        benchmark(send)
+    requests_after, queries_after = sql_totals(metrics)
+    benchmark.extra_info['queries'] = round((queries_after - queries_before) / max(requests_after - requests_before, 1), 2)
+    assert all(status < 400 for status in statuses), statuses
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py builds its module-level app on import, so point it at a throwaway
+# database and keep change events in-process before anything imports it.
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'import.db')
+os.environ['EVENTS_FANOUT'] = 'memory'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from allocation import allocation_index  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from rfid_auth import rfid_auth_cache  # noqa: E402
+from slot_cache import slot_cache  # noqa: E402
+from station_index import station_index  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"})
+    with app.app_context():
+        db.create_all()
+    # The in-process caches outlive an app; each test starts on an empty database.
+    for reset in (allocation_index.invalidate, slot_cache.invalidate, station_index.invalidate_stations,
+                  rfid_auth_cache.clear):
+        reset()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from analytics import parse_bucket, time_bucket
+from models import BatteryHealthLog
+
+
+@pytest.mark.parametrize('name, dialect, expected', [
+    ('mysql', mysql.dialect(), "date_format(battery_health_logs.created_at, '%%Y-%%m-%%d %%H:%%i:00')"),
+    ('sqlite', sqlite.dialect(), "strftime('%Y-%m-%d %H:%M:00', battery_health_logs.created_at)"),
+    ('postgresql', postgresql.dialect(), "to_char(battery_health_logs.created_at, 'YYYY-MM-DD HH24:MI:00')"),
+])
+def test_minute_bucket_format_per_database(name, dialect, expected):
+    bucket = time_bucket(BatteryHealthLog.created_at, 'minute', name)
+    assert str(bucket.compile(dialect=dialect, compile_kwargs={'literal_binds': True})) == expected
+
+
+def test_parse_bucket_reads_minute_buckets():
+    assert parse_bucket('2024-05-03 10:07:00') == datetime(2024, 5, 3, 10, 7)
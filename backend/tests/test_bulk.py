@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import DataError
+
+from models import db, Battery
+
+
+def errors_by_index(response):
+    return {result['index']: result.get('error') for result in response.get_json()['results']}
+
+
+def test_over_long_strings_fail_their_own_items(app, client):
+    response = client.post('/api/batteries/batch', json=[
+        {'serial_number': 'BAT1', 'status': 'available'},
+        {'serial_number': 'B' * 256, 'status': 'available'},
+        {'serial_number': 'BAT3', 'status': 'available', 'manufacture_date': '2024-01-01T00:00:00'},
+    ])
+    assert response.status_code == 201
+    errors = errors_by_index(response)
+    assert errors[0] is None
+    assert errors[1] == 'Field serial_number must be at most 255 characters'
+    assert errors[2] == 'Field manufacture_date must be at most 10 characters'
+
+    response = client.put('/api/batteries/batch', json=[{'id': 1, 'status': 's' * 51}])
+    assert response.status_code == 400
+    assert errors_by_index(response)[0] == 'Field status must be at most 50 characters'
+
+
+@pytest.fixture
+def strict_serials(app):
+    # Stands in for a strict-mode MySQL rejecting a value on write.
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        rows = parameters if executemany else [parameters]
+        if statement.startswith('INSERT') and any('REJECTED' in map(str, row) for row in rows):
+            raise DataError(statement, parameters, Exception('Data too long for column'))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_data_error_fails_only_the_rejected_item(app, client, strict_serials):
+    response = client.post('/api/batteries/batch', json=[
+        {'serial_number': 'BAT1', 'status': 'available'},
+        {'serial_number': 'REJECTED', 'status': 'available'},
+        {'serial_number': 'BAT3', 'status': 'available'},
+    ])
+    assert response.status_code == 201
+    errors = errors_by_index(response)
+    assert errors[0] is None and errors[2] is None
+    assert errors[1].startswith('Rejected by the database')
+    with app.app_context():
+        assert sorted(serial for (serial,) in db.session.query(Battery.serial_number)) == ['BAT1', 'BAT3']
@@ -0,0 +1,30 @@
+from events import broker
+
+
+def frames(response):
+    # The stream's frames, one per yielded chunk, as text.
+    for chunk in response.response:
+        yield chunk.decode() if isinstance(chunk, bytes) else chunk
+
+
+def test_reconnect_after_resync_is_not_resynced_again(client):
+    for i in range(len(broker._history) + broker._history.maxlen + 1):
+        broker.publish('battery.changed', {'id': i})
+
+    response = client.get('/api/events', headers={'Last-Event-ID': '0'}, buffered=False)
+    stream = frames(response)
+    assert next(stream).startswith('retry:')
+    resync = next(stream)
+    response.close()
+    assert 'event: resync' in resync
+    resume_id = resync.split('id: ')[1].split('\n')[0]
+    assert int(resume_id) == broker.last_id()
+
+    response = client.get('/api/events', headers={'Last-Event-ID': resume_id}, buffered=False)
+    stream = frames(response)
+    assert next(stream).startswith('retry:')
+    broker.publish('battery.changed', {'id': 'after'})
+    event = next(stream)
+    response.close()
+    assert 'event: battery.changed' in event
+    assert f'id: {int(resume_id) + 1}' in event
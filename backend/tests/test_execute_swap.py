@@ -0,0 +1,102 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from allocation import allocation_index
+from analytics import floor_hour, refresh_swap_rollup
+from models import db, Battery, RFIDCard, Slot, Station, Swap, SwapHourlyRollup, User
+
+
+def seed_station(app, batteries, riders, returning=False):
+    # Station 1 with one charged battery per slot. Returning riders each hold a
+    # battery of their own and the station has an empty slot for every one.
+    with app.app_context():
+        db.session.add(Station(id=1, name='Station 1'))
+        db.session.execute(Battery.__table__.insert(), [
+            {'id': i, 'serial_number': f'BAT{i}', 'status': 'available', 'station_id': 1}
+            for i in range(1, batteries + 1)])
+        db.session.execute(Slot.__table__.insert(), [
+            {'id': i, 'station_id': 1, 'slot_number': i, 'battery_id': i, 'status': 'occupied', 'is_charging': False}
+            for i in range(1, batteries + 1)])
+        db.session.execute(User.__table__.insert(), [
+            {'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x', 'is_active': True}
+            for i in range(1, riders + 1)])
+        held = {i: batteries + i if returning else None for i in range(1, riders + 1)}
+        if returning:
+            db.session.execute(Battery.__table__.insert(), [
+                {'id': battery_id, 'serial_number': f'BAT{battery_id}', 'status': 'in_use'}
+                for battery_id in held.values()])
+            db.session.execute(Slot.__table__.insert(), [
+                {'id': battery_id, 'station_id': 1, 'slot_number': battery_id, 'status': 'empty'}
+                for battery_id in held.values()])
+        db.session.execute(RFIDCard.__table__.insert(), [
+            {'id': i, 'user_id': i, 'rfid_code': f'CARD{i}', 'status': 'active', 'assigned_battery_id': held[i]}
+            for i in range(1, riders + 1)])
+        db.session.commit()
+
+
+def test_executed_swap_updates_the_hourly_rollup(app, client):
+    seed_station(app, batteries=2, riders=2)
+    with app.app_context():
+        db.session.add(Swap(user_id=2, pickup_station_id=1, start_time=datetime.utcnow(), ah_used=5.0))
+        db.session.commit()
+        refresh_swap_rollup(datetime.utcnow() - timedelta(hours=1))
+
+    response = client.post('/api/swaps/execute', json={'rfid_code': 'CARD1', 'station_id': 1, 'ah_used': 7.5})
+    assert response.status_code == 201
+
+    with app.app_context():
+        swap = Swap.query.get(response.get_json()['swap_id'])
+        rollup = SwapHourlyRollup.query.filter_by(station_id=1, bucket_start=floor_hour(swap.start_time)).one()
+        assert (rollup.swap_count, rollup.ah_used) == (2, 12.5)
+
+
+def test_concurrent_swaps_never_hand_out_a_battery_twice(app):
+    # More riders than charged batteries, swapping at one station from several
+    # threads, so claims on the same slots collide.
+    charged, riders, threads = 20, 40, 8
+    seed_station(app, batteries=charged, riders=riders, returning=True)
+    codes = [f'CARD{i}' for i in range(1, riders + 1)]
+    lock = threading.Lock()
+    results = []
+
+    def kiosk(kiosk_codes):
+        client = app.test_client()
+        for code in kiosk_codes:
+            response = client.post('/api/swaps/execute', json={'rfid_code': code, 'station_id': 1})
+            with lock:
+                results.append((response.status_code, response.get_json()))
+
+    workers = [threading.Thread(target=kiosk, args=(codes[i::threads],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert {status for status, _ in results} <= {201, 409}, results
+    issued = [body['issued_battery_id'] for status, body in results if status == 201]
+    assert [battery_id for battery_id, n in Counter(issued).items() if n > 1] == []
+    assert len(issued) == charged
+    with app.app_context():
+        assert Swap.query.count() == len(issued)
+        slotted = [battery_id for (battery_id,) in db.session.query(Slot.battery_id).filter(Slot.battery_id.isnot(None))]
+        assert len(slotted) == len(set(slotted))
+        assert not set(slotted) & set(issued)
+        assigned = [battery_id for (battery_id,) in db.session.query(RFIDCard.assigned_battery_id).filter(
+            RFIDCard.assigned_battery_id.isnot(None))]
+        assert len(assigned) == len(set(assigned))
+
+
+def test_slot_taken_behind_a_stale_index_is_not_handed_out(app, client):
+    # Another worker empties the best slot after this worker loaded its
+    # allocation index; the claim on the slot row must skip it.
+    seed_station(app, batteries=2, riders=1)
+    with app.app_context():
+        taken = allocation_index.peek(1)
+        db.session.query(Slot).filter(Slot.id == taken.id).update({'battery_id': None, 'status': 'empty'})
+        db.session.query(Battery).filter(Battery.id == taken.battery_id).update({'status': 'in_use', 'station_id': None})
+        db.session.commit()
+
+    response = client.post('/api/swaps/execute', json={'rfid_code': 'CARD1', 'station_id': 1})
+    assert response.status_code == 201
+    assert response.get_json()['issued_battery_id'] != taken.battery_id
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from models import db, Battery, BatteryHealthRollup, Station
+
+START = datetime(2024, 1, 1)
+
+
+def pages(client, url):
+    # Every page of a list endpoint, following next_cursor.
+    items, cursor = [], None
+    while True:
+        response = client.get(url + (f'&after={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        items.append(body['data'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return items
+
+
+def test_station_batteries_are_paged(app, client):
+    with app.app_context():
+        db.session.add(Station(id=1, name='Station 1'))
+        db.session.execute(Battery.__table__.insert(), [
+            {'id': i, 'serial_number': f'BAT{i}', 'status': 'available', 'station_id': 1} for i in range(1, 6)])
+        db.session.commit()
+
+    batches = pages(client, '/api/stations/1/batteries?limit=2')
+    assert [[battery['id'] for battery in batch] for batch in batches] == [[1, 2], [3, 4], [5]]
+
+
+def test_health_log_rollups_are_paged_on_bucket_start(app, client):
+    with app.app_context():
+        db.session.add(Battery(id=1, serial_number='BAT1', status='available'))
+        db.session.execute(BatteryHealthRollup.__table__.insert(), [
+            {'battery_id': 1, 'resolution': '1h', 'bucket_start': START + timedelta(hours=i), 'samples': 60}
+            for i in range(5)])
+        db.session.commit()
+
+    url = f'/api/batteries/1/health_logs?resolution=1h&until={(START + timedelta(days=1)).isoformat()}&limit=2'
+    batches = pages(client, url)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [item['bucket_start'] for batch in batches for item in batch] == \
+        [(START + timedelta(hours=i)).isoformat() for i in range(5)]
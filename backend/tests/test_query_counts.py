@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Battery, BatteryHealthLog, MonthlyBilling, RFIDCard, Slot, Station, Swap, User
+from slot_cache import slot_cache
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def statements(app):
+    # Every statement the app's engine sends, as seen by the DB-API cursor.
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed(app, first, last):
+    # Rows first..last, each swap, health log, slot, card and invoice pointing
+    # at its own user, battery and station so lazy loads would show up as one
+    # query per row.
+    ids = range(first, last + 1)
+    with app.app_context():
+        for model, rows in (
+            (User, [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+                    for i in ids]),
+            (Station, [{'id': i, 'name': f'Station {i}'} for i in ids]),
+            (Battery, [{'id': i, 'serial_number': f'BAT{i:06d}', 'status': 'available', 'station_id': i}
+                       for i in ids]),
+            (Swap, [{'id': i, 'user_id': i, 'issued_battery_id': i, 'returned_battery_id': i,
+                     'pickup_station_id': i, 'deposit_station_id': i,
+                     'start_time': START + timedelta(minutes=i), 'ah_used': 10.0} for i in ids]),
+            (BatteryHealthLog, [{'id': i, 'battery_id': i, 'soh_percent': 95.0,
+                                 'created_at': START + timedelta(minutes=i)} for i in ids]),
+            (Slot, [{'id': i, 'station_id': i, 'slot_number': 1, 'battery_id': i, 'status': 'occupied'}
+                    for i in ids]),
+            (RFIDCard, [{'id': i, 'user_id': i, 'rfid_code': f'CARD{i}', 'assigned_battery_id': i,
+                         'status': 'active'} for i in ids]),
+            (MonthlyBilling, [{'id': i, 'user_id': i, 'billing_month': '2024-01', 'total_amount_due': 30.0,
+                               'payment_status': 'unpaid'} for i in ids]),
+        ):
+            db.session.execute(model.__table__.insert(), rows)
+        db.session.commit()
+        db.session.remove()
+    # The slot list is served from an in-process cache that direct inserts do not reach.
+    slot_cache.invalidate()
+
+
+def count_queries(client, statements, url, rows):
+    del statements[:]
+    response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == rows
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', ['/api/swaps', '/api/battery_health_logs', '/api/slots', '/api/rfid_cards',
+                                 '/api/monthly_billings/unpaid'])
+def test_list_query_count_does_not_grow_with_rows(app, client, statements, url):
+    seed(app, 1, 3)
+    few = count_queries(client, statements, url, 3)
+    seed(app, 4, 60)
+    many = count_queries(client, statements, url, 60)
+    assert few == many, statements
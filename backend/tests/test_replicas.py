@@ -0,0 +1,96 @@
+import shutil
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app import create_app
+from models import db, Battery
+from replicas import ACCESS_DENIED_ERRNO, PRIMARY_HEADER
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    # A primary and two SQLite copies of it, each holding one battery of its
+    # own so a response shows which database served it.
+    primary = tmp_path / 'primary.db'
+    replicas = [tmp_path / f'replica_{i}.db' for i in (1, 2)]
+    monkeypatch.setenv('DATABASE_REPLICA_URIS', ','.join(f'sqlite:///{path}' for path in replicas))
+    monkeypatch.setenv('REPLICA_HEALTH_INTERVAL', '3600')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}'})
+    router = app.extensions['replica_router']
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+    for key, path in zip(router.keys, replicas):
+        router.engine(key).dispose()
+        shutil.copyfile(primary, path)
+        router.check(key)
+
+    engines = {'primary': None, **{key: router.engine(key) for key in router.keys}}
+    with app.app_context():
+        engines['primary'] = db.engine
+        for name, engine in engines.items():
+            with engine.begin() as connection:
+                connection.execute(Battery.__table__.insert(), {'serial_number': name, 'status': 'available'})
+    yield app
+    router.stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def serials(response):
+    assert response.status_code == 200
+    return {battery['serial_number'] for battery in response.get_json()['data']}
+
+
+def test_reads_round_robin_over_replicas(replica_app):
+    client = replica_app.test_client()
+    served = [serials(client.get('/api/batteries')) for _ in range(4)]
+    assert served == [{'replica_1'}, {'replica_2'}, {'replica_1'}, {'replica_2'}]
+
+
+def test_single_row_reads_use_the_primary(replica_app):
+    response = replica_app.test_client().get('/api/batteries/1')
+    assert response.get_json()['serial_number'] == 'primary'
+
+
+def test_header_pins_reads_to_the_primary(replica_app):
+    client = replica_app.test_client()
+    assert serials(client.get('/api/batteries', headers={PRIMARY_HEADER: 'primary'})) == {'primary'}
+
+
+def test_reads_stay_on_the_primary_after_a_write(replica_app):
+    client = replica_app.test_client()
+    response = client.post('/api/batteries', json={'serial_number': 'written', 'status': 'available'})
+    assert response.status_code == 201
+    assert serials(client.get('/api/batteries')) == {'primary', 'written'}
+    assert serials(replica_app.test_client().get('/api/batteries')) == {'replica_1'}
+
+
+def test_failed_replica_read_is_retried_on_the_primary(replica_app):
+    router = replica_app.extensions['replica_router']
+    for key in router.keys:
+        with router.engine(key).begin() as connection:
+            connection.exec_driver_sql('DROP TABLE batteries')
+    client = replica_app.test_client()
+    assert serials(client.get('/api/batteries')) == {'primary'}
+    assert serials(client.get('/api/batteries')) == {'primary'}
+
+
+class _Denied(Exception):
+    errno = ACCESS_DENIED_ERRNO
+
+
+class _StatusConnection:
+    def __init__(self, error):
+        self.error = error
+
+    def execute(self, statement):
+        raise DBAPIError(str(statement), None, self.error)
+
+
+def test_unreadable_replication_status_means_unknown_lag(replica_app):
+    router = replica_app.extensions['replica_router']
+    assert router._replication_status('replica_1', _StatusConnection(_Denied('access denied'))) is None
+    with pytest.raises(DBAPIError):
+        router._replication_status('replica_1', _StatusConnection(Exception('lost connection')))
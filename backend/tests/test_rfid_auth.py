@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from events import EventBroker, EventRelay
+from models import db, RFIDCard, User
+from rfid_auth import RFIDAuthCache
+
+
+@pytest.fixture
+def card(app):
+    with app.app_context():
+        db.session.add(User(id=1, name='User 1', email='user1@example.com', password_hash='x'))
+        db.session.add(RFIDCard(id=1, user_id=1, rfid_code='CARD1', status='active'))
+        db.session.commit()
+    return 'CARD1'
+
+
+def tap(client, rfid_code):
+    response = client.post('/api/auth/rfid', json={'rfid_code': rfid_code})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_deactivated_card_is_denied(client, card):
+    assert tap(client, card)['authorized']
+    response = client.put('/api/rfid_cards/1', json={'status': 'inactive'})
+    assert response.status_code == 200
+    result = tap(client, card)
+    assert not result['authorized']
+    assert result['reason'] == 'RFID card is not active (status: inactive)'
+
+
+def test_deactivation_reaches_other_workers(app, card):
+    # Two brokers with their own relays over one database stand in for two
+    # worker processes, each with its own cache.
+    brokers = [EventBroker(), EventBroker()]
+    relays = [EventRelay(broker, poll_interval=0.05) for broker in brokers]
+    for relay in relays:
+        relay.init_app(app)
+    writer, reader = (RFIDAuthCache(broker=broker) for broker in brokers)
+    try:
+        # A relay delivers only events stored after it starts.
+        deadline = time.monotonic() + 5
+        while any(relay._last_id is None for relay in relays):
+            assert time.monotonic() < deadline, 'relays did not start'
+            time.sleep(0.01)
+        with app.app_context():
+            assert reader.get(card)['card']['status'] == 'active'
+            RFIDCard.query.get(1).status = 'inactive'
+            db.session.commit()
+            writer.invalidate(card)
+
+            deadline = time.monotonic() + 5
+            while reader.get(card)['card']['status'] == 'active':
+                assert time.monotonic() < deadline, 'invalidation never reached the other cache'
+                time.sleep(0.05)
+            db.session.remove()
+    finally:
+        for relay in relays:
+            relay.stop()
@@ -65,6 +65,39 @@ export interface BatteryHealthLog {
   created_at: string; // DateTime as string
 }
 
+export interface ExecutedSwap {
+  message: string;
+  swap_id: number;
+  user_id: number;
+  issued_battery_id: number;
+  issued_slot_id: number;
+  issued_slot_number: number;
+  returned_battery_id?: number | null;
+  return_slot_id?: number | null;
+  return_slot_number?: number | null;
+}
+
+export interface SubscriptionPlan {
+  id: number;
+  name: string;
+  monthly_fee?: number | null;
+  included_ah?: number | null;
+  extra_ah_rate?: number | null;
+}
+
+export interface RFIDAuthResult {
+  authorized: boolean;
+  reason?: string | null; // Why the tap was refused, when authorized is false
+  card: RFIDCard;
+  user: User;
+  plan?: SubscriptionPlan | null;
+  subscription: {
+    active: boolean;
+    plan_id?: number | null;
+    start?: string | null; // Date as string
+  };
+}
+
 
 // Helper for error handling
 import { AxiosError } from 'axios';
@@ -89,7 +122,7 @@ export const batteryApi = {
   async getUsers(): Promise<User[]> {
     try {
       const response = await axios.get(`${API_BASE_URL}/users`);
-      return response.data;
+      return response.data.data; // Paginated envelope: { data, next_cursor }
     } catch (error) {
       handleError(error, 'Failed to fetch users');
       return []; // Should not be reached due to throw
@@ -136,7 +169,7 @@ export const batteryApi = {
   async getRFIDCards(): Promise<RFIDCard[]> {
     try {
       const response = await axios.get(`${API_BASE_URL}/rfid_cards`);
-      return response.data;
+      return response.data.data; // Paginated envelope: { data, next_cursor }
     } catch (error) {
       handleError(error, 'Failed to fetch RFID cards');
       return [];
@@ -160,6 +193,15 @@ export const batteryApi = {
       throw error;
     }
   },
+  async authenticateRFID(rfidCode: string): Promise<RFIDAuthResult> {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/auth/rfid`, { rfid_code: rfidCode });
+      return response.data;
+    } catch (error) {
+      handleError(error, `Failed to authenticate RFID card with code ${rfidCode}`);
+      throw error;
+    }
+  },
   async createRFIDCard(cardData: Partial<RFIDCard>): Promise<{ message: string; card_id: number }> {
     try {
       const response = await axios.post(`${API_BASE_URL}/rfid_cards`, cardData);
@@ -192,7 +234,7 @@ export const batteryApi = {
   async getBatteries(): Promise<Battery[]> {
     try {
       const response = await axios.get(`${API_BASE_URL}/batteries`);
-      return response.data;
+      return response.data.data; // Paginated envelope: { data, next_cursor }
     } catch (error) {
       handleError(error, 'Failed to fetch batteries');
       return [];
@@ -235,12 +277,27 @@ export const batteryApi = {
     }
   },
 
+  // --- Swap Endpoints ---
+  async executeSwap(rfidCode: string, stationId: number, returnSlotId?: number): Promise<ExecutedSwap> {
+    try {
+      const response = await axios.post(`${API_BASE_URL}/swaps/execute`, {
+        rfid_code: rfidCode,
+        station_id: stationId,
+        return_slot_id: returnSlotId,
+      });
+      return response.data;
+    } catch (error) {
+      handleError(error, `Failed to execute swap for card ${rfidCode}`);
+      throw error;
+    }
+  },
+
   // --- BatteryHealthLog Endpoints ---
   async getBatteryHealthLogs(batteryId?: number): Promise<BatteryHealthLog[]> {
     try {
       const params = batteryId ? { battery_id: batteryId } : {};
       const response = await axios.get(`${API_BASE_URL}/battery_health_logs`, { params });
-      return response.data;
+      return response.data.data; // Paginated envelope: { data, next_cursor }
     } catch (error) {
       handleError(error, 'Failed to fetch battery health logs');
       return [];
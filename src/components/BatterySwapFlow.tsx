@@ -87,36 +87,21 @@ const BatterySwapFlow: React.FC<BatterySwapFlowProps> = ({
 
   const handleRFIDScanned = async (rfidCode: string) => {
     try {
-      console.log(`Attempting to find RFID card with code: ${rfidCode}`);
-      // 1. Find the RFID card by its code using the new API endpoint
-      const foundCard = await batteryApi.getRFIDCardByCode(rfidCode);
+      console.log(`Attempting to authenticate RFID card with code: ${rfidCode}`);
+      // 1. Card, user and plan come back together from one cached lookup
+      const auth = await batteryApi.authenticateRFID(rfidCode);
+      const foundCard = auth.card;
+      const user: User = auth.user;
 
-      console.log('Found RFID Card:', foundCard);
+      console.log('Authenticated RFID Card:', foundCard, 'User:', user);
 
-      if (foundCard.status !== 'active') {
-        console.error(`RFID card ${rfidCode} is not active. Status: ${foundCard.status}`);
-        alert(`RFID card ${rfidCode} is not active.`);
+      if (!auth.authorized) {
+        console.error(`RFID card ${rfidCode} refused: ${auth.reason}`);
+        alert(auth.reason || `RFID card ${rfidCode} is not active.`);
         return;
       }
 
-      // 2. Fetch the associated user.
-      let user: User | undefined = undefined;
-      if (foundCard.user_id) {
-        try {
-          user = await batteryApi.getUser(foundCard.user_id);
-          console.log('Found User:', user);
-        } catch (userError) {
-          console.error(`Failed to fetch user with ID ${foundCard.user_id}:`, userError);
-          // Decide if this is a critical failure or if we can proceed without full user details
-          alert(`Could not fetch user details for card ${rfidCode}.`);
-          // return; // Or proceed with partial data
-        }
-      } else {
-        console.warn(`RFID card ${rfidCode} is not associated with a user.`);
-        // Decide if this is allowed
-      }
-      
-      // 3. Create and set the swap session.
+      // 2. Create and set the swap session.
       const newSwapSession: SwapSession = {
         sessionId: uuidv4(), // Generate a unique session ID
         status: 'pending_return', // Initial status after RFID scan